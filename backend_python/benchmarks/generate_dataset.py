@@ -0,0 +1,173 @@
+"""Synthetic transactions CSV with the dataset's header, at any size.
+
+Values follow the shape of the real export: a customer base about a tenth
+the size of the transaction count (so names and phone numbers repeat), a few
+hundred products each with a fixed brand and category, tags written with a
+mix of ',' '|' and ', ' delimiters, and a small share of missing names,
+phone numbers and ages. Rows are generated and written in chunks, so memory
+stays flat at 10M rows. The same seed always gives the same file.
+
+    python benchmarks/generate_dataset.py --rows 1M --out /tmp/transactions_1m.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+HEADER = [
+    "Transaction ID", "Date", "Customer ID", "Customer Name", "Phone Number", "Gender", "Age",
+    "Customer Region", "Customer Type", "Product ID", "Product Name", "Brand", "Product Category",
+    "Tags", "Quantity", "Price per Unit", "Discount Percentage", "Total Amount", "Final Amount",
+    "Payment Method", "Order Status", "Delivery Type", "Store ID", "Store Location",
+    "Salesperson ID", "Employee Name",
+]
+
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Vihaan", "Arjun", "Sai", "Reyansh", "Ayaan", "Krishna", "Ishaan",
+    "Shaurya", "Atharv", "Advik", "Pranav", "Rohan", "Kabir", "Dhruv", "Karan", "Rahul", "Nikhil",
+    "Ananya", "Diya", "Aadhya", "Saanvi", "Myra", "Pari", "Anika", "Navya", "Kiara", "Ira",
+    "Priya", "Neha", "Kavya", "Riya", "Sneha", "Pooja", "Meera", "Tara", "Isha", "Nisha",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Gupta", "Iyer", "Reddy", "Nair", "Singh", "Das", "Patel", "Mehta",
+    "Joshi", "Kapoor", "Malhotra", "Chopra", "Bose", "Mukherjee", "Rao", "Pillai", "Menon", "Khan",
+    "Shah", "Agarwal", "Bansal", "Saxena", "Kulkarni",
+]
+REGIONS = ["North", "South", "East", "West", "Central"]
+GENDERS = ["Male", "Female", "Other"]
+GENDER_WEIGHTS = [0.49, 0.49, 0.02]
+CUSTOMER_TYPES = ["New", "Returning", "Loyal"]
+CATEGORIES = ["Electronics", "Clothing", "Beauty", "Home", "Sports", "Books", "Grocery", "Toys"]
+BRANDS = [f"{prefix}{suffix}" for prefix in ("Acme", "Nova", "Zen", "Orbit", "Apex") for suffix in ("", " Pro", " Lite", " Home")]
+TAGS = [
+    "organic", "wireless", "portable", "premium", "eco-friendly", "smart", "gaming", "fashion",
+    "casual", "accessories", "unisex", "skincare", "fitness", "kitchen", "outdoor", "kids",
+]
+TAG_DELIMITERS = [",", "|", ", "]
+PAYMENT_METHODS = ["UPI", "Credit Card", "Debit Card", "Cash", "Wallet", "Net Banking"]
+ORDER_STATUSES = ["Completed", "Pending", "Cancelled", "Returned"]
+DELIVERY_TYPES = ["Standard", "Express", "Store Pickup"]
+CITIES = ["Mumbai", "Delhi", "Pune", "Chennai", "Bengaluru", "Hyderabad", "Kolkata", "Jaipur", "Ahmedabad", "Lucknow"]
+
+N_PRODUCTS = 500
+N_STORES = 50
+N_EMPLOYEES = 200
+# Distinct tag lists in circulation; real exports repeat the same combinations
+N_TAG_COMBOS = 4000
+FIRST_DAY = np.datetime64("2021-01-01")
+N_DAYS = 3 * 365
+MISSING_RATE = 0.005
+CHUNK_ROWS = 500_000
+
+
+def parse_rows(value):
+    """'1M', '250k', '10000' -> int."""
+    value = str(value).strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def _tag_combos(rng):
+    counts = rng.choice([0, 1, 2, 3, 4], size=N_TAG_COMBOS, p=[0.1, 0.3, 0.3, 0.2, 0.1])
+    delimiters = rng.choice(TAG_DELIMITERS, size=N_TAG_COMBOS)
+    return np.array(
+        [delimiter.join(rng.choice(TAGS, size=k, replace=False)) for k, delimiter in zip(counts, delimiters)],
+        dtype=object,
+    )
+
+
+def _with_missing(rng, values, rate=MISSING_RATE):
+    values = values.astype(object)
+    values[rng.random(len(values)) < rate] = None
+    return values
+
+
+def _labels(template, n):
+    """``template`` formatted for 0..n, looked up by id instead of formatted per row."""
+    return np.array([template.format(i) for i in range(n + 1)], dtype=object)
+
+
+def generate_chunk(rng, start, n, labels, combos):
+    """Rows ``start + 1 .. start + n`` as a DataFrame with HEADER columns."""
+    customers = rng.integers(1, len(labels["customer"]), size=n)
+    products = rng.integers(1, N_PRODUCTS + 1, size=n)
+    stores = rng.integers(1, N_STORES + 1, size=n)
+    employees = rng.integers(1, N_EMPLOYEES + 1, size=n)
+
+    first = np.array(FIRST_NAMES, dtype=object)[customers % len(FIRST_NAMES)]
+    last = np.array(LAST_NAMES, dtype=object)[(customers // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    quantity = rng.integers(1, 11, size=n)
+    price = np.round(rng.lognormal(mean=6.0, sigma=1.2, size=n).clip(5, 50_000), 2)
+    discount = rng.choice(np.arange(0, 55, 5), size=n)
+    total = np.round(quantity * price, 2)
+    final = np.round(total * (1 - discount / 100), 2)
+    ages = rng.integers(18, 71, size=n)
+
+    return pd.DataFrame({
+        "Transaction ID": np.arange(start + 1, start + n + 1),
+        "Date": np.datetime_as_string(FIRST_DAY + rng.integers(0, N_DAYS, size=n), unit="D"),
+        "Customer ID": labels["customer"][customers],
+        "Customer Name": _with_missing(rng, first + " " + last),
+        "Phone Number": _with_missing(rng, 9_000_000_000 + customers * 7919 % 1_000_000_000),
+        "Gender": rng.choice(GENDERS, size=n, p=GENDER_WEIGHTS),
+        "Age": _with_missing(rng, ages, rate=0.01),
+        "Customer Region": np.array(REGIONS)[customers % len(REGIONS)],
+        "Customer Type": rng.choice(CUSTOMER_TYPES, size=n),
+        "Product ID": labels["product_id"][products],
+        "Product Name": labels["product_name"][products],
+        "Brand": np.array(BRANDS)[products % len(BRANDS)],
+        "Product Category": np.array(CATEGORIES)[(products * 7) % len(CATEGORIES)],
+        "Tags": combos[rng.integers(0, len(combos), size=n)],
+        "Quantity": quantity,
+        "Price per Unit": price,
+        "Discount Percentage": discount,
+        "Total Amount": total,
+        "Final Amount": final,
+        "Payment Method": rng.choice(PAYMENT_METHODS, size=n),
+        "Order Status": rng.choice(ORDER_STATUSES, size=n, p=[0.7, 0.15, 0.1, 0.05]),
+        "Delivery Type": rng.choice(DELIVERY_TYPES, size=n),
+        "Store ID": labels["store"][stores],
+        "Store Location": np.array(CITIES)[stores % len(CITIES)],
+        "Salesperson ID": labels["employee_id"][employees],
+        "Employee Name": labels["employee_name"][employees],
+    }, columns=HEADER)
+
+
+def generate_dataset(rows, out_path, seed=42, chunk_rows=CHUNK_ROWS):
+    """
+    Write ``rows`` synthetic transactions to ``out_path``.
+
+    Returns:
+        Path of the written CSV
+    """
+    rng = np.random.default_rng(seed)
+    labels = {
+        "customer": _labels("CUST-{:05d}", max(1, rows // 10)),
+        "product_id": _labels("PROD-{:04d}", N_PRODUCTS),
+        "product_name": _labels("Product {}", N_PRODUCTS),
+        "store": _labels("ST{:03d}", N_STORES),
+        "employee_id": _labels("EMP{:03d}", N_EMPLOYEES),
+        "employee_name": _labels("Emp {}", N_EMPLOYEES),
+    }
+    combos = _tag_combos(rng)
+    started = time.perf_counter()
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        f.write(",".join(HEADER) + "\n")
+        for start in range(0, rows, chunk_rows):
+            n = min(chunk_rows, rows - start)
+            generate_chunk(rng, start, n, labels, combos).to_csv(f, index=False, header=False)
+    os.replace(tmp_path, out_path)
+    print(f"Generated {rows} rows in {time.perf_counter() - started:.2f}s: {out_path}")
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic transactions CSV")
+    parser.add_argument("--rows", default="1M", help="Row count, e.g. 20000, 1M, 10M")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate_dataset(parse_rows(args.rows), args.out, args.seed)
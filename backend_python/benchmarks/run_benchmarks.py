@@ -0,0 +1,448 @@
+"""Benchmark harness for loading, querying, serialization and SQLite import.
+
+Runs every case against a CSV (generated with generate_dataset.py when
+``--rows`` is given) and writes the timings to a JSON file. Each case is run
+``--repeat`` times after a warm-up and reported by its median; the query
+cache is cleared before every run, so the numbers are for uncached queries
+unless the case name says otherwise.
+
+Results can be compared with a baseline run. A case regresses when its
+median is more than ``--threshold`` (relative) and ``--min-delta-ms``
+(absolute) slower than the baseline, and the exit status is then 1:
+
+    python benchmarks/run_benchmarks.py --rows 1M --out baseline.json
+    python benchmarks/run_benchmarks.py --rows 1M --out new.json --baseline baseline.json
+    python benchmarks/run_benchmarks.py --compare new.json baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path[:0] = [BACKEND_DIR, REPO_DIR]
+
+import numpy as np
+import pandas as pd
+
+from generate_dataset import generate_dataset, parse_rows
+from src import data_processor as dp
+from src.import_csv_to_sqlite import bulk_import_csv_to_sqlite
+from src.serialization import encode_page, iter_csv, page_records
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 2.0
+# Case groups that --skip-import leaves out
+SQLITE_CASE_PREFIXES = ("import.", "sqlite.", "properties.")
+
+
+class Harness:
+    """
+    Times named cases and collects their results.
+
+    Args:
+        repeat: Timed runs per case
+        load_repeat: Timed runs of the (slow) load and import cases
+        only: Substrings; when given, only cases whose name contains one run
+        verbose: Let the code under test print instead of capturing its output
+    """
+
+    def __init__(self, repeat=5, load_repeat=1, only=None, verbose=False):
+        self.repeat = repeat
+        self.load_repeat = load_repeat
+        self.only = only or []
+        self.verbose = verbose
+        self.results = {}
+
+    def selected(self, name):
+        return not self.only or any(pattern in name for pattern in self.only)
+
+    def wants(self, *names):
+        """True if any of ``names`` is selected, i.e. its setup is worth doing."""
+        return any(self.selected(name) for name in names)
+
+    def quiet(self):
+        return contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+
+    def case(self, name, fn, setup=None, repeat=None, warmup=1):
+        """Time ``fn()`` (after ``setup()``, untimed) and record it under ``name``."""
+        if not self.selected(name):
+            return None
+        repeat = self.repeat if repeat is None else repeat
+        times = []
+        try:
+            with self.quiet():
+                for i in range(warmup + repeat):
+                    if setup is not None:
+                        setup()
+                    started = time.perf_counter()
+                    fn()
+                    if i >= warmup:
+                        times.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            print(f"  {name:<40} FAILED: {e}")
+            self.results[name] = {"error": str(e)}
+            return None
+        result = {
+            "runs": len(times),
+            "median_ms": round(statistics.median(times), 3),
+            "min_ms": round(min(times), 3),
+            "max_ms": round(max(times), 3),
+        }
+        self.results[name] = result
+        print(f"  {name:<40} {result['median_ms']:>10.2f} ms  (min {result['min_ms']:.2f}, runs {len(times)})")
+        return result
+
+
+# -- dataset state -----------------------------------------------------------
+
+def configure(csv_path, workdir):
+    """Point data_processor at the benchmark CSV and a private parquet cache."""
+    dp.CSV_PATH = csv_path
+    dp.DB_PATH = os.path.join(workdir, "missing.db")
+    dp.PARQUET_PATH = os.path.join(workdir, "cached_data.parquet")
+    dp.SHARED_DIR = ""
+    dp.ENGINE = "pandas"
+    dp.SQL_ENGINE = None
+
+
+def unload():
+    dp.DF = None
+    dp.LOAD_STATUS["state"] = "idle"
+
+
+def drop_parquet_cache():
+    unload()
+    if os.path.exists(dp.PARQUET_PATH):
+        os.remove(dp.PARQUET_PATH)
+
+
+# -- cases -------------------------------------------------------------------
+
+def query_cases(options, n_rows):
+    """Request name -> get_transactions_json keyword arguments."""
+    region = options["regions"][0]
+    category = options["productCategories"][0]
+    payment = options["paymentMethods"][0]
+    tag = options["tags"][0]
+    age = {"ageRange": {"min": 25, "max": 40}}
+    dates = {"dateRange": {"from": "2022-01-01", "to": "2022-06-30"}}
+    combined = {
+        "customerRegions": [region], "genders": ["Female"], "productCategories": [category],
+        "paymentMethods": [payment], "tags": [tag], **age, **dates,
+    }
+    last_page = max(1, n_rows // 10)
+    cases = {
+        "filter.none": {},
+        "filter.region": {"filters": {"customerRegions": [region]}},
+        "filter.gender": {"filters": {"genders": ["Female"]}},
+        "filter.category": {"filters": {"productCategories": [category]}},
+        "filter.payment": {"filters": {"paymentMethods": [payment]}},
+        "filter.tags": {"filters": {"tags": [tag]}},
+        "filter.age_range": {"filters": age},
+        "filter.date_range": {"filters": dates},
+        "filter.combined": {"filters": combined},
+        "search.name": {"q": "sharma"},
+        "search.short": {"q": "ar"},
+        "search.phone": {"q": "9123"},
+        "search.no_match": {"q": "zzzz"},
+        "search.with_filters": {"q": "ar", "filters": {"customerRegions": [region], "tags": [tag]}},
+        "page.deep_offset": {"page": last_page // 2},
+        "page.last": {"page": last_page},
+        "page.size_100": {"page_size": 100},
+        "page.size_100_table": {"page_size": 100, "fields": "table"},
+    }
+    for field in ("Date", "CustomerName", "Quantity", "FinalAmount", "Age", "Tags"):
+        for direction in ("asc", "desc"):
+            cases[f"sort.{field}.{direction}"] = {"sort_field": field, "sort_dir": direction}
+    cases["sort.CustomerName.filtered"] = {"sort_field": "CustomerName", "sort_dir": "asc", "filters": {"customerRegions": [region]}}
+    for kwargs in cases.values():
+        if "filters" in kwargs:
+            kwargs["filters"] = json.dumps(kwargs["filters"])
+    return cases
+
+
+def run_load(harness):
+    harness.case("load.cold_csv", dp.load_data, setup=drop_parquet_cache, repeat=harness.load_repeat, warmup=0)
+    if harness.wants("load.warm_parquet"):
+        if not os.path.exists(dp.PARQUET_PATH):
+            with harness.quiet():
+                unload()
+                dp.load_data()
+        harness.case("load.warm_parquet", dp.load_data, setup=unload, repeat=harness.load_repeat, warmup=0)
+    if dp.DF is None:
+        with harness.quiet():
+            dp.load_data()
+    harness.case("load.build_indexes", dp.build_indexes, repeat=harness.load_repeat, warmup=0)
+
+
+def run_queries(harness, cases, prefix=""):
+    """Time each query case through get_transactions_json with a cold query cache."""
+    for name, kwargs in cases.items():
+        harness.case(prefix + name, lambda kwargs=kwargs: dp.get_transactions_json(**kwargs), setup=dp.QUERY_CACHE.clear)
+
+
+def run_pandas_extras(harness, options):
+    region = options["regions"][0]
+    tag = options["tags"][0]
+    filters = json.dumps({"customerRegions": [region], "tags": [tag]})
+
+    harness.case("page.cached_next", lambda: dp.get_transactions_json(page=2, filters=filters))
+    ordered = dp.ordered_rows("", {}, "Date", "desc")
+    middle = dp.encode_cursor("Date", "desc", ordered[len(ordered) // 2])
+    harness.case("page.deep_cursor", lambda: dp.get_transactions_json(cursor=middle), setup=dp.QUERY_CACHE.clear)
+
+    rows = ordered[:100]
+    table = dp.parse_fields("table")
+    harness.case("serialize.encode_page_10", lambda: encode_page(dp.DF, rows[:10], 1, 10, len(ordered)))
+    harness.case("serialize.encode_page_100", lambda: encode_page(dp.DF, rows, 1, 100, len(ordered)))
+    harness.case("serialize.encode_page_100_table", lambda: encode_page(dp.DF, rows, 1, 100, len(ordered), columns=table))
+    harness.case("serialize.records_100", lambda: json.dumps(page_records(dp.DF, rows), default=str))
+    export_rows = dp.ordered_rows("", json.loads(filters), "Date", "desc")
+    harness.case("serialize.export_csv_filtered", lambda: sum(len(chunk) for chunk in iter_csv(dp.DF, export_rows, dp.EXPORT_CHUNK_ROWS)))
+    harness.case("serialize.export_csv_filtered_export", lambda: sum(
+        len(chunk) for chunk in iter_csv(dp.DF, export_rows, dp.EXPORT_CHUNK_ROWS, dp.parse_fields("export"))
+    ))
+
+    harness.case("summary.cube", lambda: dp.get_summary("", json.dumps({"customerRegions": [region]})))
+    harness.case("summary.rows", lambda: dp.get_summary("ar", filters), setup=dp.QUERY_CACHE.clear)
+    harness.case("facets.counts", lambda: dp.get_filter_options("ar", filters))
+
+    # What the frontend loads for one search: two pages under two sorts, the facet counts and the summary
+    prefetch = [
+        {"type": "transactions", "q": "ar", "filters": filters, "page": 1},
+        {"type": "transactions", "q": "ar", "filters": filters, "page": 2},
+        {"type": "transactions", "q": "ar", "filters": filters, "sort_field": "CustomerName", "sort_dir": "asc"},
+        {"type": "filterOptions", "q": "ar", "filters": filters},
+        {"type": "summary", "q": "ar", "filters": filters},
+    ]
+
+    def separately():
+        for query in prefetch:
+            query = dict(query)
+            dp.BATCH_FUNCTIONS[query.pop("type")](**query)
+    harness.case("batch.prefetch_separate", separately, setup=dp.QUERY_CACHE.clear)
+    harness.case("batch.prefetch", lambda: dp.get_batch_json(prefetch), setup=dp.QUERY_CACHE.clear)
+
+
+def run_sqlite(harness, csv_path, workdir, workers, cases):
+    db_path = os.path.join(workdir, "transactions.db")
+
+    def fresh_db():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    harness.case("import.bulk", lambda: bulk_import_csv_to_sqlite(csv_path, db_path, workers), setup=fresh_db, repeat=1, warmup=0)
+    names = [f"sqlite.{name}" for name in cases] + ["sqlite.summary", "sqlite.facets.counts"]
+    if not harness.wants(*names):
+        return
+    if not os.path.exists(db_path):
+        with harness.quiet():
+            bulk_import_csv_to_sqlite(csv_path, db_path, workers)
+    dp.ENGINE, dp.DB_PATH, dp.SQL_ENGINE = "sqlite", db_path, None
+    try:
+        with harness.quiet():
+            dp.get_sql_engine()
+        run_queries(harness, cases, "sqlite.")
+        filters = cases["search.with_filters"]["filters"]
+        harness.case("sqlite.summary", lambda: dp.get_summary("", cases["filter.region"]["filters"]))
+        harness.case("sqlite.facets.counts", lambda: dp.get_filter_options("ar", filters))
+    finally:
+        dp.ENGINE, dp.DB_PATH, dp.SQL_ENGINE = "pandas", os.path.join(workdir, "missing.db"), None
+
+
+def run_properties(harness, csv_path, workdir, options, n_rows):
+    """DatabaseManager.get_properties over the table database_setup.py builds."""
+    # database.py opens ./truestate.db at import time
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        import database_setup
+        harness.case("import.properties", lambda: database_setup.setup_database(csv_path, "truestate.db"), repeat=1, warmup=0)
+        names = ["properties.first_page", "properties.filtered_sorted", "properties.search",
+                 "properties.deep_offset", "properties.deep_keyset", "properties.count_filtered"]
+        if not harness.wants(*names):
+            return
+        if not os.path.exists("truestate.db"):
+            with harness.quiet():
+                database_setup.setup_database(csv_path, "truestate.db")
+        import database
+        manager = database.db
+        region = options["regions"][0]
+        deep = max(0, n_rows // 2)
+        with sqlite3.connect("truestate.db") as conn:
+            after = conn.execute(
+                "SELECT date, rowid FROM properties ORDER BY date DESC, rowid DESC LIMIT 1 OFFSET ?", (deep,)
+            ).fetchone()
+        harness.case("properties.first_page", lambda: manager.get_properties(limit=10))
+        harness.case("properties.filtered_sorted", lambda: manager.get_properties(
+            limit=10, filters={"customer_region": region}, sort_by="date", sort_order="DESC"))
+        harness.case("properties.search", lambda: manager.get_properties(limit=10, filters={"customer_name": "sharma"}))
+        harness.case("properties.deep_offset", lambda: manager.get_properties(limit=10, offset=deep, sort_by="date", sort_order="DESC"))
+        if after is not None:
+            harness.case("properties.deep_keyset", lambda: manager.get_properties(
+                limit=10, sort_by="date", sort_order="DESC", after=tuple(after)))
+        harness.case("properties.count_filtered", lambda: manager.get_property_count({"customer_region": region}))
+        manager.close()
+    finally:
+        os.chdir(previous)
+
+
+# -- results -----------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare two result files' cases by median.
+
+    Returns:
+        List of (case, baseline ms, new ms, ratio, status) rows, status being
+        'regressed', 'improved', 'ok', 'new' or 'missing'
+    """
+    new_cases, old_cases = results["cases"], baseline["cases"]
+    rows = []
+    for name in sorted(set(new_cases) | set(old_cases)):
+        new, old = new_cases.get(name, {}), old_cases.get(name, {})
+        if "median_ms" not in new or "median_ms" not in old:
+            status = "missing" if "median_ms" in old else "new"
+            rows.append((name, old.get("median_ms"), new.get("median_ms"), None, status))
+            continue
+        before, after = old["median_ms"], new["median_ms"]
+        ratio = after / before if before > 0 else float("inf")
+        status = "ok"
+        if after - before > min_delta_ms and ratio > 1 + threshold:
+            status = "regressed"
+        elif before - after > min_delta_ms and ratio < 1 / (1 + threshold):
+            status = "improved"
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'case':<40} {'baseline ms':>12} {'new ms':>12} {'ratio':>8}  status")
+    for name, before, after, ratio, status in rows:
+        fmt = lambda v: f"{v:12.2f}" if v is not None else f"{'-':>12}"
+        print(f"{name:<40} {fmt(before)} {fmt(after)} {f'{ratio:.2f}x' if ratio is not None else '-':>8}  {status}")
+    regressed = [row[0] for row in rows if row[4] == "regressed"]
+    print(f"{len(regressed)} regression(s)" + (f": {', '.join(regressed)}" if regressed else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, queries, serialization and import")
+    parser.add_argument("--csv", help="Dataset to benchmark (default: generate one with --rows)")
+    parser.add_argument("--rows", default="1M", help="Rows to generate when --csv is not given, e.g. 1M or 10M")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS, help="Ignore differences smaller than this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--load-repeat", type=int, default=1, help="Runs of the (slow) load cases")
+    parser.add_argument("--only", action="append", help="Run only cases whose name contains this (repeatable)")
+    parser.add_argument("--skip-import", action="store_true", help="Skip the SQLite import and SQLite query groups")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for the bulk import")
+    parser.add_argument("--workdir", help="Directory for the generated CSV, caches and databases (default: temporary)")
+    parser.add_argument("--verbose", action="store_true", help="Show output of the code under test")
+    parser.add_argument("--compare", nargs=2, metavar=("NEW", "BASELINE"), help="Only compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            rows = compare(json.load(f), json.load(g), args.threshold, args.min_delta_ms)
+        sys.exit(1 if print_comparison(rows) else 0)
+
+    if not args.verbose:
+        # database_setup.py logs every chunk it imports
+        logging.disable(logging.INFO)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="truestate-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    csv_path = args.csv
+    if csv_path is None:
+        csv_path = os.path.join(workdir, f"transactions_{args.rows}.csv")
+        if not os.path.exists(csv_path):
+            generate_dataset(parse_rows(args.rows), csv_path, args.seed)
+    csv_path = os.path.abspath(csv_path)
+
+    harness = Harness(args.repeat, args.load_repeat, args.only, args.verbose)
+    configure(csv_path, workdir)
+    started = time.perf_counter()
+    try:
+        print("Load")
+        run_load(harness)
+        n_rows = len(dp.DF)
+        options = dp.get_filter_options()
+        cases = query_cases(options, n_rows)
+        print("Queries (in-memory engine)")
+        run_queries(harness, cases)
+        run_pandas_extras(harness, options)
+        if not args.skip_import:
+            print("SQLite")
+            run_sqlite(harness, csv_path, workdir, args.workers, cases)
+            run_properties(harness, csv_path, workdir, options, n_rows)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "dataset": {"csv": csv_path, "rows": n_rows, "bytes": os.path.getsize(csv_path) if os.path.exists(csv_path) else None},
+        "environment": environment(),
+        "settings": {"repeat": args.repeat, "loadRepeat": args.load_repeat, "only": args.only},
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "elapsedSeconds": round(time.perf_counter() - started, 2),
+        "cases": harness.results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {len(harness.results)} results to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("dataset", {}).get("rows") != n_rows:
+            print(f"Warning: baseline was run on {baseline.get('dataset', {}).get('rows')} rows, this run on {n_rows}")
+        # Cases left out with --only or --skip-import are not missing
+        skipped = SQLITE_CASE_PREFIXES if args.skip_import else ()
+        baseline["cases"] = {
+            name: case for name, case in baseline["cases"].items()
+            if harness.selected(name) and not name.startswith(skipped)
+        }
+        rows = compare(results, baseline, args.threshold, args.min_delta_ms)
+        sys.exit(1 if print_comparison(rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,73 @@
 import pandas as pd
 import os
 import json
+import base64
+import hashlib
+import threading
+import tempfile
+import time
 import numpy as np
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+try:
+    from src.indexes import (
+        FACET_COLUMNS, TAG_SEPARATOR, TagIndex, build_facet_indexes, build_search_indexes, build_sort_indexes, select_facets, search_bitmap,
+        bitmap_from_ids, coerce_value, contains_text, popcount, split_tag_label
+    )
+    from src import metrics, parquet_cache, planner, shared_store
+    from src.planner import ColumnStats, Predicate
+    from src.query_cache import QueryCache, query_key
+    from src.serialization import dumps, encode_page, iter_csv, iter_ndjson, page_records
+    from src.summary import SummaryCube, measure_frame, summarize
+except ImportError:
+    import metrics
+    import parquet_cache
+    import planner
+    import shared_store
+    from planner import ColumnStats, Predicate
+    from query_cache import QueryCache, query_key
+    from serialization import dumps, encode_page, iter_csv, iter_ndjson, page_records
+    from summary import SummaryCube, measure_frame, summarize
+    from indexes import (
+        FACET_COLUMNS, TAG_SEPARATOR, TagIndex, build_facet_indexes, build_search_indexes, build_sort_indexes, select_facets, search_bitmap,
+        bitmap_from_ids, coerce_value, contains_text, popcount, split_tag_label
+    )
 
 DF = None
 FILTER_OPTIONS = None
+FACET_INDEXES = None
+TAG_INDEX = None
+SEARCH_INDEXES = None
+SORT_INDEXES = None
+SUMMARY_CUBE = None
+COLUMN_STATS = None
+# Bumped on every (re)load so stale cache keys can never match
+DATASET_VERSION = 0
+QUERY_CACHE = QueryCache()
+EXPORT_CHUNK_ROWS = 5000
+# 'pandas' serves queries from the in-memory DataFrame, 'sqlite' runs them
+# against DB_PATH through sql_engine
+ENGINE = os.environ.get('TRUESTATE_ENGINE', 'pandas').lower()
+SQL_ENGINE = None
+
+# Startup progress, served by /readyz while the dataset loads in the background
+LOAD_LOCK = threading.Lock()
+LOAD_STATUS = {"state": "idle", "phase": None, "source": None, "phases": {}, "error": None, "startedAt": None, "elapsedSeconds": None}
+STARTUP_BUDGET_SECONDS = float(os.environ.get('TRUESTATE_STARTUP_BUDGET', '30'))
+
+# Serializes ingest_csv calls within this process (publish_lock covers other workers)
+INGEST_LOCK = threading.Lock()
+# Shared version this process has attached, and how often to look for a newer one
+SHARED_KEY = None
+SHARED_CHECK_SECONDS = 1.0
+_SHARED_CHECKED_AT = 0.0
 
 CSV_PATH_LOCAL = os.path.join(os.path.dirname(__file__), "../truestate_assignment_dataset.csv")
 CSV_PATH_REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../truestate_assignment_dataset.csv"))
+# None disables the parquet cache (it is neither read nor written)
 PARQUET_PATH = os.path.join(os.path.dirname(__file__), "../../cached_data.parquet")
+# Workers publish the loaded dataset here once and memory-map it; empty disables sharing
+SHARED_DIR = os.environ.get('TRUESTATE_SHARED_DIR', os.path.join(os.path.dirname(__file__), "../../.truestate_shared"))
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../truestate.db"))
 
 def get_csv_path():
@@ -49,183 +108,923 @@ COLUMN_MAPPING = {
     "Customer Type": "CustomerType"
 }
 
+# Low-cardinality columns stored as pandas categoricals (integer codes + labels)
+CATEGORICAL_COLUMNS = [
+    "CustomerRegion", "Gender", "ProductCategory", "PaymentMethod", "OrderStatus",
+    "DeliveryType", "StoreLocation", "Brand", "CustomerType"
+]
+INTEGER_COLUMNS = ["Age", "Quantity"]
+FLOAT_COLUMNS = ["PricePerUnit", "DiscountPercentage", "TotalAmount", "FinalAmount"]
+
+# Named column sets for the ``fields`` parameter of /api/transactions and exports
+FIELD_PRESETS = {
+    # The columns TransactionsTable.jsx renders
+    "table": [
+        "TransactionID", "Date", "CustomerID", "CustomerName", "PhoneNumber", "Gender", "Age",
+        "ProductCategory", "Quantity", "TotalAmount", "CustomerRegion", "ProductID", "EmployeeName"
+    ],
+    # Transaction facts for spreadsheets and reporting: no names, phone numbers or tags
+    "export": [
+        "TransactionID", "Date", "CustomerID", "CustomerRegion", "CustomerType", "ProductID",
+        "ProductCategory", "Brand", "Quantity", "PricePerUnit", "DiscountPercentage", "TotalAmount",
+        "FinalAmount", "PaymentMethod", "OrderStatus", "DeliveryType", "StoreID", "StoreLocation",
+        "SalespersonID"
+    ],
+}
+
+def get_sql_engine():
+    global SQL_ENGINE
+    if SQL_ENGINE is None:
+        # Imported here: sql_engine reuses this module's normalization helpers
+        try:
+            from src.sql_engine import SQLiteEngine
+        except ImportError:
+            from sql_engine import SQLiteEngine
+        SQL_ENGINE = SQLiteEngine(DB_PATH)
+    return SQL_ENGINE
+
+@contextmanager
+def load_phase(name):
+    """Record (and log) how long a startup phase takes."""
+    LOAD_STATUS["phase"] = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        LOAD_STATUS["phases"][name] = round(seconds, 3)
+        print(f"Startup phase '{name}' took {seconds:.2f}s")
+
+def is_ready():
+    if LOAD_STATUS["state"] != "ready":
+        return False
+    return SQL_ENGINE is not None if ENGINE == 'sqlite' else DF is not None
+
+def get_load_status():
+    status = dict(LOAD_STATUS, phases=dict(LOAD_STATUS["phases"]), ready=is_ready())
+    if status["state"] == "loading" and status["startedAt"]:
+        status["elapsedSeconds"] = round(time.time() - status["startedAt"], 3)
+    status["rows"] = len(DF) if DF is not None else None
+    status["version"] = DATASET_VERSION
+    status["budgetSeconds"] = STARTUP_BUDGET_SECONDS
+    return status
+
+def start_background_load(on_ready=None):
+    """
+    Load the dataset on a daemon thread so the server can answer requests
+    meanwhile, then call ``on_ready()`` (if given) on that thread.
+    """
+    def run():
+        try:
+            load_data()
+        except Exception as e:
+            print(f"Background data load failed: {e}")
+            return
+        if on_ready is not None:
+            try:
+                on_ready()
+            except Exception as e:
+                print(f"Post-load startup step failed: {e}")
+    thread = threading.Thread(target=run, name="dataset-loader", daemon=True)
+    thread.start()
+    return thread
+
 def load_data():
-    global DF, FILTER_OPTIONS
-    
-    if DF is not None:
+    if is_ready():
         return DF
-
-    # 1) Try parquet cache
-    if os.path.exists(PARQUET_PATH):
+    # Concurrent callers wait for the one load in progress instead of repeating it
+    with LOAD_LOCK:
+        if is_ready():
+            return DF
+        LOAD_STATUS.update(state="loading", phase=None, source=None, phases={}, error=None, startedAt=time.time(), elapsedSeconds=None)
+        started = time.perf_counter()
         try:
-            print("Loading data from Parquet cache...")
-            DF = pd.read_parquet(PARQUET_PATH)
+            _load_data()
         except Exception as e:
-            print(f"Error reading parquet: {e}")
-            DF = None
+            LOAD_STATUS.update(state="failed", error=str(e))
+            raise
+        elapsed = time.perf_counter() - started
+        LOAD_STATUS.update(state="ready", phase=None, elapsedSeconds=round(elapsed, 3))
+        print(f"Startup completed in {elapsed:.2f}s")
+        if elapsed > STARTUP_BUDGET_SECONDS:
+            print(f"Warning: startup took {elapsed:.2f}s, over the {STARTUP_BUDGET_SECONDS:.0f}s budget")
+    return DF
+
+def _load_data():
+    global DF, FILTER_OPTIONS
+    
+    if ENGINE == 'sqlite':
+        # Nothing to hold in memory; prepare the database's query structures
+        LOAD_STATUS["source"] = "sqlite"
+        with load_phase("sqlite_schema"):
+            get_sql_engine()
+        return
 
-    # 2) If parquet not loaded, try SQLite DB
-    if DF is None and os.path.exists(DB_PATH):
+    if SHARED_DIR and DF is None:
         try:
-            print(f"Loading data from SQLite DB: {DB_PATH}...")
-            load_from_db()
+            load_shared()
+            return
         except Exception as e:
-            print(f"Error loading from DB: {e}")
+            print(f"Could not use shared dataset, loading a private copy: {e}")
             DF = None
 
-    # 3) If still not loaded, fallback to CSV
-    if DF is None:
-        print("Loading from CSV as fallback...")
-        load_from_csv()
+    load_private()
+
+def load_private():
+    """Load DF into this process and build its filter options and indexes."""
+    global DF
+    with load_phase("read"):
+        # 1) Try parquet cache, only if it was built from the current source data
+        if DF is not None:
+            # Already loaded (e.g. by load_from_db); only the derived state is missing
+            pass
+        elif PARQUET_PATH and parquet_cache.is_current(PARQUET_PATH, cache_source_path()):
+            try:
+                print("Loading data from Parquet cache...")
+                DF = normalize_frame(parquet_cache.load(PARQUET_PATH, CATEGORICAL_COLUMNS))
+                LOAD_STATUS["source"] = "parquet"
+            except Exception as e:
+                print(f"Error reading parquet: {e}")
+                DF = None
+        elif PARQUET_PATH and os.path.exists(PARQUET_PATH):
+            print("Parquet cache is stale or from an older version, rebuilding...")
+
+        # 2) If parquet not loaded, try SQLite DB
+        if DF is None and os.path.exists(DB_PATH):
+            try:
+                print(f"Loading data from SQLite DB: {DB_PATH}...")
+                load_from_db()
+                LOAD_STATUS["source"] = "sqlite"
+            except Exception as e:
+                print(f"Error loading from DB: {e}")
+                DF = None
+
+        # 3) If still not loaded, fallback to CSV
+        if DF is None:
+            print("Loading from CSV as fallback...")
+            load_from_csv()
+            LOAD_STATUS["source"] = "csv"
 
     print(f"Data Loaded: {len(DF)} rows")
-    compute_filter_options()
-    return DF
+    print_memory_usage_report(DF)
+    with load_phase("filter_options"):
+        compute_filter_options()
+    with load_phase("indexes"):
+        build_indexes()
+
+def shared_dataset_key():
+    """Names the shared copy of the current source data and cache layout."""
+    source = parquet_cache.source_fingerprint(cache_source_path(), content_hash=False)
+    payload = json.dumps({"source": source, "schema": parquet_cache.CACHE_SCHEMA_VERSION}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+def load_shared():
+    """
+    Attach the dataset other workers already published under SHARED_DIR, or
+    load and publish it first. Only one worker loads; the rest wait on the
+    publish lock and then attach.
+    """
+    global SHARED_KEY
+    key = shared_dataset_key()
+    # Rows ingested since the source was loaded are published under a derived key
+    current = shared_store.current_key(SHARED_DIR)
+    if current and current.startswith(f"{key}-"):
+        key = current
+    with load_phase("attach"):
+        attached = shared_store.attach(SHARED_DIR, key)
+    if attached is None:
+        with shared_store.publish_lock(SHARED_DIR):
+            # Another worker may have published while this one waited
+            attached = shared_store.attach(SHARED_DIR, key)
+            if attached is None:
+                load_private()
+                try:
+                    with load_phase("publish"):
+                        attached = publish_shared(key)
+                except Exception as e:
+                    print(f"Could not publish shared dataset, keeping a private copy: {e}")
+                    return
+    use_shared(*attached)
+    SHARED_KEY = key
+    LOAD_STATUS["source"] = f"shared:{LOAD_STATUS['source'] or 'attached'}"
+
+def publish_shared(key):
+    """Publish this process's dataset as shared version ``key`` (under publish_lock) and attach it."""
+    indexes = {
+        "facets": FACET_INDEXES, "tags": TAG_INDEX, "search": SEARCH_INDEXES,
+        "sort": SORT_INDEXES, "summary": SUMMARY_CUBE, "stats": COLUMN_STATS
+    }
+    shared_store.publish(SHARED_DIR, key, DF, indexes, FILTER_OPTIONS)
+    return shared_store.attach(SHARED_DIR, key)
+
+def use_shared(df, indexes, filter_options):
+    """Swap in a mapped dataset, dropping this process's private copy."""
+    swap_dataset(df, filter_options, indexes)
+    print(f"Attached shared dataset: {len(DF)} rows")
+
+def refresh_shared(force=False):
+    """
+    Attach the latest shared version if another worker published one (e.g.
+    after ingesting rows). Checks at most every SHARED_CHECK_SECONDS unless
+    ``force`` is set.
+    """
+    global SHARED_KEY, _SHARED_CHECKED_AT
+    if SHARED_KEY is None or not SHARED_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _SHARED_CHECKED_AT < SHARED_CHECK_SECONDS:
+        return
+    _SHARED_CHECKED_AT = now
+    key = shared_store.current_key(SHARED_DIR)
+    if key is None or key == SHARED_KEY:
+        return
+    try:
+        attached = shared_store.attach(SHARED_DIR, key)
+    except Exception as e:
+        # Replaced again while attaching; the next check picks up the newer one
+        print(f"Could not attach shared dataset {key}: {e}")
+        return
+    if attached is not None:
+        use_shared(*attached)
+        SHARED_KEY = key
+
+def swap_dataset(df, filter_options, indexes):
+    """
+    Replace DF and everything derived from it in one step, so a query never
+    sees columns and indexes of different versions, and retire cached results.
+    """
+    globals().update(
+        DF=df,
+        FILTER_OPTIONS=filter_options,
+        FACET_INDEXES=indexes["facets"],
+        TAG_INDEX=indexes["tags"],
+        SEARCH_INDEXES=indexes["search"],
+        SORT_INDEXES=indexes["sort"],
+        SUMMARY_CUBE=indexes["summary"],
+        COLUMN_STATS=indexes["stats"],
+        DATASET_VERSION=DATASET_VERSION + 1,
+    )
+    QUERY_CACHE.clear()
+
+def cache_source_path():
+    """The file the data is loaded from when the parquet cache is not usable."""
+    return DB_PATH if os.path.exists(DB_PATH) else CSV_PATH
+
+def save_parquet_cache(df, source_path):
+    if not PARQUET_PATH:
+        return
+    try:
+        print("Saving to Parquet cache...")
+        parquet_cache.save(df, PARQUET_PATH, source_path)
+    except Exception as e:
+        print(f"Could not save parquet: {e}")
+
+def build_indexes():
+    global FACET_INDEXES, TAG_INDEX, SEARCH_INDEXES, SORT_INDEXES, SUMMARY_CUBE, COLUMN_STATS, DATASET_VERSION
+    if DF is None:
+        return
+    DATASET_VERSION += 1
+    QUERY_CACHE.clear()
+    FACET_INDEXES = build_facet_indexes(DF)
+    TAG_INDEX = TagIndex.from_series(DF['Tags']) if 'Tags' in DF.columns else None
+    SEARCH_INDEXES = build_search_indexes(DF)
+    SORT_INDEXES = build_sort_indexes(DF)
+    SUMMARY_CUBE = SummaryCube.from_frame(DF) if 'Date' in DF.columns else None
+    COLUMN_STATS = ColumnStats.from_indexes(len(DF), FACET_INDEXES, TAG_INDEX)
+    print(f"Built row indexes ({sum(index_stats().values()) / 1024 ** 2:.2f} MB)")
+
+def index_stats():
+    """Bytes held by each family of row indexes."""
+    return {
+        "facets": sum(idx.nbytes for idx in (FACET_INDEXES or {}).values()),
+        "tags": TAG_INDEX.nbytes if TAG_INDEX is not None else 0,
+        "search": sum(idx.nbytes for idx in (SEARCH_INDEXES or {}).values()),
+        "sort": sum(idx.nbytes for idx in (SORT_INDEXES or {}).values()),
+        "summary": SUMMARY_CUBE.nbytes if SUMMARY_CUBE is not None else 0,
+    }
 
 def load_from_csv():
     global DF
     print(f"Loading data from CSV: {CSV_PATH}...")
     df = pd.read_csv(CSV_PATH)
-    df = df.rename(columns=COLUMN_MAPPING)
-    
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-    
-    for col in ['TotalAmount', 'FinalAmount', 'PricePerUnit']:
-        if col in df.columns and df[col].dtype == 'object':
-                df[col] = df[col].replace(r'[^0-9.-]', '', regex=True).astype(float)
-    
-    if 'Tags' in df.columns:
-            # Handle mixed delimiters (comma or pipe) and cleanup
-            df['Tags'] = df['Tags'].fillna('').astype(str).apply(lambda x: [t.strip() for t in x.replace('|', ',').split(',') if t.strip()])
-
-    df = df.fillna(np.nan).replace([np.nan], [None])
+    df = normalize_frame(df)
     
     DF = df
-    
-    try:
-        print("Saving to Parquet cache...")
-        df.to_parquet(PARQUET_PATH)
-    except Exception as e:
-        print(f"Could not save parquet: {e}")
+    save_parquet_cache(df, CSV_PATH)
 
     print(f"Data Loaded: {len(DF)} rows")
     compute_filter_options()
     return DF
 
+def split_tags(value):
+    """Split a raw Tags cell (comma or pipe delimited) into a list of tags."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, (tuple, np.ndarray)):
+        # Parquet round-trips list columns as arrays
+        return [str(t) for t in value]
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    value = str(value)
+    if value.startswith('[') and value.endswith(']'):
+        # Fallback for string representations written by older caches
+        try:
+            import ast
+            return [str(t) for t in ast.literal_eval(value)]
+        except (ValueError, SyntaxError):
+            pass
+    return [t.strip() for t in value.replace('|', ',').split(',') if t.strip()]
+
+def normalize_frame(df):
+    """
+    Rename raw columns via COLUMN_MAPPING and coerce them to compact dtypes:
+    categoricals for low-cardinality columns, nullable Int64/Float64 for
+    numbers and datetime64 for Date. Missing values stay as NA/NaT here and
+    only become None when a page is serialized to JSON.
+    """
+    df = df.rename(columns=COLUMN_MAPPING)
+
+    if 'Date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['Date']):
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            values = df[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.replace(r'[^0-9.-]', '', regex=True)
+            df[col] = pd.to_numeric(values, errors='coerce').astype('Float64')
+
+    for col in INTEGER_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            try:
+                df[col] = values.astype('Int64')
+            except (TypeError, ValueError):
+                # Non-integral values present, keep them rather than truncating
+                df[col] = values.astype('Float64')
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    if 'Tags' in df.columns and not isinstance(df['Tags'].dtype, pd.CategoricalDtype):
+        # Parse once; each row keeps its tag list as one categorical label so
+        # repeated tag combinations share storage
+        df['Tags'] = df['Tags'].map(lambda v: TAG_SEPARATOR.join(split_tags(v))).astype('category')
+
+    return df
+
+def memory_usage_report(df=None):
+    """Return the in-memory footprint of each column (bytes, dtype) plus the total."""
+    df = DF if df is None else df
+    if df is None:
+        return {"columns": {}, "totalBytes": 0, "rows": 0}
+    usage = df.memory_usage(deep=True, index=True)
+    columns = {
+        col: {"dtype": str(df[col].dtype), "bytes": int(usage[col])}
+        for col in df.columns
+    }
+    return {
+        "columns": columns,
+        "indexBytes": int(usage['Index']),
+        "totalBytes": int(usage.sum()),
+        "rows": len(df)
+    }
+
+def print_memory_usage_report(df=None):
+    report = memory_usage_report(df)
+    print(f"Memory usage ({report['rows']} rows):")
+    for col, info in sorted(report['columns'].items(), key=lambda kv: -kv[1]['bytes']):
+        print(f"  {col:<20} {info['dtype']:<16} {info['bytes'] / 1024 ** 2:10.2f} MB")
+    print(f"  {'TOTAL':<37} {report['totalBytes'] / 1024 ** 2:10.2f} MB")
+
 def compute_filter_options():
     global FILTER_OPTIONS
     if DF is None: 
         return
-    
+    FILTER_OPTIONS = filter_options_for(DF)
+
+def filter_options_for(df):
+    # Tag combinations are the categories of the Tags column, so the full
+    # tag vocabulary is exact and cheap to collect
     all_tags = set()
-    if 'Tags' in DF.columns:
-        sample = DF['Tags'].head(100000)
-        for tags in sample:
-            if isinstance(tags, list):
-                all_tags.update(tags)
-            elif isinstance(tags, str):
-                # Fallback if parquet loaded as string representation
-                try:
-                    import ast
-                    if tags.startswith('[') and tags.endswith(']'):
-                        l = ast.literal_eval(tags)
-                        all_tags.update(l)
-                except:
-                    pass
+    if 'Tags' in df.columns:
+        for label in df['Tags'].cat.categories:
+            all_tags.update(split_tag_label(label))
             
-    FILTER_OPTIONS = {
-        "regions": sorted(DF['CustomerRegion'].dropna().unique().tolist()) if 'CustomerRegion' in DF.columns else [],
-        "productCategories": sorted(DF['ProductCategory'].dropna().unique().tolist()) if 'ProductCategory' in DF.columns else [],
-        "paymentMethods": sorted(DF['PaymentMethod'].dropna().unique().tolist()) if 'PaymentMethod' in DF.columns else [],
+    return {
+        "regions": sorted(df['CustomerRegion'].dropna().unique().tolist()) if 'CustomerRegion' in df.columns else [],
+        "productCategories": sorted(df['ProductCategory'].dropna().unique().tolist()) if 'ProductCategory' in df.columns else [],
+        "paymentMethods": sorted(df['PaymentMethod'].dropna().unique().tolist()) if 'PaymentMethod' in df.columns else [],
         "tags": sorted(list(all_tags))
     }
 
-def get_filter_options():
+def get_filter_options(q=None, filters=None):
+    """
+    The selectable filter values. When ``q`` or ``filters`` is given, also
+    the number of matching rows per value of every facet (see facet_counts).
+    """
+    if ENGINE == 'sqlite':
+        return get_sql_engine().get_filter_options(q, filters)
     if FILTER_OPTIONS is None:
         load_data()
-    return FILTER_OPTIONS
+    if q is None and filters is None:
+        return FILTER_OPTIONS
+    return dict(FILTER_OPTIONS, **facet_counts(q, filters))
+
+# Filter key -> key its per-value counts are reported under
+FACET_COUNT_KEYS = {
+    "customerRegions": "regions",
+    "genders": "genders",
+    "productCategories": "productCategories",
+    "paymentMethods": "paymentMethods",
+    "tags": "tags",
+}
+
+def facet_counts(q='', filters=None):
+    """
+    Per-value row counts for every facet under the current query.
+
+    Each facet is counted under all the other filters but not its own, so the
+    counts show what selecting another value of that facet would give. Every
+    filter is resolved to a packed bitmap once; a facet's counts are then the
+    popcounts of its value bitmaps ANDed with the other facets' selection.
+    """
+    filters = parse_filters(filters)
+    n_rows = len(DF)
+    # Search and range filters apply to every facet
+    ranges = {key: filters[key] for key in ('ageRange', 'dateRange') if key in filters}
+    base = planner.execute(query_predicates(q, ranges), n_rows, check_deadline)
+    if base is not None:
+        base = bitmap_from_ids(base, n_rows)
 
-def get_transactions(page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None):
+    indexes, selections = {}, {}
+    for key, column in FACET_COLUMNS.items():
+        if column in FACET_INDEXES:
+            indexes[key] = FACET_INDEXES[column]
+            selections[key] = select_facets(FACET_INDEXES, {key: filters.get(key)}, n_rows)
+    if TAG_INDEX is not None:
+        tags = filters.get('tags')
+        indexes['tags'] = TAG_INDEX
+        selections['tags'] = TAG_INDEX.lookup([tags] if isinstance(tags, str) else tags) if tags else None
+
+    def combined(skip=None):
+        result = base
+        for key, bits in selections.items():
+            if key != skip and bits is not None:
+                result = bits if result is None else np.bitwise_and(result, bits)
+        return result
+
+    with metrics.stage("facet_counts"):
+        counts = {FACET_COUNT_KEYS[key]: index.counts(combined(skip=key)) for key, index in indexes.items()}
+        matching = combined()
+    return {"counts": counts, "total": n_rows if matching is None else int(popcount(matching))}
+
+def sorted_page(rows, sort_field, sort_dir, start, end):
+    """Row positions for ranks ``start:end`` of ``rows`` (None = all rows) under the requested sort."""
+    descending = (sort_dir != 'asc')
+    if sort_field in SORT_INDEXES:
+        return SORT_INDEXES[sort_field].page(rows, start, end, descending)
+    if rows is None:
+        rows = np.arange(len(DF))
+    if sort_field and sort_field in DF.columns:
+        values = DF[sort_field].take(rows).reset_index(drop=True)
+        order = values.sort_values(ascending=not descending, kind='stable').index.to_numpy()
+        return rows[order[start:end]]
+    return rows[start:end]
+
+def order_rows(rows, sort_field, sort_dir):
+    """Every row position of ``rows`` (None = all rows) in the requested sort order."""
+    descending = (sort_dir != 'asc')
+    if sort_field in SORT_INDEXES:
+        return SORT_INDEXES[sort_field].order(rows, descending)
+    return sorted_page(rows, sort_field, sort_dir, 0, len(DF) if rows is None else len(rows))
+
+def get_cache_stats():
+    return QUERY_CACHE.stats()
+
+class QueryTimeout(Exception):
+    """Raised at a checkpoint once the current request's deadline has passed."""
+
+# Per-thread request deadline (time.monotonic() value), checked between pipeline stages
+_DEADLINE = threading.local()
+
+@contextmanager
+def deadline(seconds):
+    """Give queries run inside this block ``seconds`` to finish (None = no limit)."""
+    previous = getattr(_DEADLINE, 'at', None)
+    _DEADLINE.at = time.monotonic() + seconds if seconds else None
+    try:
+        yield
+    finally:
+        _DEADLINE.at = previous
+
+def deadline_exceeded():
+    at = getattr(_DEADLINE, 'at', None)
+    return at is not None and time.monotonic() > at
+
+def check_deadline():
+    if deadline_exceeded():
+        raise QueryTimeout("Query exceeded its time limit")
+
+@lru_cache(maxsize=1024, typed=True)
+def cast_bound(value, kind):
+    """``coerce_value`` for range bounds; requests repeat the same few bounds, so casts are cached."""
+    return coerce_value(value, kind)
+
+# Range filter key -> the bound keys it accepts
+RANGE_BOUNDS = {"ageRange": ("min", "max"), "dateRange": ("from", "to")}
+
+def parse_filters(filters):
+    """
+    Decode a ``filters`` parameter and check its shape.
+
+    Undecodable JSON is treated as no filters. Facets and tags take a value or
+    a list of values; ranges take an object of optional numeric (ageRange) or
+    ISO date string (dateRange) bounds.
+
+    Raises:
+        ValueError: the decoded filters are not shaped like that
+    """
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except:
+            filters = {}
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError("filters must be a JSON object")
+    for key in [*FACET_COLUMNS, 'tags']:
+        values = filters.get(key)
+        if values is None or isinstance(values, str):
+            continue
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"filters.{key} must be a string or a list of strings")
+    for key, bounds in RANGE_BOUNDS.items():
+        value = filters.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f"filters.{key} must be an object with {bounds[0]!r}/{bounds[1]!r} bounds")
+        for bound in bounds:
+            limit = value.get(bound)
+            if key == 'ageRange':
+                valid = limit is None or isinstance(limit, (str, int, float)) and not isinstance(limit, bool)
+            else:
+                valid = limit is None or isinstance(limit, str)
+            if not valid:
+                raise ValueError(f"filters.{key}.{bound} must be a {'number' if key == 'ageRange' else 'date string'}")
+    return filters
+
+def range_bounds(filters, key, kind):
+    """
+    The (low, high) bounds of range filter ``key`` cast to a column of dtype
+    kind ``kind`` (see ``coerce_value``); None or "" leaves that end open.
+
+    Raises:
+        ValueError: a bound cannot be cast
+    """
+    value = filters.get(key) or {}
+    bounds = []
+    for bound in RANGE_BOUNDS[key]:
+        limit = value.get(bound)
+        try:
+            bounds.append(None if limit is None or limit == '' else cast_bound(limit, kind))
+        except ValueError as e:
+            raise ValueError(f"filters.{key}.{bound}: {e}") from None
+    return tuple(bounds)
+
+def parse_fields(fields):
+    """
+    Resolve a ``fields`` parameter to the list of columns to return.
+
+    Accepts a comma-separated string or a list of column names and
+    FIELD_PRESETS names, in the order the columns should appear.
+
+    Returns:
+        Column names, or None for every column (no fields, or "all")
+
+    Raises:
+        ValueError: a name is neither a column nor a preset
+    """
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+    if not fields or 'all' in fields:
+        return None
+    known = set(COLUMN_MAPPING.values())
+    columns = []
+    for name in fields:
+        if name not in FIELD_PRESETS and name not in known:
+            raise ValueError(f"Unknown field: {name}")
+        for column in FIELD_PRESETS.get(name, [name]):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def ordered_rows(q='', filters=None, sort_field='Date', sort_dir='desc'):
+    """Every matching row position in sort order, shared through the query cache."""
     load_data()
-    
-    filtered_df = DF
-    
-    if q:
-        q = q.lower()
-        mask = pd.Series(False, index=filtered_df.index)
-        if 'CustomerName' in filtered_df.columns:
-            mask |= filtered_df['CustomerName'].astype(str).str.lower().str.contains(q, na=False)
-        if 'PhoneNumber' in filtered_df.columns:
-            mask |= filtered_df['PhoneNumber'].astype(str).str.contains(q, na=False)
-        
-        filtered_df = filtered_df[mask]
-
-    if filters:
-        if isinstance(filters, str):
-            try:
-                filters = json.loads(filters)
-            except:
-                filters = {}
-        
-        if filters.get('customerRegions'):
-            filtered_df = filtered_df[filtered_df['CustomerRegion'].isin(filters['customerRegions'])]
-            
-        if filters.get('genders'):
-            filtered_df = filtered_df[filtered_df['Gender'].isin(filters['genders'])]
-            
-        if filters.get('productCategories'):
-            filtered_df = filtered_df[filtered_df['ProductCategory'].isin(filters['productCategories'])]
-            
-        if filters.get('paymentMethods'):
-            filtered_df = filtered_df[filtered_df['PaymentMethod'].isin(filters['paymentMethods'])]
-            
-        if filters.get('ageRange'):
-            ar = filters['ageRange']
-            min_a = ar.get('min', -float('inf'))
-            max_a = ar.get('max', float('inf'))
-            if 'Age' in filtered_df.columns:
-                filtered_df = filtered_df[(filtered_df['Age'] >= min_a) & (filtered_df['Age'] <= max_a)]
-        
-        if filters.get('dateRange'):
-            dr = filters['dateRange']
-            start = pd.to_datetime(dr.get('from')) if dr.get('from') else None
-            end = pd.to_datetime(dr.get('to')) if dr.get('to') else None
-            
-            if start:
-                filtered_df = filtered_df[filtered_df['Date'] >= start]
-            if end:
-                filtered_df = filtered_df[filtered_df['Date'] <= end]
-                
-        if filters.get('tags'):
-            target_tags = set(filters['tags'])
-            filtered_df = filtered_df[filtered_df['Tags'].apply(lambda x: bool(set(x) & target_tags) if isinstance(x, list) else False)]
-
-    if sort_field and sort_field in filtered_df.columns:
-        ascending = (sort_dir == 'asc')
-        filtered_df = filtered_df.sort_values(by=sort_field, ascending=ascending)
-
-    total = len(filtered_df)
+    filters = parse_filters(filters)
+    key = query_key(q, filters, sort_field, sort_dir, DATASET_VERSION)
+    with metrics.stage("cache") as st:
+        ordered = QUERY_CACHE.get(key) if QUERY_CACHE.enabled else None
+        if st is not None:
+            st["desc"] = "miss" if ordered is None else "hit"
+    if ordered is None:
+        rows = select_rows(q, filters)
+        check_deadline()
+        with metrics.stage("sort") as st:
+            ordered = order_rows(rows, sort_field, sort_dir)
+            if st is not None:
+                st["desc"] = sort_field if sort_field in SORT_INDEXES else f"{sort_field} unindexed"
+        QUERY_CACHE.put(key, ordered, shared=(rows is None and sort_field in SORT_INDEXES))
+    return ordered
+
+def encode_cursor(sort_field, sort_dir, row):
+    """Opaque keyset cursor pointing just past ``row`` in the given sort."""
+    payload = {"f": sort_field, "d": sort_dir, "r": int(row)}
+    if sort_field in SORT_INDEXES:
+        payload["v"] = SORT_INDEXES[sort_field].value_of(row)
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort_field, sort_dir):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        row = int(payload["r"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get("f") != sort_field or payload.get("d") != sort_dir:
+        raise ValueError("Cursor does not match the requested sort")
+    return payload.get("v"), row
+
+def cursor_position(ordered, cursor, sort_field, sort_dir):
+    """Index in ``ordered`` where the page after ``cursor`` starts."""
+    if not cursor:
+        return 0
+    value, row = decode_cursor(cursor, sort_field, sort_dir)
+    if sort_field in SORT_INDEXES:
+        return SORT_INDEXES[sort_field].seek(ordered, value, row, sort_dir != 'asc')
+    if not (sort_field and sort_field in DF.columns):
+        # Unsorted results are in row order
+        return int(np.searchsorted(ordered, row, side='right'))
+    # Columns without a SortIndex resume by locating the row itself
+    hits = np.flatnonzero(ordered == row)
+    return int(hits[0]) + 1 if len(hits) else len(ordered)
+
+def query_page(page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None, cursor=None):
+    """
+    Resolve a transactions request to (row positions of the page, total
+    matches, next cursor).
+
+    Passing ``cursor`` (empty string for the first page) switches to keyset
+    pagination: the page starts right after the cursor's sort key and row id
+    instead of at an offset, and a cursor for the following page is returned
+    (None after the last page).
+    """
+    load_data()
+    filters = parse_filters(filters)
+
+    if cursor is not None:
+        ordered = ordered_rows(q, filters, sort_field, sort_dir)
+        start = cursor_position(ordered, cursor, sort_field, sort_dir)
+        page_rows = ordered[start:start + page_size]
+        next_cursor = None
+        if start + page_size < len(ordered):
+            next_cursor = encode_cursor(sort_field, sort_dir, page_rows[-1])
+        return page_rows, len(ordered), next_cursor
+
     start = (page - 1) * page_size
     end = start + page_size
-    
+
+    # Paging through a query reuses its cached ordering
+    if QUERY_CACHE.enabled:
+        ordered = ordered_rows(q, filters, sort_field, sort_dir)
+        return ordered[start:end], len(ordered), None
+
+    rows = select_rows(q, filters)
+    check_deadline()
+    total = len(DF) if rows is None else len(rows)
     if start >= total:
-        data = []
-    else:
-        page_df = filtered_df.iloc[start:end]
-        
-        page_df = page_df.copy()
-        if 'Date' in page_df.columns:
-             page_df['Date'] = page_df['Date'].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-             
-        data = json.loads(page_df.to_json(orient='records', date_format='iso'))
+        return np.array([], dtype=np.int64), total, None
+    with metrics.stage("sort"):
+        page_rows = sorted_page(rows, sort_field, sort_dir, start, end)
+    return page_rows, total, None
 
-    return {
+def check_paging(page, page_size):
+    """Raise ValueError unless ``page`` and ``page_size`` are positive integers (not bools)."""
+    for name, value in (("page", page), ("pageSize", page_size)):
+        if not isinstance(value, (int, np.integer)) or isinstance(value, bool) or value < 1:
+            raise ValueError(f"{name} must be a positive integer")
+
+def get_transactions(page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None, cursor=None, fields=None):
+    """
+    One page of matching transactions. ``fields`` (see parse_fields) limits
+    the columns gathered and returned.
+    """
+    check_paging(page, page_size)
+    if ENGINE == 'sqlite':
+        return get_sql_engine().get_transactions(page, page_size, sort_field, sort_dir, q, filters, cursor, fields)
+    columns = parse_fields(fields)
+    page_rows, total, next_cursor = query_page(page, page_size, sort_field, sort_dir, q, filters, cursor)
+    with metrics.stage("serialize"):
+        data = page_records(DF, page_rows, columns)
+    result = {
         "data": data,
         "page": page,
         "pageSize": page_size,
         "total": total
     }
+    if cursor is not None:
+        result["nextCursor"] = next_cursor
+    return result
+
+def get_transactions_json(page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None, cursor=None, fields=None):
+    """Same response as get_transactions, encoded once straight to JSON bytes."""
+    check_paging(page, page_size)
+    if ENGINE == 'sqlite':
+        return get_sql_engine().get_transactions_json(page, page_size, sort_field, sort_dir, q, filters, cursor, fields)
+    columns = parse_fields(fields)
+    page_rows, total, next_cursor = query_page(page, page_size, sort_field, sort_dir, q, filters, cursor)
+    extra = {"nextCursor": next_cursor} if cursor is not None else {}
+    with metrics.stage("serialize"):
+        return encode_page(DF, page_rows, page, page_size, total, columns=columns, **extra)
+
+def export_transactions(fmt='csv', sort_field='Date', sort_dir='desc', q='', filters=None, fields=None):
+    """
+    Stream the full filtered, sorted result set as CSV or NDJSON chunks.
+
+    Only the ordered row ids are held for the whole export; rows are gathered
+    and encoded EXPORT_CHUNK_ROWS at a time, limited to ``fields``.
+    """
+    columns = parse_fields(fields)
+    # Validated before streaming starts, so a bad filter is a 400 and not a broken download
+    filters = parse_filters(filters)
+    if ENGINE == 'sqlite':
+        return get_sql_engine().export_transactions(fmt, sort_field, sort_dir, q, filters, EXPORT_CHUNK_ROWS, columns)
+    rows = ordered_rows(q, filters, sort_field, sort_dir)
+    if fmt == 'ndjson':
+        return iter_ndjson(DF, rows, EXPORT_CHUNK_ROWS, columns)
+    return iter_csv(DF, rows, EXPORT_CHUNK_ROWS, columns)
+
+def get_summary(q='', filters=None):
+    """
+    Totals and region/category/month breakdowns over the rows matching
+    ``q``/``filters``. Filter-only queries are answered from SUMMARY_CUBE.
+    """
+    if ENGINE == 'sqlite':
+        return get_sql_engine().get_summary(q, filters)
+    filters = parse_filters(filters)
+    # The cube reads dateRange itself; an uncastable bound is still a ValueError naming the filter
+    range_bounds(filters, 'dateRange', 'M')
+    if SUMMARY_CUBE is not None and SUMMARY_CUBE.can_answer(q, filters):
+        with metrics.stage("summary.cube"):
+            return summarize(SUMMARY_CUBE.cells(filters), source='cube')
+    rows = select_rows(q, filters)
+    check_deadline()
+    with metrics.stage("summary.rows"):
+        return summarize(measure_frame(DF, rows), source='rows')
+
+def get_batch(queries):
+    """
+    Answer several queries in one call, e.g. a page, the page after it and
+    the filter options of the same search.
+
+    Queries with the same ``q``/filters share one evaluation of them (see
+    shared_selections); each of their pages and sorts is served from those
+    rows, orderings through the query cache as usual. The SQLite engine runs
+    the queries one after another.
+
+    Args:
+        queries: Dicts of a "type" (a BATCH_FUNCTIONS key) and that
+            function's keyword arguments
+
+    Returns:
+        One result per query, in order; a query with an invalid cursor or
+        field gets {"error": message} instead
+    """
+    load_data()
+    results = []
+    with shared_selections():
+        for query in queries:
+            query = dict(query)
+            fn = BATCH_FUNCTIONS[query.pop("type", "transactions")]
+            try:
+                results.append(fn(**query))
+            except ValueError as e:
+                results.append({"error": str(e)})
+            check_deadline()
+    return results
+
+def get_batch_json(queries):
+    """get_batch results as a {"results": [...]} body, encoded once to JSON bytes."""
+    results = get_batch(queries)
+    with metrics.stage("encode"):
+        return dumps({"results": results})
+
+# Query types of a batch -> function answering them
+BATCH_FUNCTIONS = {
+    "transactions": get_transactions,
+    "filterOptions": get_filter_options,
+    "summary": get_summary,
+}
+
+# Row selections of the batch being served on this thread (None outside one)
+_BATCH = threading.local()
+
+@contextmanager
+def shared_selections():
+    """Within this block, select_rows evaluates each distinct q/filters only once."""
+    previous = getattr(_BATCH, 'rows', None)
+    _BATCH.rows = {}
+    try:
+        yield
+    finally:
+        _BATCH.rows = previous
+
+def select_rows(q, filters):
+    """
+    Resolve search and filters to the sorted row positions that match, or
+    None when nothing is filtered out.
+    """
+    shared = getattr(_BATCH, 'rows', None)
+    if shared is not None:
+        key = query_key(q, filters, None, None, DATASET_VERSION)
+        if key in shared:
+            with metrics.stage("select") as st:
+                if st is not None:
+                    st["desc"] = "shared"
+            return shared[key]
+    # The planner runs the predicates most selective per unit of work first and
+    # checks the expensive ones on the surviving candidates only; only the rows
+    # of the requested page are ever gathered from DF
+    rows = planner.execute(query_predicates(q, filters), len(DF), check_deadline)
+    if shared is not None:
+        shared[key] = rows
+    return rows
+
+def query_predicates(q, filters):
+    """The search and filters of a request as planner Predicates over DF."""
+    n_rows = len(DF)
+    predicates = []
+
+    def bitmap_predicate(name, column, index, values):
+        values = [values] if isinstance(values, str) else list(values)
+        return Predicate(
+            name,
+            COLUMN_STATS.fraction_of(column, values),
+            full_cost=len(values) * n_rows / 8 * planner.BITMAP_BYTE_COST,
+            row_cost=len(values) * planner.BIT_TEST_COST,
+            full=lambda: index.lookup(values),
+            restrict=lambda rows: index.contains(values, rows),
+        )
+
+    def range_predicate(name, column, low, high):
+        # The column's SortIndex is its range index: matching rows are one slice of it
+        index = SORT_INDEXES[column]
+        matches = index.count_between(low, high)
+        return Predicate(
+            name,
+            matches / n_rows if n_rows else 1.0,
+            full_cost=n_rows * planner.MASK_FILL_COST + matches * planner.ROW_SCATTER_COST,
+            row_cost=planner.RANK_TEST_COST,
+            full=lambda: bitmap_from_ids(index.between(low, high), n_rows),
+            restrict=lambda rows: index.within(rows, low, high),
+            lookup=lambda: np.sort(index.between(low, high)),
+            lookup_cost=matches * planner.SORT_ROW_COST,
+        )
+
+    for key, column in FACET_COLUMNS.items():
+        if filters.get(key) and column in FACET_INDEXES:
+            predicates.append(bitmap_predicate(f"filter.{key}", column, FACET_INDEXES[column], filters[key]))
+    if filters.get('tags') and TAG_INDEX is not None:
+        predicates.append(bitmap_predicate("filter.tags", "Tags", TAG_INDEX, filters['tags']))
+
+    if filters.get('ageRange') and 'Age' in SORT_INDEXES:
+        low, high = range_bounds(filters, 'ageRange', SORT_INDEXES['Age'].values.dtype.kind)
+        # Rows without an age never match an age filter, even an open-ended one
+        predicates.append(range_predicate("filter.ageRange", 'Age', low, high))
+    if filters.get('dateRange') and 'Date' in SORT_INDEXES:
+        start, end = range_bounds(filters, 'dateRange', SORT_INDEXES['Date'].values.dtype.kind)
+        if start is not None or end is not None:
+            predicates.append(range_predicate("filter.dateRange", 'Date', start, end))
+
+    if q:
+        values, rows = 0, 0
+        for index in SEARCH_INDEXES.values():
+            index_values, index_rows = index.estimate(q)
+            values += index_values
+            rows += index_rows
+        predicates.append(Predicate(
+            "search",
+            min(1.0, rows / n_rows) if n_rows else 1.0,
+            full_cost=values * planner.TEXT_VALUE_COST + rows * planner.POSTING_ROW_COST + n_rows / 8 * planner.BITMAP_BYTE_COST,
+            row_cost=len(SEARCH_INDEXES) * planner.TEXT_ROW_COST,
+            full=lambda: search_bitmap(SEARCH_INDEXES, q, n_rows),
+            restrict=lambda rows: np.logical_or.reduce(
+                [contains_text(DF[column].take(rows), q) for column in SEARCH_INDEXES] or [np.zeros(len(rows), dtype=bool)]
+            ),
+        ))
+    return predicates
 
 def load_from_db():
     """Load data from SQLite database table `transactions` if present."""
@@ -257,28 +1056,134 @@ def load_from_db():
             new_cols[c] = nc
         df = df.rename(columns=new_cols)
 
-    # Apply consistent COLUMN_MAPPING (rename to friendly keys)
-    df = df.rename(columns=COLUMN_MAPPING)
+    # Apply consistent COLUMN_MAPPING (rename to friendly keys) and typed layout
+    df = normalize_frame(df)
+    DF = df
+    save_parquet_cache(df, DB_PATH)
 
-    # Same cleaning as CSV path
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    compute_filter_options()
+    return DF
 
-    for col in ['TotalAmount', 'FinalAmount', 'PricePerUnit']:
-        if col in df.columns and df[col].dtype == 'object':
-                df[col] = df[col].replace(r'[^0-9.-]', '', regex=True).astype(float)
+def extend_frame(delta):
+    """
+    DF with the normalized rows of ``delta`` appended, and every derived
+    structure (filter options, facet/tag/search/sort indexes, summary cube)
+    extended with just those rows instead of rebuilt over the whole dataset.
 
-    if 'Tags' in df.columns:
-            df['Tags'] = df['Tags'].fillna('').astype(str).apply(lambda x: [t.strip() for t in x.replace('|', ',').split(',') if t.strip()])
+    Nothing is swapped in; pass the result to swap_dataset.
 
-    df = df.fillna(np.nan).replace([np.nan], [None])
-    DF = df
+    Returns:
+        (df, filter_options, indexes)
+    """
+    delta = delta.reindex(columns=DF.columns)
+    old, new = {}, {}
+    for col in DF.columns:
+        current, added = DF[col], delta[col]
+        if isinstance(current.dtype, pd.CategoricalDtype):
+            # Both sides share the union of categories, so codes stay comparable
+            categories = current.cat.categories.union(added.astype('category').cat.categories)
+            dtype = pd.CategoricalDtype(categories)
+            old[col] = current.cat.set_categories(categories)
+            new[col] = added.astype(dtype)
+        elif added.dtype != current.dtype:
+            try:
+                new[col] = added.astype(current.dtype)
+            except (TypeError, ValueError):
+                pass
+    df = pd.concat([DF.assign(**old), delta.assign(**new)], ignore_index=True)
 
-    try:
-        print("Saving DB-loaded data to Parquet cache...")
-        df.to_parquet(PARQUET_PATH)
-    except Exception as e:
-        print(f"Could not save parquet: {e}")
+    n_rows = len(DF)
+    tail = df.iloc[n_rows:]
+    indexes = {
+        "facets": {column: index.append(tail[column]) for column, index in FACET_INDEXES.items()},
+        "tags": TAG_INDEX.append(tail['Tags']) if TAG_INDEX is not None else None,
+        "search": {column: index.append(tail[column]) for column, index in SEARCH_INDEXES.items()},
+        "sort": {column: index.append(tail[column]) for column, index in SORT_INDEXES.items()},
+        "summary": SUMMARY_CUBE.append(tail) if SUMMARY_CUBE is not None else None,
+    }
+    indexes["stats"] = ColumnStats.from_indexes(len(df), indexes["facets"], indexes["tags"])
+    added_options = filter_options_for(tail)
+    filter_options = {
+        key: sorted(set(values).union(added_options.get(key, [])))
+        for key, values in FILTER_OPTIONS.items()
+    }
+    return df, filter_options, indexes
 
-    compute_filter_options()
-    return DF
+def ingest_csv(path):
+    """
+    Add the transactions of a delta CSV (same header as the dataset) to the
+    running dataset without reloading it.
+
+    The rows are appended to DB_PATH when it exists, so they survive a
+    restart; otherwise they live only in memory (and in the shared store).
+    The extended dataset is built before the database write and swapped in
+    only after it commits, so a failure in either step changes neither.
+    With a shared store the extended dataset is republished and the other
+    workers attach it on their next query.
+
+    Returns:
+        dict with the rows ingested, the new row count and dataset version,
+        and whether the rows were persisted to the database
+    """
+    global DATASET_VERSION, SHARED_KEY
+    load_data()
+    shared = SHARED_KEY is not None
+    started = time.perf_counter()
+    with INGEST_LOCK, (shared_store.publish_lock(SHARED_DIR) if shared else nullcontext()):
+        # Build on whatever another worker last ingested
+        refresh_shared(force=True)
+        delta = extended = None
+        if ENGINE != 'sqlite':
+            # Validate and build everything before anything is written to the database
+            delta = normalize_frame(pd.read_csv(path))
+            unknown = set(delta.columns) - set(DF.columns)
+            if unknown:
+                raise ValueError(f"Unknown columns in ingested CSV: {sorted(unknown)}")
+            extended = extend_frame(delta)
+
+        persisted = os.path.exists(DB_PATH)
+        if persisted:
+            # Imported here: import_csv_to_sqlite imports this module
+            try:
+                from src.import_csv_to_sqlite import append_csv_to_sqlite
+            except ImportError:
+                from import_csv_to_sqlite import append_csv_to_sqlite
+            ingested = append_csv_to_sqlite(path, DB_PATH)
+
+        if delta is None:
+            # The engine reads the table directly; only cached results are stale
+            DATASET_VERSION += 1
+            QUERY_CACHE.clear()
+            rows = get_sql_engine().connection().execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        else:
+            ingested = len(delta)
+            swap_dataset(*extended)
+            rows = len(DF)
+            if shared:
+                key = f"{shared_dataset_key()}-{rows}"
+                use_shared(*publish_shared(key))
+                SHARED_KEY = key
+    print(f"Ingested {ingested} rows in {time.perf_counter() - started:.2f}s ({rows} rows total)")
+
+    if persisted and delta is not None:
+        # The cache now lags the database; rewrite it off the request path
+        thread = threading.Thread(target=refresh_parquet_cache, args=(DATASET_VERSION,), name="parquet-cache", daemon=True)
+        thread.start()
+    return {"ingested": ingested, "rows": rows, "datasetVersion": DATASET_VERSION, "persisted": persisted}
+
+def refresh_parquet_cache(version):
+    """Rewrite the parquet cache after an ingest, unless another one has happened since."""
+    shared = SHARED_KEY is not None
+    with INGEST_LOCK, (shared_store.publish_lock(SHARED_DIR) if shared else nullcontext()):
+        if DATASET_VERSION == version:
+            save_parquet_cache(DF, DB_PATH)
+
+def ingest_csv_text(text):
+    """ingest_csv for CSV content received as a string (e.g. a request body)."""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return ingest_csv(path)
+    finally:
+        os.remove(path)
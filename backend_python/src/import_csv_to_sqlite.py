@@ -1,7 +1,28 @@
+import argparse
+import io
 import os
+import re
 import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
-from pathlib import Path
+
+try:
+    from src.data_processor import COLUMN_MAPPING, FLOAT_COLUMNS, INTEGER_COLUMNS, split_tags
+    from src.indexes import TAG_SEPARATOR
+    from src.sql_engine import (
+        SQLiteEngine, TAGS_TABLE, create_tags_table, drop_derived, index_tags_table, is_current, mark_current, quote,
+        table_signature
+    )
+except ImportError:
+    from data_processor import COLUMN_MAPPING, FLOAT_COLUMNS, INTEGER_COLUMNS, split_tags
+    from indexes import TAG_SEPARATOR
+    from sql_engine import (
+        SQLiteEngine, TAGS_TABLE, create_tags_table, drop_derived, index_tags_table, is_current, mark_current, quote,
+        table_signature
+    )
 
 # Determine CSV path (same logic as data_processor)
 CSV_PATH_LOCAL = os.path.join(os.path.dirname(__file__), "../truestate_assignment_dataset.csv")
@@ -14,18 +35,45 @@ def get_csv_path():
         return CSV_PATH_REPO
     raise FileNotFoundError("Could not find truestate_assignment_dataset.csv in repo")
 
-CSV_PATH = get_csv_path()
+try:
+    CSV_PATH = get_csv_path()
+except FileNotFoundError:
+    # Still importable (and usable with --csv) without the bundled dataset
+    CSV_PATH = None
 DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../truestate.db"))
 
 CHUNK_SIZE = 10000
 TABLE_NAME = 'transactions'
 
+# Bulk mode: bytes of CSV handed to each parse task
+BULK_BLOCK_BYTES = 8 * 1024 * 1024
+# Durability is pointless while the table is being rebuilt from the CSV
+LOAD_PRAGMAS = [
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA locking_mode=EXCLUSIVE",
+]
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Friendly columns stored as whole numbers even when the CSV has gaps
+INTEGER_FIELDS = set(INTEGER_COLUMNS)
+# Identifiers: INTEGER when the sample holds only plain integers, else TEXT.
+# They are never coerced, so a value that does not fit fails the import.
+ID_FIELDS = {"TransactionID"}
+# Kept exactly as written in the CSV ("+91 ...", leading zeros, extensions)
+TEXT_FIELDS = {"PhoneNumber"}
+# An integer that survives a round trip through INTEGER unchanged
+PLAIN_INTEGER = re.compile(r'-?(0|[1-9][0-9]*)')
+
 
 def import_csv_to_sqlite(csv_path=CSV_PATH, db_path=DB_PATH, chunk_size=CHUNK_SIZE):
+    csv_path = csv_path or get_csv_path()
     print(f"Importing CSV {csv_path} into SQLite DB {db_path} (table='{TABLE_NAME}')")
 
     conn = sqlite3.connect(db_path)
     try:
+        drop_derived(conn)
+        conn.commit()
         first = True
         total = 0
         for chunk in pd.read_csv(csv_path, chunksize=chunk_size, low_memory=False):
@@ -40,5 +88,336 @@ def import_csv_to_sqlite(csv_path=CSV_PATH, db_path=DB_PATH, chunk_size=CHUNK_SI
         conn.close()
 
 
+def infer_schema(csv_path, sample_rows=CHUNK_SIZE):
+    """
+    Column -> SQLite type for the raw CSV header.
+
+    Known columns get fixed types (Date as TEXT in DATE_FORMAT, amounts as
+    REAL, phone numbers as TEXT, IDs as INTEGER only if the sample is all
+    plain integers); the rest keep the type pandas infers from a sample, as
+    to_sql did.
+    """
+    sample = pd.read_csv(csv_path, nrows=sample_rows, low_memory=False, dtype=_raw_text_dtypes(csv_path))
+    schema = {}
+    for col in sample.columns:
+        field = COLUMN_MAPPING.get(col, col)
+        if field in TEXT_FIELDS:
+            schema[col] = 'TEXT'
+        elif field in ID_FIELDS:
+            present = sample[col].dropna()
+            schema[col] = 'INTEGER' if present.str.fullmatch(PLAIN_INTEGER).all() else 'TEXT'
+        elif field in INTEGER_FIELDS:
+            schema[col] = 'INTEGER'
+        elif field in FLOAT_COLUMNS:
+            schema[col] = 'REAL'
+        elif field in ('Date', 'Tags'):
+            schema[col] = 'TEXT'
+        elif pd.api.types.is_integer_dtype(sample[col]):
+            schema[col] = 'INTEGER'
+        elif pd.api.types.is_float_dtype(sample[col]):
+            schema[col] = 'REAL'
+        else:
+            schema[col] = 'TEXT'
+    return schema
+
+
+def _raw_text_dtypes(csv_path):
+    """read_csv dtypes that keep ID and TEXT_FIELDS columns as the text in the file."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return {col: object for col in header if COLUMN_MAPPING.get(col, col) in ID_FIELDS | TEXT_FIELDS}
+
+
+def _integer_ids(col, values):
+    """
+    Raw ID strings -> ints (missing -> None).
+
+    Raises:
+        ValueError: a value is not a plain integer; storing it in an INTEGER
+            column would drop or rewrite it
+    """
+    present = values.notna()
+    bad = present & ~values.where(present, '0').str.fullmatch(PLAIN_INTEGER)
+    if bad.any():
+        raise ValueError(
+            f"Column {col!r} is stored as INTEGER but {values[bad].iloc[0]!r} is not a plain integer; "
+            f"rebuild the table so the column is imported as TEXT"
+        )
+    return [int(v) if p else None for v, p in zip(values.tolist(), present.tolist())]
+
+
+def split_blocks(csv_path, block_bytes=BULK_BLOCK_BYTES):
+    """
+    Byte ranges covering the CSV body. Each range owns the lines that start
+    inside it; assumes quoted fields never contain newlines.
+    """
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        body_start = f.tell()
+    size = os.path.getsize(csv_path)
+    return [(start, min(start + block_bytes, size)) for start in range(body_start, size, block_bytes)]
+
+
+def _read_block(csv_path, start, end):
+    with open(csv_path, 'rb') as f:
+        f.seek(start - 1)
+        f.readline()
+        pos = f.tell()
+        if pos >= end:
+            return b''
+        data = f.read(end - pos)
+        if not data.endswith(b'\n'):
+            data += f.readline()
+        return data
+
+
+def _python_values(values):
+    """Column values as a list of Python objects with missing values as None."""
+    missing = values.isna()
+    if not missing.any():
+        return values.tolist()
+    return values.astype(object).where(~missing, None).tolist()
+
+
+def _map_distinct(values, func):
+    """Apply ``func`` once per distinct value (dates and tag lists repeat a lot)."""
+    lookup = {v: func(v) for v in pd.unique(values)}
+    return [lookup[v] for v in values]
+
+
+def _format_dates(values):
+    """Normalize raw date strings to DATE_FORMAT (None if unparseable), parsing each distinct value once."""
+    distinct = pd.unique(values)
+    parsed = pd.to_datetime(pd.Series(distinct, dtype=object), errors='coerce')
+    formatted = _python_values(parsed.dt.strftime(DATE_FORMAT))
+    lookup = dict(zip(distinct, formatted))
+    return [lookup[v] for v in values]
+
+
+def parse_block(csv_path, start, end, schema):
+    """
+    Parse and normalize one byte range of the CSV (runs in a worker process).
+
+    Returns:
+        (rows, tag_rows, tag_values): rows as tuples in ``schema`` column
+        order, plus one (row index within the block, tag) pair per tag
+    """
+    data = _read_block(csv_path, start, end)
+    columns = list(schema)
+    if not data.strip():
+        return [], [], []
+    # Numbers go through the C parser; everything else, IDs and phone numbers stay as raw text
+    text_dtypes = {
+        col: object for col, sql_type in schema.items()
+        if sql_type == 'TEXT' or COLUMN_MAPPING.get(col, col) in ID_FIELDS | TEXT_FIELDS
+    }
+    df = pd.read_csv(io.BytesIO(data), header=None, names=columns, dtype=text_dtypes, low_memory=False)
+
+    tag_rows, tag_values = [], []
+    converted = []
+    for col in columns:
+        field = COLUMN_MAPPING.get(col, col)
+        values = df[col]
+        if field == 'Date':
+            converted.append(_format_dates(values.to_numpy()))
+            continue
+        if field == 'Tags':
+            tag_lists = _map_distinct(values.to_numpy(), lambda v: tuple(split_tags(v)))
+            for i, tags in enumerate(tag_lists):
+                for tag in tags:
+                    tag_rows.append(i)
+                    tag_values.append(tag)
+            converted.append([TAG_SEPARATOR.join(t) if t else None for t in tag_lists])
+            continue
+        if field in ID_FIELDS and schema[col] == 'INTEGER':
+            converted.append(_integer_ids(col, values))
+            continue
+        if field in ID_FIELDS | TEXT_FIELDS:
+            converted.append(_python_values(values))
+            continue
+        if schema[col] in ('REAL', 'INTEGER') and not pd.api.types.is_numeric_dtype(values):
+            if schema[col] == 'REAL':
+                values = values.astype(str).str.replace(r'[^0-9.-]', '', regex=True)
+            values = pd.to_numeric(values, errors='coerce')
+        if schema[col] == 'INTEGER' and pd.api.types.is_float_dtype(values):
+            whole = values.notna() & (values == values.round())
+            if whole.all():
+                values = values.astype('int64')
+            else:
+                # Gaps or non-integral values: keep floats for those rows only
+                values = values.astype(object).where(values.notna(), None)
+                values[whole] = values[whole].astype('int64')
+        converted.append(_python_values(values))
+    return list(zip(*converted)), tag_rows, tag_values
+
+
+def _parsed_blocks(pool, workers, csv_path, blocks, schema):
+    """Yield parse_block results in file order, keeping at most 2 blocks per worker in flight."""
+    if pool is None:
+        for start, end in blocks:
+            yield parse_block(csv_path, start, end, schema)
+        return
+    pending = deque()
+    for start, end in blocks:
+        pending.append(pool.submit(parse_block, csv_path, start, end, schema))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def bulk_import_csv_to_sqlite(csv_path=CSV_PATH, db_path=DB_PATH, workers=None, block_bytes=BULK_BLOCK_BYTES):
+    """
+    Rebuild the transactions table from the CSV as fast as possible.
+
+    Blocks of the CSV are parsed and normalized in a process pool while the
+    main process inserts them, in file order, inside a single transaction with
+    load-time pragmas. Tags are split into a child table, and indexes on the
+    columns the API filters and sorts by are created after the load.
+    """
+    csv_path = csv_path or get_csv_path()
+    print(f"Bulk importing CSV {csv_path} into SQLite DB {db_path} (table='{TABLE_NAME}')")
+    started = time.perf_counter()
+    schema = infer_schema(csv_path)
+    blocks = split_blocks(csv_path, block_bytes)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    total = 0
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute("BEGIN")
+        # Nothing built from the old table may survive it, or it would pass for current
+        drop_derived(conn)
+        conn.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}")
+        conn.execute(
+            f"CREATE TABLE {TABLE_NAME} ("
+            + ", ".join(f"{quote(col)} {sql_type}" for col, sql_type in schema.items()) + ")"
+        )
+        create_tags_table(conn)
+        # Rowids of a new table are assigned 1, 2, ... in insert order
+        insert_rows = (
+            f"INSERT INTO {TABLE_NAME} ({', '.join(quote(c) for c in schema)}) "
+            f"VALUES ({', '.join('?' * len(schema))})"
+        )
+        insert_tags = f"INSERT INTO {TAGS_TABLE} VALUES (?, ?)"
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # A single worker parses inline rather than paying to pickle every block
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for rows, tag_rows, tag_values in _parsed_blocks(pool, workers, csv_path, blocks, schema):
+                first_rowid = total + 1
+                conn.executemany(insert_rows, rows)
+                conn.executemany(insert_tags, zip([first_rowid + i for i in tag_rows], tag_values))
+                total += len(rows)
+                print(f"Imported block: {len(rows)} rows (total: {total})")
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+        index_tags_table(conn)
+        mark_current(conn, 'tags', table_signature(conn))
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    loaded = time.perf_counter()
+
+    # Query indexes and the search table are built after the rows are in
+    SQLiteEngine(db_path)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Import completed. Total rows imported: {total} in {elapsed:.2f}s "
+        f"(load {loaded - started:.2f}s, indexes {elapsed - (loaded - started):.2f}s, "
+        f"{total / max(elapsed, 1e-9):,.0f} rows/s)"
+    )
+    return total
+
+
+def table_schema(conn):
+    """Column -> SQLite type of the existing transactions table, as infer_schema would give."""
+    schema = {}
+    for _, name, declared, *_ in conn.execute(f"PRAGMA table_info({TABLE_NAME})"):
+        declared = (declared or '').upper()
+        schema[name] = declared if declared in ('INTEGER', 'REAL') else 'TEXT'
+    return schema
+
+
+def append_csv_to_sqlite(csv_path, db_path=DB_PATH, block_bytes=BULK_BLOCK_BYTES):
+    """
+    Append the rows of a delta CSV (same header as the imported dataset) to
+    the transactions table in one transaction.
+
+    Rows are normalized exactly as the bulk import does. Their tags go into
+    the tags table and the FTS trigger indexes them for search, so query
+    structures that were up to date stay up to date instead of being rebuilt.
+
+    Returns:
+        Number of rows appended
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        schema = table_schema(conn)
+        if not schema:
+            raise RuntimeError(f"Table '{TABLE_NAME}' not found in {db_path}")
+        header = list(pd.read_csv(csv_path, nrows=0).columns)
+        if header != list(schema):
+            raise ValueError(f"Delta CSV columns {header} do not match the table columns {list(schema)}")
+
+        conn.execute("BEGIN IMMEDIATE")
+        signature = table_signature(conn)
+        in_step = [structure for structure in ('tags', 'fts') if is_current(conn, structure, signature)]
+        first_rowid = (conn.execute(f"SELECT MAX(rowid) FROM {TABLE_NAME}").fetchone()[0] or 0) + 1
+        insert_rows = (
+            f"INSERT INTO {TABLE_NAME} ({', '.join(quote(c) for c in schema)}) "
+            f"VALUES ({', '.join('?' * len(schema))})"
+        )
+        total = 0
+        for start, end in split_blocks(csv_path, block_bytes):
+            rows, tag_rows, tag_values = parse_block(csv_path, start, end, schema)
+            conn.executemany(insert_rows, rows)
+            if 'tags' in in_step:
+                conn.executemany(
+                    f"INSERT INTO {TAGS_TABLE} VALUES (?, ?)",
+                    zip([first_rowid + total + i for i in tag_rows], tag_values)
+                )
+            total += len(rows)
+        last_rowid = conn.execute(f"SELECT MAX(rowid) FROM {TABLE_NAME}").fetchone()[0]
+        if total and last_rowid != first_rowid + total - 1:
+            # Tags are keyed by the rowids the rows were expected to get
+            raise RuntimeError("Appended rows did not receive consecutive rowids")
+
+        signature = table_signature(conn)
+        for structure in in_step:
+            mark_current(conn, structure, signature)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"Appended {total} rows to {db_path} in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    return total
+
+
 if __name__ == '__main__':
-    import_csv_to_sqlite()
+    parser = argparse.ArgumentParser(description="Import the transactions CSV into SQLite")
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--workers', type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument('--legacy', action='store_true', help="Chunked DataFrame.to_sql import")
+    parser.add_argument('--append', metavar='DELTA_CSV', help="Append a delta CSV to the existing table instead of rebuilding it")
+    args = parser.parse_args()
+    if args.append:
+        append_csv_to_sqlite(args.append, args.db)
+    elif args.legacy:
+        import_csv_to_sqlite(args.csv, args.db)
+    else:
+        bulk_import_csv_to_sqlite(args.csv, args.db, args.workers)
@@ -0,0 +1,772 @@
+"""Precomputed row indexes over the in-memory transactions DataFrame.
+
+Row sets are represented as NumPy packed bitmaps (one bit per DataFrame row,
+``np.packbits`` layout) so that filters combine with cheap bitwise AND/OR and
+only the final set of row positions is ever materialized.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# API filter key -> DataFrame column for multi-select facets
+FACET_COLUMNS = {
+    "customerRegions": "CustomerRegion",
+    "genders": "Gender",
+    "productCategories": "ProductCategory",
+    "paymentMethods": "PaymentMethod",
+}
+
+# Separator used to store a row's tag list as a single categorical label
+TAG_SEPARATOR = ","
+
+# Columns matched by the free-text ``q`` search
+SEARCH_COLUMNS = ["CustomerName", "PhoneNumber"]
+
+# Columns with a presorted permutation; other columns fall back to sort_values
+SORT_COLUMNS = [
+    "Date", "CustomerName", "TotalAmount", "FinalAmount", "Quantity", "Age",
+    "PricePerUnit", "DiscountPercentage"
+]
+
+# Distinct values processed per block when extracting trigrams
+NGRAM_BUILD_CHUNK = 65536
+
+
+def empty_bitmap(n_rows):
+    return np.zeros((n_rows + 7) // 8, dtype=np.uint8)
+
+
+def full_bitmap(n_rows):
+    return np.packbits(np.ones(n_rows, dtype=bool))
+
+
+def bitmap_from_mask(mask):
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def bitmap_from_ids(ids, n_rows):
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[ids] = True
+    return np.packbits(mask)
+
+
+def bitmap_to_mask(bits, n_rows):
+    return np.unpackbits(bits, count=n_rows).view(bool)
+
+
+def bitmap_to_ids(bits, n_rows):
+    """Return the sorted row positions set in ``bits``."""
+    nonzero = np.flatnonzero(bits)
+    if len(nonzero) * 8 > len(bits):
+        return np.flatnonzero(np.unpackbits(bits, count=n_rows).view(bool))
+    # Sparse bitmaps: unpack only the bytes that have a bit set
+    positions = (nonzero[:, None] * 8 + np.arange(8)).ravel()
+    return positions[np.unpackbits(bits[nonzero]).view(bool)]
+
+
+def bitmap_test(bits, rows):
+    """Boolean mask telling which of the row positions ``rows`` are set in ``bits``."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((bits[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1).astype(bool)
+
+
+# Set bits per byte value, for NumPy versions without np.bitwise_count
+_POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount(bits, axis=None):
+    """Number of set bits in a packed bitmap (or along ``axis`` of a stack of them)."""
+    counts = np.bitwise_count(bits) if hasattr(np, 'bitwise_count') else _POPCOUNT_TABLE[bits]
+    return counts.sum(axis=axis, dtype=np.int64)
+
+
+def append_bitmaps(bitmaps, n_rows, masks):
+    """
+    Extend a stack of packed bitmaps over ``n_rows`` rows with the bits of
+    ``masks`` (one bool row per bitmap) for the rows that follow them.
+    """
+    tail = n_rows % 8
+    if tail == 0:
+        return np.concatenate([bitmaps, np.packbits(masks, axis=1)], axis=1)
+    # The last byte is partly filled: repack it together with the new bits
+    last = np.unpackbits(bitmaps[:, -1:], axis=1)[:, :tail].astype(bool)
+    return np.concatenate([bitmaps[:, :-1], np.packbits(np.concatenate([last, masks], axis=1), axis=1)], axis=1)
+
+
+class BitmapIndex:
+    """
+    Inverted index mapping each distinct value of a column to a row bitmap.
+
+    Args:
+        values: Distinct column values, in code order
+        bitmaps: 2-D uint8 array, one packed bitmap row per value
+        n_rows: Number of rows covered by the bitmaps
+    """
+
+    def __init__(self, values, bitmaps, n_rows):
+        self.values = list(values)
+        self.bitmaps = bitmaps
+        self.n_rows = n_rows
+        self._positions = {v: i for i, v in enumerate(self.values)}
+
+    @classmethod
+    def from_series(cls, series):
+        """Build the index from a (preferably categorical) column."""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            values = series.cat.categories.tolist()
+        else:
+            codes, uniques = pd.factorize(series)
+            values = uniques.tolist()
+        n_rows = len(codes)
+        bitmaps = np.empty((len(values), (n_rows + 7) // 8), dtype=np.uint8)
+        for code in range(len(values)):
+            bitmaps[code] = np.packbits(codes == code)
+        return cls(values, bitmaps, n_rows)
+
+    def lookup(self, values):
+        """OR together the bitmaps of ``values``; unknown values match nothing."""
+        result = empty_bitmap(self.n_rows)
+        for value in values:
+            pos = self._positions.get(value)
+            if pos is not None:
+                np.bitwise_or(result, self.bitmaps[pos], out=result)
+        return result
+
+    def contains(self, values, rows):
+        """Mask of the row positions ``rows`` holding one of ``values``, without building their bitmap."""
+        result = np.zeros(len(rows), dtype=bool)
+        for value in values:
+            pos = self._positions.get(value)
+            if pos is not None:
+                result |= bitmap_test(self.bitmaps[pos], rows)
+        return result
+
+    def append(self, series):
+        """
+        Index covering these rows followed by ``series``, a categorical whose
+        categories include every value indexed so far.
+        """
+        codes = series.cat.codes.to_numpy()
+        values = series.cat.categories.tolist()
+        old = empty_bitmap(self.n_rows)[None, :].repeat(len(values), axis=0)
+        for code, value in enumerate(values):
+            pos = self._positions.get(value)
+            if pos is not None:
+                old[code] = self.bitmaps[pos]
+        masks = codes[None, :] == np.arange(len(values))[:, None]
+        return type(self)(values, append_bitmaps(old, self.n_rows, masks), self.n_rows + len(codes))
+
+    def counts(self, selection=None):
+        """Rows of each value within ``selection`` (a packed bitmap, None = all rows)."""
+        bits = self.bitmaps if selection is None else np.bitwise_and(self.bitmaps, selection)
+        return dict(zip(self.values, popcount(bits, axis=1).tolist()))
+
+    @property
+    def nbytes(self):
+        return int(self.bitmaps.nbytes)
+
+
+class TagIndex(BitmapIndex):
+    """
+    Posting bitmaps for the multi-valued Tags column, one per distinct tag.
+
+    The column is stored as a categorical of joined tag lists, so the number
+    of distinct labels (tag combinations) is small and each tag's bitmap is a
+    vectorized lookup over the category codes.
+    """
+
+    @classmethod
+    def from_series(cls, series):
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        codes = series.cat.codes.to_numpy()
+        combos = [split_tag_label(label) for label in series.cat.categories]
+        values = sorted({tag for combo in combos for tag in combo})
+        positions = {tag: i for i, tag in enumerate(values)}
+
+        # membership[t, c] is True when tag t occurs in combination c;
+        # the trailing column stays False for missing (code -1) rows
+        membership = np.zeros((len(values), len(combos) + 1), dtype=bool)
+        for c, combo in enumerate(combos):
+            for tag in combo:
+                membership[positions[tag], c] = True
+
+        n_rows = len(codes)
+        bitmaps = np.empty((len(values), (n_rows + 7) // 8), dtype=np.uint8)
+        for t in range(len(values)):
+            bitmaps[t] = np.packbits(membership[t][codes])
+        return cls(values, bitmaps, n_rows)
+
+    def append(self, series):
+        """Index covering these rows followed by the Tags column ``series``."""
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        codes = series.cat.codes.to_numpy()
+        combos = [split_tag_label(label) for label in series.cat.categories]
+        values = sorted(set(self.values).union(tag for combo in combos for tag in combo))
+        positions = {tag: i for i, tag in enumerate(values)}
+
+        membership = np.zeros((len(values), len(combos) + 1), dtype=bool)
+        for c, combo in enumerate(combos):
+            for tag in combo:
+                membership[positions[tag], c] = True
+        old = np.zeros((len(values), self.bitmaps.shape[1]), dtype=np.uint8)
+        for t, tag in enumerate(values):
+            pos = self._positions.get(tag)
+            if pos is not None:
+                old[t] = self.bitmaps[pos]
+        return type(self)(values, append_bitmaps(old, self.n_rows, membership[:, codes]), self.n_rows + len(codes))
+
+
+def split_tag_label(label):
+    if not isinstance(label, str) or not label:
+        return []
+    return label.split(TAG_SEPARATOR)
+
+
+def build_facet_indexes(df):
+    """Build a BitmapIndex for every facet column present in ``df``."""
+    return {
+        column: BitmapIndex.from_series(df[column])
+        for column in FACET_COLUMNS.values()
+        if column in df.columns
+    }
+
+
+def select_facets(facet_indexes, filters, n_rows):
+    """
+    Resolve the multi-select facet filters to a single row bitmap.
+
+    Values are OR-ed within a facet and facets are AND-ed together.
+
+    Returns:
+        Packed bitmap, or None when no facet filter is active
+    """
+    selection = None
+    for key, column in FACET_COLUMNS.items():
+        selected = filters.get(key)
+        if not selected or column not in facet_indexes:
+            continue
+        if isinstance(selected, str):
+            selected = [selected]
+        bits = facet_indexes[column].lookup(selected)
+        if selection is None:
+            selection = bits
+        else:
+            np.bitwise_and(selection, bits, out=selection)
+    return selection
+
+
+def _row_dtype(n_rows):
+    return np.int32 if n_rows < np.iinfo(np.int32).max else np.int64
+
+
+def _gather_ranges(values, starts, ends):
+    """Concatenate ``values[starts[i]:ends[i]]`` for every i without a Python loop."""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return values[:0]
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return values[offsets + np.arange(total)]
+
+
+def _search_text(value):
+    if isinstance(value, float) and value.is_integer():
+        # Phone numbers read from CSV with gaps come back as floats
+        value = int(value)
+    return str(value).lower()
+
+
+def contains_text(series, q):
+    """
+    Mask of the values of ``series`` containing ``q``, with the same matching
+    as NgramIndex.search; each distinct value is tested once.
+    """
+    codes, uniques = pd.factorize(series)
+    texts = np.array([_search_text(v) for v in uniques], dtype=str)
+    if texts.size == 0:
+        return np.zeros(len(codes), dtype=bool)
+    # Missing values (code -1) pick the trailing False
+    return np.append(np.char.find(texts, q.lower()) >= 0, False)[codes]
+
+
+class NgramIndex:
+    """
+    Trigram substring index over the distinct values of a text column.
+
+    Matching is case-insensitive literal ``contains``. Queries of three or
+    more characters intersect the trigram posting lists to get a small set of
+    candidate values, which are then verified exactly; shorter queries scan the
+    distinct values only. Matching values are expanded to rows through a
+    value -> rows posting list, so cost follows the number of matches rather
+    than the number of rows.
+
+    Args:
+        texts: Lower-cased distinct values as a fixed-width unicode array
+        row_order: Row positions grouped by distinct value
+        row_offsets: ``row_order[row_offsets[v]:row_offsets[v + 1]]`` are the rows of value v
+        gram_keys: Sorted packed trigram keys
+        gram_offsets: Posting list boundaries for each key in ``gram_postings``
+        gram_postings: Distinct value ids containing each trigram, sorted per key
+        n_rows: Number of rows in the indexed column
+    """
+
+    N = 3
+
+    def __init__(self, texts, row_order, row_offsets, gram_keys, gram_offsets, gram_postings, n_rows):
+        self.texts = texts
+        self.row_order = row_order
+        self.row_offsets = row_offsets
+        self.gram_keys = gram_keys
+        self.gram_offsets = gram_offsets
+        self.gram_postings = gram_postings
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_series(cls, series):
+        codes, uniques = pd.factorize(series)
+        n_rows = len(codes)
+        texts = np.array([_search_text(v) for v in uniques], dtype=str)
+        if texts.size == 0:
+            texts = np.array([], dtype='<U1')
+
+        valid = codes >= 0
+        row_order = np.argsort(codes, kind='stable')[np.count_nonzero(~valid):].astype(_row_dtype(n_rows))
+        counts = np.bincount(codes[valid], minlength=len(texts))
+        row_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        gram_keys, gram_offsets, gram_postings = cls._build_postings(texts)
+        return cls(texts, row_order, row_offsets, gram_keys, gram_offsets, gram_postings, n_rows)
+
+    def append(self, series):
+        """
+        Index covering these rows followed by ``series``.
+
+        New rows join the posting of an already indexed value with the same
+        text; only values not seen before have their trigrams extracted. Row
+        ids and value ids only grow, so new postings go at the end of each
+        run and the existing arrays are spliced rather than re-sorted.
+        """
+        codes, uniques = pd.factorize(series)
+        n_new = len(codes)
+        new_texts = np.array([_search_text(v) for v in uniques], dtype=str)
+        known = pd.Series(np.arange(len(self.texts)), index=self.texts)
+        known = known[~known.index.duplicated()]
+        ids = np.array(known.reindex(new_texts), dtype='float64') if len(new_texts) else np.array([])
+        unseen = np.flatnonzero(np.isnan(ids))
+        ids[unseen] = len(self.texts) + np.arange(len(unseen))
+        ids = ids.astype(np.int64)
+        texts = self.texts
+        if len(unseen):
+            texts = np.concatenate([self.texts, new_texts[unseen]])
+
+        # Rows: append each new row to the end of its value's run
+        valid = np.flatnonzero(codes >= 0)
+        row_ids = ids[codes[valid]]
+        order = np.argsort(row_ids, kind='stable')
+        row_ids, rows = row_ids[order], (valid[order] + self.n_rows)
+        n_values = len(texts)
+        counts = np.diff(self.row_offsets)
+        counts = np.concatenate([counts, np.zeros(n_values - len(counts), dtype=counts.dtype)])
+        counts += np.bincount(row_ids, minlength=n_values)
+        old_ends = self.row_offsets[np.minimum(row_ids + 1, len(self.row_offsets) - 1)]
+        row_dtype = _row_dtype(self.n_rows + n_new)
+        row_order = np.insert(self.row_order.astype(row_dtype), old_ends, rows.astype(row_dtype))
+        row_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        # Trigrams of the new values, spliced in after each key's existing postings
+        gram_keys, gram_offsets, gram_postings = self.gram_keys, self.gram_offsets, self.gram_postings
+        if len(unseen):
+            keys, offsets, postings = self._build_postings(new_texts[unseen])
+            if len(postings):
+                entry_keys = np.repeat(keys, np.diff(offsets))
+                postings = postings + len(self.texts)
+                positions = gram_offsets[np.searchsorted(gram_keys, entry_keys, side='right')]
+                gram_postings = np.insert(gram_postings, positions, postings.astype(gram_postings.dtype))
+                all_keys = np.union1d(gram_keys, keys)
+                key_counts = np.zeros(len(all_keys), dtype=np.int64)
+                key_counts[np.searchsorted(all_keys, gram_keys)] += np.diff(gram_offsets)
+                key_counts[np.searchsorted(all_keys, keys)] += np.diff(offsets)
+                gram_keys = all_keys
+                gram_offsets = np.concatenate(([0], np.cumsum(key_counts))).astype(np.int64)
+        return type(self)(texts, row_order, row_offsets, gram_keys, gram_offsets, gram_postings, self.n_rows + n_new)
+
+    @classmethod
+    def _gram_keys(cls, chars):
+        """Pack each run of three code points (21 bits each) into one int64 key."""
+        return (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+
+    @classmethod
+    def _build_postings(cls, texts):
+        width = texts.dtype.itemsize // 4
+        empty = (np.array([], dtype=np.int64), np.zeros(1, dtype=np.int64), np.array([], dtype=np.int32))
+        if width < cls.N or len(texts) == 0:
+            return empty
+
+        all_keys, all_ids = [], []
+        for start in range(0, len(texts), NGRAM_BUILD_CHUNK):
+            block = texts[start:start + NGRAM_BUILD_CHUNK]
+            chars = block.view(np.uint32).reshape(len(block), width).astype(np.int64)
+            keys = cls._gram_keys(chars)
+            present = chars[:, cls.N - 1:] != 0
+            ids = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int32)[:, None], keys.shape)
+            all_keys.append(keys[present])
+            all_ids.append(ids[present])
+        keys = np.concatenate(all_keys)
+        ids = np.concatenate(all_ids)
+        if keys.size == 0:
+            return empty
+
+        order = np.lexsort((ids, keys))
+        keys, ids = keys[order], ids[order]
+        # A value containing the same trigram twice is posted once
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (ids[1:] != ids[:-1])
+        keys, ids = keys[keep], ids[keep]
+
+        gram_keys, first = np.unique(keys, return_index=True)
+        gram_offsets = np.append(first, len(keys)).astype(np.int64)
+        return gram_keys, gram_offsets, ids
+
+    def _postings(self, q):
+        """Posting lists of the trigrams of ``q``, shortest first; empty if one is not indexed."""
+        chars = np.array([[ord(c) for c in q]], dtype=np.int64)
+        keys = np.unique(self._gram_keys(chars))
+        pos = np.searchsorted(self.gram_keys, keys)
+        if np.any(pos >= len(self.gram_keys)) or np.any(self.gram_keys[np.minimum(pos, len(self.gram_keys) - 1)] != keys):
+            return []
+        return sorted(
+            (self.gram_postings[self.gram_offsets[p]:self.gram_offsets[p + 1]] for p in pos),
+            key=len
+        )
+
+    def _candidates(self, q):
+        postings = self._postings(q)
+        if not postings:
+            return np.array([], dtype=np.int32)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if candidates.size == 0:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return candidates
+
+    def matching_values(self, q):
+        """Return ids of the distinct values containing ``q`` (case-insensitive)."""
+        q = q.lower()
+        if len(q) >= self.N:
+            candidates = self._candidates(q)
+        else:
+            candidates = np.arange(len(self.texts))
+        if candidates.size == 0:
+            return candidates
+        return candidates[np.char.find(self.texts[candidates], q) >= 0]
+
+    def estimate(self, q):
+        """
+        Cheap upper bounds on the work and matches of ``search(q)``.
+
+        Returns:
+            (distinct values to verify, rows of those values); a query shorter
+            than a trigram checks every value and may match every row
+        """
+        q = q.lower()
+        if len(q) < self.N:
+            return len(self.texts), self.n_rows
+        postings = self._postings(q)
+        if not postings:
+            return 0, 0
+        values = postings[0]
+        return len(values), int((self.row_offsets[values + 1] - self.row_offsets[values]).sum())
+
+    def matching_rows(self, q):
+        """Row positions whose value contains ``q``, grouped by value (unsorted)."""
+        matched = self.matching_values(q)
+        return _gather_ranges(self.row_order, self.row_offsets[matched], self.row_offsets[matched + 1])
+
+    def search(self, q):
+        """Return the sorted row positions whose value contains ``q``."""
+        return np.sort(self.matching_rows(q))
+
+    @property
+    def nbytes(self):
+        return int(sum(a.nbytes for a in (
+            self.texts, self.row_order, self.row_offsets, self.gram_keys, self.gram_offsets, self.gram_postings
+        )))
+
+
+def build_search_indexes(df):
+    return {column: NgramIndex.from_series(df[column]) for column in SEARCH_COLUMNS if column in df.columns}
+
+
+def search_bitmap(search_indexes, q, n_rows):
+    """Packed bitmap of the rows where any search column contains ``q``."""
+    mask = np.zeros(n_rows, dtype=bool)
+    for index in search_indexes.values():
+        mask[index.matching_rows(q)] = True
+    return np.packbits(mask)
+
+
+def coerce_value(value, kind):
+    """
+    Cast ``value`` to a value of a column whose NumPy dtype kind is ``kind``:
+    a date ('M'), a number ('i', 'u', 'f') or else a string.
+
+    Numbers may be given as numeric strings and dates as ISO strings.
+
+    Raises:
+        ValueError: If ``value`` cannot stand for a value of the column
+    """
+    if kind == 'M':
+        try:
+            if not isinstance(value, (str, datetime.date, np.datetime64)):
+                raise ValueError
+            stamp = pd.Timestamp(value)
+        except ValueError:
+            raise ValueError(f"expected a date, got {value!r}") from None
+        if pd.isna(stamp):
+            raise ValueError(f"expected a date, got {value!r}")
+        return stamp.to_datetime64()
+    if kind in 'iuf':
+        if isinstance(value, str):
+            text = value
+            try:
+                value = int(text) if kind in 'iu' and text.strip().lstrip('+-').isdigit() else float(text)
+            except ValueError:
+                raise ValueError(f"expected a number, got {text!r}") from None
+        if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.number)) or np.isnan(value):
+            raise ValueError(f"expected a number, got {value!r}")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    return value
+
+
+class SortIndex:
+    """
+    Presorted row permutations for one sortable column.
+
+    Rows are ordered by value with ties kept in row order and missing values
+    last in both directions, matching a stable ``sort_values``. A page is cut
+    straight from the permutation (no filter), by partial selection over the
+    filtered rows (sparse filters) or by scanning the permutation until the
+    page is filled (dense filters), so no request pays a full O(n log n) sort.
+
+    The ascending permutation doubles as a range index: the rows with values
+    in [low, high] are one contiguous slice of it, located by binary search
+    over the distinct values and ``rank_offsets``.
+
+    Args:
+        ranks: Dense rank of each row's value, -1 for missing values
+        ascending: Row positions in ascending order
+        descending: Row positions in descending order
+        n_rows: Number of rows in the indexed column
+        values: Sorted distinct values (``values[rank]``), used to resume
+            keyset cursors
+    """
+
+    # Filters keeping fewer than 1/SPARSE_FRACTION of the rows sort the survivors directly
+    SPARSE_FRACTION = 16
+    SCAN_CHUNK = 8192
+
+    def __init__(self, ranks, ascending, descending, n_rows, values):
+        self.ranks = ranks
+        self.ascending = ascending
+        self.descending = descending
+        self.n_rows = n_rows
+        self.values = values
+        self.n_values = len(values)
+        # ascending[rank_offsets[r]:rank_offsets[r + 1]] are the rows of rank r
+        counts = np.bincount(ranks[ranks >= 0], minlength=self.n_values)
+        self.rank_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    @classmethod
+    def from_series(cls, series):
+        ranks, uniques = pd.factorize(series, sort=True)
+        n_rows = len(ranks)
+        ranks = ranks.astype(_row_dtype(len(uniques) + 1))
+        n_values = len(uniques)
+        missing = ranks < 0
+        asc_key = np.where(missing, n_values, ranks)
+        desc_key = np.where(missing, n_values, n_values - 1 - ranks)
+        row_dtype = _row_dtype(n_rows)
+        ascending = np.argsort(asc_key, kind='stable').astype(row_dtype)
+        descending = np.argsort(desc_key, kind='stable').astype(row_dtype)
+        return cls(ranks, ascending, descending, n_rows, np.asarray(uniques))
+
+    def append(self, series):
+        """
+        Index covering these rows followed by ``series``.
+
+        Existing ranks are remapped onto the merged value list and the new
+        rows are spliced into both permutations by binary search, which keeps
+        the cost linear instead of re-sorting every row.
+        """
+        new_ranks, uniques = pd.factorize(series, sort=True)
+        uniques = np.asarray(uniques)
+        values = np.union1d(self.values, uniques) if len(uniques) else self.values
+        n_values = len(values)
+        n_rows = self.n_rows + len(new_ranks)
+
+        rank_dtype = _row_dtype(n_values + 1)
+        remap = np.searchsorted(values, self.values).astype(rank_dtype)
+        ranks = np.where(self.ranks >= 0, remap[np.maximum(self.ranks, 0)], -1).astype(rank_dtype)
+        added = np.where(new_ranks >= 0, np.searchsorted(values, uniques)[np.maximum(new_ranks, 0)], -1).astype(rank_dtype)
+        ranks = np.concatenate([ranks, added])
+
+        row_dtype = _row_dtype(n_rows)
+        new_rows = np.arange(self.n_rows, n_rows, dtype=row_dtype)
+        missing = ranks < 0
+        perms = []
+        for perm, descending in ((self.ascending, False), (self.descending, True)):
+            keys = np.where(missing, n_values, n_values - 1 - ranks if descending else ranks)
+            order = np.argsort(keys[new_rows], kind='stable')
+            # Ties go after existing rows, which keeps them in row order
+            positions = np.searchsorted(keys[perm], keys[new_rows][order], side='right')
+            perms.append(np.insert(perm.astype(row_dtype), positions, new_rows[order]))
+        return type(self)(ranks, perms[0], perms[1], n_rows, values)
+
+    def _sort_keys(self, rows, descending):
+        ranks = self.ranks[rows].astype(np.int64)
+        missing = ranks < 0
+        if descending:
+            ranks = self.n_values - 1 - ranks
+        ranks[missing] = self.n_values
+        # Row position breaks ties, giving a unique total order
+        return ranks * self.n_rows + rows
+
+    def page(self, rows, start, stop, descending=False):
+        """
+        Return the row positions ranked ``start:stop`` among the selected rows.
+
+        Args:
+            rows: Sorted row positions of the filtered set, or None for all rows
+            start: First rank to return
+            stop: One past the last rank to return
+            descending: Sort direction
+        """
+        perm = self.descending if descending else self.ascending
+        if rows is None:
+            return perm[start:stop]
+        stop = min(stop, len(rows))
+        if start >= stop:
+            return rows[:0]
+
+        if len(rows) * self.SPARSE_FRACTION <= self.n_rows:
+            keys = self._sort_keys(rows, descending)
+            if stop < len(rows) // 4:
+                top = np.argpartition(keys, stop - 1)[:stop]
+                top = top[np.argsort(keys[top])]
+            else:
+                top = np.argsort(keys)[:stop]
+            return rows[top[start:stop]]
+
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        found, hits, pos, chunk = 0, [], 0, max(self.SCAN_CHUNK, stop * 2)
+        while pos < self.n_rows and found < stop:
+            block = perm[pos:pos + chunk]
+            block = block[mask[block]]
+            hits.append(block)
+            found += len(block)
+            pos += chunk
+            chunk *= 2
+        return np.concatenate(hits)[start:stop]
+
+    def order(self, rows, descending=False):
+        """Return every selected row position in sort order (``rows`` as in ``page``)."""
+        perm = self.descending if descending else self.ascending
+        if rows is None:
+            return perm
+        if len(rows) * self.SPARSE_FRACTION <= self.n_rows:
+            return rows[np.argsort(self._sort_keys(rows, descending))]
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return perm[mask[perm]]
+
+    def rank_range(self, low=None, high=None):
+        """Ranks ``first:last`` of the values with ``low <= value <= high`` (None = unbounded)."""
+        first = 0 if low is None else int(np.searchsorted(self.values, low, side='left'))
+        last = self.n_values if high is None else int(np.searchsorted(self.values, high, side='right'))
+        return first, max(first, last)
+
+    def count_between(self, low=None, high=None):
+        """Number of rows with ``low <= value <= high``, in O(log n)."""
+        first, last = self.rank_range(low, high)
+        return int(self.rank_offsets[last] - self.rank_offsets[first])
+
+    def between(self, low=None, high=None):
+        """
+        Row positions with ``low <= value <= high`` in ascending value order,
+        as a slice of the permutation: O(log n) plus the rows returned.
+        Missing values never match.
+        """
+        first, last = self.rank_range(low, high)
+        return self.ascending[self.rank_offsets[first]:self.rank_offsets[last]]
+
+    def within(self, rows, low=None, high=None):
+        """Mask of the row positions ``rows`` whose value lies in [low, high]."""
+        first, last = self.rank_range(low, high)
+        ranks = self.ranks[rows]
+        return (ranks >= first) & (ranks < last)
+
+    def value_of(self, row):
+        """The sort value of ``row`` as a JSON-friendly scalar (None if missing)."""
+        rank = int(self.ranks[row])
+        if rank < 0:
+            return None
+        value = self.values[rank]
+        if isinstance(value, np.datetime64):
+            return str(value)
+        return value.item() if isinstance(value, np.generic) else value
+
+    def coerce(self, value):
+        """Cast ``value`` to the type of this column's values (see ``coerce_value``)."""
+        return coerce_value(value, self.values.dtype.kind)
+
+    def _cursor_rank(self, value, descending):
+        """Position of ``value`` on the rank axis; half-way between ranks if absent."""
+        if value is None:
+            return float(self.n_values)
+        try:
+            value = self.coerce(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid cursor: {e}") from None
+        pos = int(np.searchsorted(self.values, value))
+        rank = float(pos) if pos < self.n_values and self.values[pos] == value else pos - 0.5
+        return self.n_values - 1 - rank if descending else rank
+
+    def _row_rank(self, row, descending):
+        rank = int(self.ranks[row])
+        if rank < 0:
+            return float(self.n_values)
+        return float(self.n_values - 1 - rank if descending else rank)
+
+    def seek(self, ordered, value, row, descending=False):
+        """
+        Return the position in ``ordered`` just past the key (value, row).
+
+        ``ordered`` must be a result of ``order`` for the same direction; the
+        search is a binary search, so resuming a deep page costs O(log n).
+        """
+        target = (self._cursor_rank(value, descending), row)
+        lo, hi = 0, len(ordered)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            r = int(ordered[mid])
+            if (self._row_rank(r, descending), r) <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    @property
+    def nbytes(self):
+        return int(self.ranks.nbytes + self.ascending.nbytes + self.descending.nbytes + self.rank_offsets.nbytes)
+
+
+def build_sort_indexes(df):
+    return {column: SortIndex.from_series(df[column]) for column in SORT_COLUMNS if column in df.columns}
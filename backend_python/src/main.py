@@ -1,56 +1,431 @@
-from fastapi import FastAPI
+from fastapi import Body, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
+import functools
+import hmac
+import logging
+import os
+import re
+import threading
+import time
 import uvicorn
 from contextlib import asynccontextmanager
 # Force reload 5
 try:
-    from src.data_processor import load_data, get_transactions, get_filter_options
+    from src import metrics
+    from src.data_processor import (
+        get_filter_options, get_cache_stats, export_transactions, index_stats,
+        get_load_status, is_ready, start_background_load, ingest_csv_text, parse_fields, parse_filters, check_paging, QueryTimeout
+    )
+    from src.metrics import REGISTRY
+    from src.query_executor import QueryExecutor, Overloaded
 except ImportError:
-    from data_processor import load_data, get_transactions, get_filter_options
+    import metrics
+    from data_processor import (
+        get_filter_options, get_cache_stats, export_transactions, index_stats,
+        get_load_status, is_ready, start_background_load, ingest_csv_text, parse_fields, parse_filters, check_paging, QueryTimeout
+    )
+    from metrics import REGISTRY
+    from query_executor import QueryExecutor, Overloaded
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("truestate.api")
+
+QUERY_EXECUTOR = QueryExecutor()
+
+# Bearer token POST /api/transactions/ingest requires; ingestion is disabled while unset
+INGEST_TOKEN = os.environ.get('TRUESTATE_INGEST_TOKEN', '')
+# Largest CSV body one ingest request may carry
+INGEST_MAX_BYTES = int(float(os.environ.get('TRUESTATE_INGEST_MAX_MB', '16')) * 1024 * 1024)
+# One ingest at a time; others are turned away rather than queued behind it
+INGEST_SLOT = threading.Semaphore(1)
+# Routes left out of the wildcard CORS policy, so other origins' pages cannot call them
+PRIVATE_PATHS = {"/api/transactions/ingest"}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    load_data()
+    # Load in the background so health checks and "warming" replies work right away;
+    # query workers start (and attach the shared dataset) once it is loaded
+    start_background_load(on_ready=QUERY_EXECUTOR.start)
     yield
+    QUERY_EXECUTOR.shutdown()
+
+def warming_response():
+    """Fast 503 for data endpoints while the dataset is still loading."""
+    status = get_load_status()
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "failed" if status["state"] == "failed" else "warming",
+            "error": status["error"] or "Dataset is still loading, retry shortly",
+            "data": [],
+            "total": 0,
+            "load": status
+        },
+        headers={"Retry-After": "2"}
+    )
+
+def busy_response(status_code, message, retry_after):
+    """429 (too many queries in flight) or 503 (query timed out) with a retry hint."""
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": message, "data": [], "total": 0},
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def timed(endpoint):
+    """
+    Record a sync route's pipeline stages: returned as a Server-Timing header,
+    added to the /metrics histograms and, for slow requests, profiled when
+    TRUESTATE_PROFILE_SLOW_MS is set.
+    """
+    def decorate(route):
+        @functools.wraps(route)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            with metrics.collect() as stages, metrics.profile(endpoint):
+                response = route(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+            if not isinstance(response, Response):
+                response = JSONResponse(content=jsonable_encoder(response))
+            response.headers["Server-Timing"] = metrics.server_timing(stages, elapsed * 1000)
+            REGISTRY.observe_request(endpoint, elapsed, stages)
+            return response
+        return wrapper
+    return decorate
+
+def bad_request(message):
+    return JSONResponse(status_code=400, content={"error": message, "data": [], "total": 0})
+
+def failed(endpoint, action):
+    """Log the exception being handled with its traceback and count it against ``endpoint``."""
+    logger.exception(f"Error {action}")
+    REGISTRY.count_error(endpoint)
+
+class PublicCORSMiddleware(CORSMiddleware):
+    """CORSMiddleware that passes PRIVATE_PATHS through without any CORS headers."""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in PRIVATE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
-    CORSMiddleware,
+    PublicCORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+@app.get("/healthz")
+def route_healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def route_readyz():
+    status = get_load_status()
+    if status["ready"]:
+        return JSONResponse(content=status)
+    # A failed load will not recover by itself; only a warming one is worth retrying
+    headers = {} if status["state"] == "failed" else {"Retry-After": "2"}
+    return JSONResponse(status_code=503, content=status, headers=headers)
+
 @app.get("/api/transactions/filter-options")
-def route_filter_options():
+@timed("filter-options")
+def route_filter_options(q: Optional[str] = None, filters: Optional[str] = None):
+    if not is_ready():
+        return warming_response()
     try:
-        return get_filter_options()
+        if q is None and filters is None:
+            return get_filter_options()
+        # Per-value counts under the current query cost about as much as a page
+        return QUERY_EXECUTOR.run('get_filter_options', q=q, filters=filters)
+    except Overloaded as e:
+        return busy_response(429, str(e), 1)
+    except QueryTimeout as e:
+        return busy_response(503, str(e), 2)
+    except ValueError as e:
+        return bad_request(str(e))
     except Exception as e:
+        failed("filter-options", "loading filter options")
         return {"error": str(e)}
 
+@app.get("/api/transactions/cache-stats")
+def route_cache_stats():
+    return get_cache_stats()
+
+@app.get("/api/transactions/executor-stats")
+def route_executor_stats():
+    return QUERY_EXECUTOR.stats()
+
+def _metric_name(key):
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', key).lower()
+
+def _gauges(prefix, stats):
+    return {
+        f"{prefix}_{_metric_name(key)}": [({}, float(value))]
+        for key, value in stats.items()
+        if isinstance(value, (int, float))
+    }
+
+@app.get("/metrics")
+def route_metrics(format: str = "prometheus"):
+    """Latency histograms, error counts, cache/executor/index stats and load timings."""
+    snapshot = REGISTRY.snapshot()
+    load = get_load_status()
+    if format == "json":
+        return dict(
+            snapshot,
+            cache=get_cache_stats(),
+            executor=QUERY_EXECUTOR.stats(),
+            indexes=index_stats(),
+            load=load
+        )
+    gauges = {}
+    gauges.update(_gauges("truestate_query_cache", get_cache_stats()))
+    gauges.update(_gauges("truestate_executor", QUERY_EXECUTOR.stats()))
+    gauges["truestate_index_bytes"] = [({"family": name}, size) for name, size in index_stats().items()]
+    gauges["truestate_dataset_rows"] = [({}, load["rows"] or 0)]
+    gauges["truestate_dataset_version"] = [({}, load["version"])]
+    gauges["truestate_dataset_ready"] = [({}, int(load["ready"]))]
+    gauges["truestate_load_phase_seconds"] = [({"phase": name}, seconds) for name, seconds in load["phases"].items()]
+    return PlainTextResponse(
+        metrics.render_prometheus(snapshot, gauges),
+        media_type="text/plain; version=0.0.4"
+    )
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+@app.get("/api/transactions/export")
+@timed("export")
+def route_export(
+    format: str = "csv",
+    q: str = "",
+    sortField: str = "Date",
+    sortDir: str = "desc",
+    filters: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    if format not in EXPORT_MEDIA_TYPES:
+        return bad_request(f"Unsupported export format: {format}")
+    if not is_ready():
+        return warming_response()
+    try:
+        columns = parse_fields(fields)
+    except ValueError as e:
+        return bad_request(str(e))
+    try:
+        chunks = export_transactions(
+            fmt=format,
+            q=q,
+            sort_field=sortField,
+            sort_dir=sortDir,
+            filters=filters,
+            fields=columns
+        )
+    except ValueError as e:
+        return bad_request(str(e))
+    except Exception as e:
+        failed("export", "exporting transactions")
+        return {"error": str(e)}
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    )
+
+@app.get("/api/transactions/summary")
+@timed("summary")
+def route_summary(q: str = "", filters: Optional[str] = None):
+    if not is_ready():
+        return warming_response()
+    try:
+        return QUERY_EXECUTOR.run('get_summary', q=q, filters=filters)
+    except Overloaded as e:
+        return busy_response(429, str(e), 1)
+    except QueryTimeout as e:
+        return busy_response(503, str(e), 2)
+    except ValueError as e:
+        return bad_request(str(e))
+    except Exception as e:
+        failed("summary", "summarizing transactions")
+        return {"error": str(e)}
+
+def ingest_authorized(request):
+    """True when the request carries ``Authorization: Bearer <TRUESTATE_INGEST_TOKEN>``."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), INGEST_TOKEN.encode())
+
+async def read_body(request, limit):
+    """The request body, or None once it exceeds ``limit`` bytes (checked before buffering it all)."""
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        return None
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@app.post("/api/transactions/ingest")
+async def route_ingest(request: Request):
+    """
+    Append the transactions in a CSV request body (same header as the dataset).
+    Disabled unless TRUESTATE_INGEST_TOKEN is set; callers send it as a bearer token.
+    """
+    if not INGEST_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Ingestion is disabled (TRUESTATE_INGEST_TOKEN is not set)"})
+    if not ingest_authorized(request):
+        return JSONResponse(status_code=401, content={"error": "Missing or invalid ingest token"},
+                            headers={"WWW-Authenticate": "Bearer"})
+    if not is_ready():
+        return warming_response()
+    if not INGEST_SLOT.acquire(blocking=False):
+        return busy_response(429, "Another ingest is in progress", 5)
+    try:
+        body = await read_body(request, INGEST_MAX_BYTES)
+        if body is None:
+            return JSONResponse(status_code=413, content={"error": f"CSV body exceeds {INGEST_MAX_BYTES} bytes"})
+        body = body.decode('utf-8-sig')
+        if not body.strip():
+            return JSONResponse(status_code=400, content={"error": "Empty CSV body"})
+        return await run_in_threadpool(ingest_csv_text, body)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        failed("ingest", "ingesting transactions")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        INGEST_SLOT.release()
+
+# Most queries one batch request may carry
+BATCH_MAX_QUERIES = 20
+# Query type -> its request parameters (as in the GET routes) -> data_processor keyword
+BATCH_PARAMS = {
+    "transactions": {
+        "page": "page", "pageSize": "page_size", "q": "q", "sortField": "sort_field",
+        "sortDir": "sort_dir", "filters": "filters", "cursor": "cursor", "fields": "fields"
+    },
+    "filterOptions": {"q": "q", "filters": "filters"},
+    "summary": {"q": "q", "filters": "filters"},
+}
+
+def batch_query(item):
+    """
+    Validate one query of a batch and translate it to data_processor keyword
+    arguments plus its "type".
+
+    Raises:
+        ValueError: unknown type or parameter, non-integer page, malformed filters, unknown field
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each batch query must be an object")
+    kind = item.get("type", "transactions")
+    params = BATCH_PARAMS.get(kind)
+    if params is None:
+        raise ValueError(f"Unknown query type: {kind}")
+    unknown = sorted(set(item) - set(params) - {"type"})
+    if unknown:
+        raise ValueError(f"Unknown {kind} parameters: {', '.join(unknown)}")
+    query = {params[key]: value for key, value in item.items() if key != "type"}
+    if kind == "transactions":
+        check_paging(query.get("page", 1), query.get("page_size", 1))
+    if "filters" in query:
+        query["filters"] = parse_filters(query["filters"])
+    if "fields" in query:
+        query["fields"] = parse_fields(query["fields"])
+    return dict(query, type=kind)
+
+@app.post("/api/transactions/batch")
+@timed("batch")
+def route_batch(payload: dict = Body(...)):
+    """
+    Several queries in one request: ``{"queries": [...]}``, each an object
+    with a ``type`` ("transactions" by default, "filterOptions" or "summary")
+    and the parameters of the matching GET route. Queries with the same q and
+    filters are filtered once. Responds ``{"results": [...]}`` in query order.
+    """
+    if not is_ready():
+        return warming_response()
+    queries = payload.get("queries")
+    if not isinstance(queries, list) or not queries:
+        return bad_request("Expected a non-empty \"queries\" list")
+    if len(queries) > BATCH_MAX_QUERIES:
+        return bad_request(f"At most {BATCH_MAX_QUERIES} queries per batch")
+    try:
+        queries = [batch_query(item) for item in queries]
+    except ValueError as e:
+        return bad_request(str(e))
+    try:
+        body = QUERY_EXECUTOR.run('get_batch_json', queries=queries)
+        return Response(content=body, media_type="application/json")
+    except Overloaded as e:
+        return busy_response(429, str(e), 1)
+    except QueryTimeout as e:
+        return busy_response(503, str(e), 2)
+    except Exception as e:
+        failed("batch", "processing batch")
+        return {"error": str(e), "results": []}
+
 @app.get("/api/transactions")
+@timed("transactions")
 def route_transactions(
     page: int = 1,
     pageSize: int = 10,
     q: str = "",
     sortField: str = "Date",
     sortDir: str = "desc",
-    filters: Optional[str] = None
+    filters: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    """
+    One page of transactions. ``fields`` limits the columns returned: a
+    comma-separated list of column names and/or presets ("table", "export",
+    "all"; see data_processor.FIELD_PRESETS).
+    """
+    if not is_ready():
+        return warming_response()
+    try:
+        columns = parse_fields(fields)
+        check_paging(page, pageSize)
+    except ValueError as e:
+        return bad_request(str(e))
     try:
-        return get_transactions(
+        body = QUERY_EXECUTOR.run(
+            'get_transactions_json',
             page=page,
             page_size=pageSize,
             q=q,
             sort_field=sortField,
             sort_dir=sortDir,
-            filters=filters
+            filters=filters,
+            cursor=cursor,
+            fields=columns
         )
+        return Response(content=body, media_type="application/json")
+    except Overloaded as e:
+        return busy_response(429, str(e), 1)
+    except QueryTimeout as e:
+        return busy_response(503, str(e), 2)
+    except ValueError as e:
+        return bad_request(str(e))
     except Exception as e:
-        print(f"Error processing transactions: {e}")
+        failed("transactions", "processing transactions")
         return {"error": str(e), "data": [], "total": 0}
 
 if __name__ == "__main__":
@@ -0,0 +1,282 @@
+"""Request and pipeline-stage timings, latency histograms and a slow-request profiler.
+
+A request collects its stages on the thread that serves it: code on the hot
+path wraps each step in ``stage(name)`` and may attach the rows that went in
+and came out. Outside a request ``stage`` records nothing, so the
+instrumentation costs next to nothing when it is not wanted. The collected
+stages become the request's ``Server-Timing`` header and feed the latency
+histograms served by ``/metrics``.
+
+Setting ``TRUESTATE_PROFILE_SLOW_MS`` turns on a sampling profiler: the
+stacks of threads serving requests are sampled every
+``TRUESTATE_PROFILE_INTERVAL_MS`` and, for requests slower than the
+threshold, written as collapsed stacks (flamegraph.pl / speedscope input)
+to ``TRUESTATE_PROFILE_DIR``.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("truestate.metrics")
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_SLOW_MS = float(os.environ.get('TRUESTATE_PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.environ.get('TRUESTATE_PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.environ.get('TRUESTATE_PROFILE_DIR', os.path.join(os.path.dirname(__file__), "../../.truestate_profiles"))
+# Slow-request profiles kept on disk; older files are removed
+PROFILE_KEEP = 50
+
+# Stages of the request served by the current thread (None outside a request)
+_REQUEST = threading.local()
+
+
+# -- stages ------------------------------------------------------------------
+
+@contextmanager
+def collect():
+    """Record the stages run inside this block on this thread; yields their list."""
+    previous = getattr(_REQUEST, 'stages', None)
+    stages = _REQUEST.stages = []
+    try:
+        yield stages
+    finally:
+        _REQUEST.stages = previous
+
+
+@contextmanager
+def stage(name):
+    """
+    Time the enclosed step as stage ``name`` of the current request.
+
+    Yields a dict the caller may add ``rows`` (rows in, rows out) or ``desc``
+    to, or None when no request is being recorded.
+    """
+    stages = getattr(_REQUEST, 'stages', None)
+    if stages is None:
+        yield None
+        return
+    entry = {"name": name}
+    started = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry["ms"] = (time.perf_counter() - started) * 1000
+        stages.append(entry)
+
+
+def extend(stages):
+    """Add stages recorded elsewhere (e.g. by a worker process) to the current request."""
+    current = getattr(_REQUEST, 'stages', None)
+    if current is not None and stages:
+        current.extend(stages)
+
+
+def server_timing(stages, total_ms=None):
+    """``Server-Timing`` header value for ``stages`` (and the request total)."""
+    parts = []
+    for entry in stages:
+        part = f"{entry['name']};dur={entry['ms']:.2f}"
+        desc = entry.get("desc")
+        if entry.get("rows") is not None:
+            rows_in, rows_out = entry["rows"]
+            desc = f"{rows_in}->{rows_out} rows" + (f" {desc}" if desc else "")
+        if desc:
+            part += f';desc="{desc}"'
+        parts.append(part)
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.2f}")
+    return ", ".join(parts)
+
+
+# -- histograms --------------------------------------------------------------
+
+class Histogram:
+    """Cumulative latency histogram over BUCKETS (seconds)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def snapshot(self):
+        cumulative, total = [], 0
+        for n in self.counts:
+            total += n
+            cumulative.append(total)
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class Registry:
+    """Per-endpoint and per-stage latency histograms plus error counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.stages = {}
+        self.errors = Counter()
+
+    def observe_request(self, endpoint, seconds, stages):
+        with self._lock:
+            self.requests.setdefault(endpoint, Histogram()).observe(seconds)
+            for entry in stages:
+                self.stages.setdefault(entry["name"], Histogram()).observe(entry["ms"] / 1000)
+
+    def count_error(self, endpoint):
+        with self._lock:
+            self.errors[endpoint] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "buckets": list(BUCKETS),
+                "requests": {name: h.snapshot() for name, h in self.requests.items()},
+                "stages": {name: h.snapshot() for name, h in self.stages.items()},
+                "errors": dict(self.errors),
+            }
+
+
+REGISTRY = Registry()
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(metric, label, histograms):
+    lines = [f"# TYPE {metric} histogram"]
+    for name, h in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS + ("+Inf",), h["buckets"]):
+            lines.append(f"{metric}_bucket{_labels(**{label: name, 'le': bound})} {count}")
+        lines.append(f"{metric}_sum{_labels(**{label: name})} {h['sum']:.6f}")
+        lines.append(f"{metric}_count{_labels(**{label: name})} {h['count']}")
+    return lines
+
+
+def render_prometheus(snapshot, gauges):
+    """
+    Prometheus text exposition of a Registry snapshot and extra gauges.
+
+    Args:
+        snapshot: Registry.snapshot()
+        gauges: metric name -> list of (labels dict, value)
+    """
+    lines = _histogram_lines("truestate_request_duration_seconds", "endpoint", snapshot["requests"])
+    lines += _histogram_lines("truestate_stage_duration_seconds", "stage", snapshot["stages"])
+    lines.append("# TYPE truestate_request_errors_total counter")
+    for endpoint, count in sorted(snapshot["errors"].items()):
+        lines.append(f"truestate_request_errors_total{_labels(endpoint=endpoint)} {count}")
+    for metric, samples in gauges.items():
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in samples:
+            lines.append(f"{metric}{_labels(**labels) if labels else ''} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -- slow-request profiler ---------------------------------------------------
+
+class SamplingProfiler:
+    """
+    Samples the stacks of watched threads from a background thread.
+
+    Args:
+        slow_ms: Requests at least this slow get their profile written
+        interval_ms: Time between samples
+        directory: Where collapsed-stack files are written
+    """
+
+    def __init__(self, slow_ms, interval_ms=PROFILE_INTERVAL_MS, directory=PROFILE_DIR):
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._watched = {}
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = dict(self._watched)
+            if not watched:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in watched.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_collapse(frame)] += 1
+
+    @contextmanager
+    def watch(self, endpoint):
+        """Sample the current thread while the block runs; save the profile if it was slow."""
+        thread_id = threading.get_ident()
+        samples = Counter()
+        with self._lock:
+            self._watched[thread_id] = samples
+            self._ensure_started()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._watched.pop(thread_id, None)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.slow_ms and samples:
+                self._save(endpoint, elapsed_ms, samples)
+
+    def _save(self, endpoint, elapsed_ms, samples):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{elapsed_ms:.0f}ms-{threading.get_ident()}.folded"
+            path = os.path.join(self.directory, name)
+            with open(path, 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            profiles = sorted(p for p in os.listdir(self.directory) if p.endswith(".folded"))
+            for old in profiles[:-PROFILE_KEEP]:
+                os.remove(os.path.join(self.directory, old))
+        except OSError as e:
+            logger.warning(f"Could not save slow request profile: {e}")
+            return
+        leaves = Counter()
+        for stack, count in samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        top = ", ".join(f"{leaf} ({count})" for leaf, count in leaves.most_common(3))
+        logger.warning(f"Slow {endpoint} request took {elapsed_ms:.0f} ms; profile {path}; hottest: {top}")
+
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+PROFILER = SamplingProfiler(PROFILE_SLOW_MS) if PROFILE_SLOW_MS > 0 else None
+
+
+def profile(endpoint):
+    """PROFILER.watch(endpoint) when profiling is enabled, else a no-op block."""
+    if PROFILER is None:
+        return nullcontext()
+    return PROFILER.watch(endpoint)
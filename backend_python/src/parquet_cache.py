@@ -0,0 +1,177 @@
+"""Versioned Parquet cache of the normalized transactions DataFrame.
+
+The cache records a fingerprint of the file it was built from (size, mtime
+and a content hash) and a schema version in the Parquet key/value metadata,
+and is only used while both still match. Columns are written with Arrow
+types (timestamps, dictionary-encoded strings, ``list<string>`` tags), rows
+are sorted by Date so row-group statistics can prune date ranges, and a
+``_source_row`` column restores the original row order on load.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    from src.indexes import TAG_SEPARATOR
+except ImportError:
+    from indexes import TAG_SEPARATOR
+
+# Bump whenever the cached layout or the normalization that feeds it changes
+CACHE_SCHEMA_VERSION = 1
+METADATA_KEY = b"truestate.cache"
+SOURCE_ROW_COLUMN = "_source_row"
+ROW_GROUP_SIZE = 128 * 1024
+HASH_BLOCK_BYTES = 4 * 1024 * 1024
+
+
+def _file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def source_fingerprint(path, content_hash=True):
+    """
+    Identify the current contents of ``path`` (and its SQLite WAL, if any).
+
+    Args:
+        content_hash: Also hash the file contents; skipped when only the
+            cheap size/mtime comparison is needed
+    """
+    files = [path] + [p for p in (f"{path}-wal",) if os.path.exists(p)]
+    fingerprint = {"path": os.path.basename(path), "files": [_stat(p) for p in files]}
+    if content_hash:
+        fingerprint["hash"] = [_file_hash(p) for p in files]
+    return fingerprint
+
+
+def read_metadata(cache_path):
+    """The cache's metadata dict, or None if it is missing or not one of ours."""
+    try:
+        raw = pq.read_schema(cache_path, memory_map=True).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if METADATA_KEY not in raw:
+        return None
+    return json.loads(raw[METADATA_KEY])
+
+
+def is_current(cache_path, source_path):
+    """
+    True if the cache at ``cache_path`` was built from the current contents
+    of ``source_path`` with the current schema version.
+
+    Matching size and mtime are trusted as-is; otherwise the source is hashed,
+    so a copied or touched but unchanged file still reuses the cache.
+    """
+    if not (os.path.exists(cache_path) and os.path.exists(source_path)):
+        return False
+    meta = read_metadata(cache_path)
+    if meta is None or meta.get("schema_version") != CACHE_SCHEMA_VERSION:
+        return False
+    cached = meta.get("source") or {}
+    current = source_fingerprint(source_path, content_hash=False)
+    if cached.get("path") != current["path"]:
+        return False
+    if cached.get("files") == current["files"]:
+        return True
+    current = source_fingerprint(source_path)
+    return cached.get("hash") == current["hash"]
+
+
+def _tags_array(series):
+    """Categorical Tags labels -> list<string> array."""
+    codes = series.cat.codes.to_numpy()
+    labels = [label.split(TAG_SEPARATOR) if label else [] for label in series.cat.categories]
+    lists = pa.array(labels, type=pa.list_(pa.string()))
+    return lists.take(pa.array(codes, mask=codes < 0))
+
+
+def to_arrow(df):
+    """Arrow table for the cache: Date-sorted with a _source_row column."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if 'Tags' in df.columns:
+        table = table.set_column(table.schema.get_field_index('Tags'), 'Tags', _tags_array(df['Tags']))
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            # Repeated strings (IDs, names) are stored once per row group
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+    table = table.append_column(SOURCE_ROW_COLUMN, pa.array(np.arange(len(df), dtype=np.int64)))
+    if 'Date' in df.columns:
+        table = table.sort_by([('Date', 'ascending')])
+    return table
+
+
+def save(df, cache_path, source_path):
+    """
+    Write ``df`` to the cache, stamped with the fingerprint of ``source_path``.
+
+    Raises:
+        ValueError: ``cache_path`` exists but is not a regular file (e.g. a
+            device such as /dev/null), which the atomic replace would clobber
+    """
+    if os.path.exists(cache_path) and not os.path.isfile(cache_path):
+        raise ValueError(f"Refusing to replace {cache_path}: not a regular file")
+    table = to_arrow(df)
+    meta = {
+        "schema_version": CACHE_SCHEMA_VERSION,
+        "source": source_fingerprint(source_path),
+    }
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps(meta).encode(),
+    })
+    tmp_path = f"{cache_path}.tmp"
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+    # Readers never see a half-written cache
+    os.replace(tmp_path, cache_path)
+
+
+def load(cache_path, categorical_columns=()):
+    """
+    Read the cache (memory-mapped) back into a DataFrame in source row order.
+
+    Only ``categorical_columns`` (and Tags) come back as categoricals, with
+    sorted categories as ``astype('category')`` would give; other dictionary
+    columns are decoded to plain strings. Tags become TAG_SEPARATOR-joined
+    labels, the in-memory layout normalize_frame produces.
+    """
+    table = pq.read_table(cache_path, memory_map=True)
+    columns = [c for c in table.column_names if c != SOURCE_ROW_COLUMN]
+    if SOURCE_ROW_COLUMN in table.column_names:
+        order = pc.sort_indices(table.column(SOURCE_ROW_COLUMN))
+        table = table.take(order).drop_columns([SOURCE_ROW_COLUMN])
+
+    tags = None
+    if 'Tags' in columns and pa.types.is_list(table.schema.field('Tags').type):
+        tags = pc.dictionary_encode(pc.binary_join(table.column('Tags'), TAG_SEPARATOR)).combine_chunks()
+        table = table.drop_columns(['Tags'])
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and field.name not in categorical_columns:
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+
+    df = table.to_pandas()
+    if tags is not None:
+        df['Tags'] = pd.Categorical.from_codes(
+            tags.indices.fill_null(-1).to_numpy(),
+            tags.dictionary.to_pylist()
+        )
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories
+            if not categories.is_monotonic_increasing:
+                df[col] = df[col].cat.reorder_categories(categories.sort_values())
+    return df[columns]
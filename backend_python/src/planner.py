@@ -0,0 +1,178 @@
+"""Selectivity-ordered evaluation of the predicates of a transactions query.
+
+A query is a conjunction of predicates: facet and tag filters, age and date
+ranges and the text search. Each predicate can be evaluated over the whole
+column (giving a packed row bitmap from its index), on a set of candidate
+rows only, or, for ranges, by listing its rows straight from a range index. ``execute`` runs first the predicates
+that discard the most rows per unit of work, going by selectivities
+estimated from ColumnStats (or counted by the range index) and costs from the index each one uses. At every
+step it picks whichever evaluation is cheaper for the rows still left. The
+expensive checks (substring search, per-row gathers) therefore usually see
+only the few candidates the cheap filters let through. Row positions are
+materialized once, at the end.
+"""
+import numpy as np
+
+try:
+    from src import metrics
+    from src.indexes import bitmap_test, bitmap_to_ids, popcount
+except ImportError:
+    import metrics
+    from indexes import bitmap_test, bitmap_to_ids, popcount
+
+# Approximate cost in nanoseconds of one unit of each kind of work, measured
+# on 1M rows. Only their ratios matter.
+BITMAP_BYTE_COST = 0.5      # OR/AND/popcount of one byte of a packed bitmap
+BIT_TEST_COST = 5.0         # testing one candidate row's bit in a bitmap
+MASK_FILL_COST = 0.3        # clearing one row of a boolean mask before packing it
+ROW_SCATTER_COST = 3.0      # setting one listed row in a bitmap
+RANK_TEST_COST = 5.0        # gathering and comparing one candidate row's rank
+SORT_ROW_COST = 30.0        # sorting one listed row position
+ID_SCAN_COST = 2.5          # finding the set bytes of a bitmap, per byte
+ROW_TO_ID_COST = 1.0        # unpacking one row position from a bitmap
+TEXT_VALUE_COST = 40.0      # matching one distinct search value
+TEXT_ROW_COST = 500.0       # matching one candidate row's search text
+POSTING_ROW_COST = 10.0     # expanding one matched search value's row
+
+
+class ColumnStats:
+    """
+    Value counts used to estimate how many rows a facet or tag filter keeps.
+
+    Range filters need no statistics: their range index counts the matching
+    rows exactly.
+
+    Args:
+        n_rows: Number of rows described
+        value_counts: Column -> {value: rows} for the facet columns and Tags
+    """
+
+    def __init__(self, n_rows, value_counts):
+        self.n_rows = n_rows
+        self.value_counts = value_counts
+
+    @classmethod
+    def from_indexes(cls, n_rows, facet_indexes, tag_index):
+        """Gather the statistics of the rows covered by these bitmap indexes."""
+        value_counts = {column: index.counts() for column, index in facet_indexes.items()}
+        if tag_index is not None:
+            value_counts["Tags"] = tag_index.counts()
+        return cls(n_rows, value_counts)
+
+    def fraction_of(self, column, values):
+        """Estimated share of rows whose ``column`` is one of ``values``."""
+        counts = self.value_counts.get(column)
+        if counts is None or not self.n_rows:
+            return 1.0
+        return min(1.0, sum(counts.get(value, 0) for value in values) / self.n_rows)
+
+
+class Predicate:
+    """
+    One conjunct of a query.
+
+    Args:
+        name: Stage name reported in Server-Timing (``filter.<key>``, ``search``)
+        selectivity: Estimated share of rows that pass
+        full_cost: Estimated cost of evaluating it over every row
+        row_cost: Estimated cost per candidate row of evaluating it on candidates
+        full: () -> packed bitmap of the rows that pass
+        restrict: (rows) -> boolean mask of the row positions ``rows`` that pass
+        lookup: Optional () -> sorted row positions that pass, for predicates
+            that can list their rows directly (range indexes)
+        lookup_cost: Estimated cost of ``lookup``
+    """
+
+    def __init__(self, name, selectivity, full_cost, row_cost, full, restrict, lookup=None, lookup_cost=None):
+        self.name = name
+        self.selectivity = selectivity
+        self.full_cost = full_cost
+        self.row_cost = row_cost
+        self.full = full
+        self.restrict = restrict
+        self.lookup = lookup
+        self.lookup_cost = lookup_cost
+
+    def cost(self, candidates):
+        costs = [self.full_cost, candidates * self.row_cost]
+        if self.lookup is not None:
+            costs.append(self.lookup_cost)
+        return min(costs)
+
+
+def plan(predicates, n_rows):
+    """
+    Order ``predicates`` so each step discards the most rows per unit of
+    cost, given the rows expected to be left by the steps before it.
+    """
+    remaining, ordered, expected = list(predicates), [], float(n_rows)
+    while remaining:
+        best = max(remaining, key=lambda p: ((1 - p.selectivity) / max(p.cost(expected), 1.0), -p.cost(expected)))
+        remaining.remove(best)
+        ordered.append(best)
+        expected *= best.selectivity
+    return ordered
+
+
+def ids_cost(n_rows, matched):
+    """Cost of turning a bitmap with ``matched`` of ``n_rows`` bits set into row positions."""
+    return n_rows / 8 * ID_SCAN_COST + min(n_rows, 8 * matched) * ROW_TO_ID_COST
+
+
+def execute(predicates, n_rows, checkpoint=None):
+    """
+    Evaluate the conjunction of ``predicates`` over ``n_rows`` rows.
+
+    Candidates stay a packed bitmap while whole-column evaluations are the
+    cheaper choice and become row positions once checking the survivors
+    directly, or listing a range's rows, costs less.
+
+    Returns:
+        Sorted row positions that pass, or None when there are no predicates
+    """
+    selection, rows, matched = None, None, n_rows
+    for predicate in plan(predicates, n_rows):
+        with metrics.stage(predicate.name) as st:
+            rows_in = matched
+            how = _strategy(predicate, n_rows, matched, bitmap=rows is None, filtered=selection is not None)
+            if how == "lookup":
+                listed = predicate.lookup()
+                rows = listed[bitmap_test(selection, listed)] if selection is not None else listed
+            elif how == "index" and rows is None:
+                bits = predicate.full()
+                selection = bits if selection is None else np.bitwise_and(selection, bits)
+            elif how == "index":
+                rows = rows[bitmap_test(predicate.full(), rows)]
+            else:
+                if rows is None:
+                    rows = np.arange(n_rows) if selection is None else bitmap_to_ids(selection, n_rows)
+                rows = rows[predicate.restrict(rows)]
+            matched = len(rows) if rows is not None else int(popcount(selection))
+            if st is not None:
+                st["rows"] = (rows_in, matched)
+                st["desc"] = how
+        if checkpoint is not None:
+            checkpoint()
+    if rows is None and selection is not None:
+        rows = bitmap_to_ids(selection, n_rows)
+    return rows
+
+
+def _strategy(predicate, n_rows, matched, bitmap, filtered):
+    """
+    Cheapest way to apply ``predicate`` to the ``matched`` candidates, held
+    as a bitmap (``bitmap``, ``filtered`` if any step ran) or as row positions.
+    """
+    restrict = matched * predicate.row_cost
+    if bitmap:
+        # A bitmap is turned into row positions once, now or after the last step
+        costs = {
+            "index": predicate.full_cost + ids_cost(n_rows, matched * predicate.selectivity),
+            "candidates": restrict + ids_cost(n_rows, matched),
+        }
+        if predicate.lookup is not None:
+            listed = predicate.selectivity * n_rows
+            costs["lookup"] = predicate.lookup_cost + (listed * BIT_TEST_COST if filtered else 0)
+    else:
+        costs = {"index": predicate.full_cost + matched * BIT_TEST_COST, "candidates": restrict}
+    return min(costs, key=costs.get)
@@ -0,0 +1,108 @@
+"""In-process cache of ordered query results for /api/transactions paging."""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Filter keys whose list values are OR-ed, so their order does not matter
+SET_FILTER_KEYS = ("customerRegions", "genders", "productCategories", "paymentMethods", "tags")
+
+DEFAULT_MAX_BYTES = int(os.environ.get("TRUESTATE_QUERY_CACHE_MB", "256")) * 1024 * 1024
+
+
+def query_key(q, filters, sort_field, sort_dir, version=0):
+    """
+    Normalize a query into a hashable cache key.
+
+    Equivalent queries (different case in ``q``, reordered multi-select values,
+    empty filter groups) map to the same key.
+    """
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if not value:
+            continue
+        if key in SET_FILTER_KEYS:
+            value = sorted({value} if isinstance(value, str) else set(value), key=str)
+        normalized[key] = value
+    direction = 'asc' if sort_dir == 'asc' else 'desc'
+    return (
+        version,
+        (q or '').lower(),
+        json.dumps(normalized, sort_keys=True, default=str),
+        sort_field or '',
+        direction,
+    )
+
+
+class QueryCache:
+    """
+    LRU cache of ordered row-id arrays, bounded by the bytes they hold.
+
+    Args:
+        max_bytes: Upper bound on the summed ``nbytes`` of cached arrays;
+            0 disables caching
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, rows, shared=False):
+        """
+        Cache ``rows`` under ``key``.
+
+        Args:
+            shared: True when ``rows`` is owned elsewhere (e.g. an index
+                permutation), so it does not count against the byte budget
+        """
+        size = 0 if shared else int(rows.nbytes)
+        if not self.enabled or size > self.max_bytes:
+            return
+        if not shared:
+            rows.setflags(write=False)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (rows, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the dataset is reloaded."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+            }
@@ -0,0 +1,227 @@
+"""Bounded, deadline-aware execution of /api/transactions queries.
+
+Cheap queries (facet filters on an indexed sort) run on the calling thread.
+Expensive ones (text search, tag filters, ranges, sorts without a SortIndex)
+go to a pool of worker processes that attach the dataset published in
+``data_processor.SHARED_DIR``, so one heavy pandas query no longer holds the
+GIL against every other request.
+
+Every query runs under a deadline. It is checked between pipeline stages
+(and by SQLite's progress handler), so a query that runs out of time stops
+at the next checkpoint with QueryTimeout; one still queued for a worker is
+cancelled outright. At most ``max_in_flight`` queries run or wait at once;
+beyond that ``run`` raises Overloaded immediately instead of queueing.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from src import data_processor, metrics
+except ImportError:
+    import data_processor
+    import metrics
+
+DEFAULT_WORKERS = int(os.environ.get('TRUESTATE_QUERY_WORKERS', max(0, min(4, (os.cpu_count() or 1) - 1))))
+DEFAULT_TIMEOUT = float(os.environ.get('TRUESTATE_QUERY_TIMEOUT', '10'))
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get('TRUESTATE_MAX_IN_FLIGHT', '32'))
+# data_processor settings a worker process must share with the API process
+WORKER_SETTINGS = ('CSV_PATH', 'DB_PATH', 'PARQUET_PATH', 'SHARED_DIR', 'ENGINE')
+# Extra time a worker gets to reach its next checkpoint and report the timeout
+RESULT_GRACE_SECONDS = 1.0
+
+
+class Overloaded(Exception):
+    """Raised when ``max_in_flight`` queries are already running or queued."""
+
+
+def _init_worker(settings):
+    for name, value in settings.items():
+        setattr(data_processor, name, value)
+    data_processor.load_data()
+
+
+def _warm_up():
+    return os.getpid()
+
+
+def _run_query(fn_name, kwargs, deadline_at):
+    """
+    Worker-side entry point; ``deadline_at`` is a time.time() value.
+
+    Returns (result, stages) so the worker's stage timings reach the request.
+    """
+    remaining = deadline_at - time.time()
+    if remaining <= 0:
+        raise data_processor.QueryTimeout("Query timed out while queued")
+    # Pick up rows ingested through another process
+    data_processor.refresh_shared()
+    with metrics.collect() as stages, data_processor.deadline(remaining):
+        result = getattr(data_processor, fn_name)(**kwargs)
+    return result, stages
+
+
+def is_expensive(q='', filters=None, sort_field='Date'):
+    """True if a query needs more than bitmap facet filters and a presorted order."""
+    filters = data_processor.parse_filters(filters)
+    if q or filters.get('tags') or filters.get('ageRange') or filters.get('dateRange'):
+        return True
+    return sort_field not in (data_processor.SORT_INDEXES or {})
+
+
+def is_expensive_call(kwargs):
+    """is_expensive for a query function's keyword arguments; a batch is expensive if any of its queries is."""
+    if 'queries' in kwargs:
+        return any(is_expensive_call(query) for query in kwargs['queries'])
+    return is_expensive(kwargs.get('q'), kwargs.get('filters'), kwargs.get('sort_field', 'Date'))
+
+
+class QueryExecutor:
+    """
+    Runs data_processor query functions with a timeout and an in-flight cap,
+    on a process pool for expensive queries when one is configured.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_ready = False
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.pooled = 0
+
+    def use_pool(self):
+        # SQLite releases the GIL while it runs a query, so threads are enough there;
+        # without a shared store every worker would load its own copy of the data
+        return self.workers > 0 and data_processor.ENGINE != 'sqlite' and bool(data_processor.SHARED_DIR)
+
+    def start(self):
+        """Spawn the workers and wait until each has attached the dataset."""
+        if not self.use_pool():
+            return
+        with self._lock:
+            if self._pool is None:
+                settings = {name: getattr(data_processor, name) for name in WORKER_SETTINGS}
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(settings,)
+                )
+                self._pool_ready = False
+            pool = self._pool
+        started = time.perf_counter()
+        try:
+            for future in [pool.submit(_warm_up) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool as e:
+            print(f"Query workers failed to start, running queries in-process: {e}")
+            self._reset_pool(pool)
+            return
+        self._pool_ready = True
+        print(f"Started {self.workers} query workers in {time.perf_counter() - started:.2f}s")
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool, self._pool_ready = self._pool, None, False
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool, self._pool_ready = None, False
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise Overloaded(f"Too many queries in flight (limit {self.max_in_flight})")
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self, timed_out=False):
+        with self._lock:
+            self.in_flight -= 1
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.completed += 1
+        self._slots.release()
+
+    def run(self, fn_name, **kwargs):
+        """
+        Call ``data_processor.<fn_name>(**kwargs)`` within the timeout.
+
+        Raises:
+            Overloaded: the in-flight cap is reached
+            QueryTimeout: the query did not finish in time
+        """
+        data_processor.refresh_shared()
+        self._acquire()
+        pool = self._pool if self._pool_ready else None
+        if pool is not None and is_expensive_call(kwargs):
+            try:
+                future = pool.submit(_run_query, fn_name, kwargs, time.time() + self.timeout)
+            except (BrokenProcessPool, RuntimeError):
+                # Serve this one in-process, in the slot it already holds, rather than failing it
+                self._reset_pool(pool)
+            else:
+                return self._wait_pooled(pool, future)
+        timed_out = False
+        try:
+            with data_processor.deadline(self.timeout):
+                return getattr(data_processor, fn_name)(**kwargs)
+        except data_processor.QueryTimeout:
+            timed_out = True
+            raise
+        finally:
+            self._release(timed_out)
+
+    def _wait_pooled(self, pool, future):
+        with self._lock:
+            self.pooled += 1
+
+        # The slot is held until the worker is actually done, so a query that
+        # overruns its deadline still counts against the in-flight cap
+        outcome = {"timed_out": False}
+
+        def done(f):
+            timed_out = outcome["timed_out"] or f.cancelled() or isinstance(f.exception(), data_processor.QueryTimeout)
+            self._release(timed_out)
+        future.add_done_callback(done)
+        try:
+            with metrics.stage("pool.wait"):
+                result, stages = future.result(timeout=self.timeout + RESULT_GRACE_SECONDS)
+        except FutureTimeout:
+            outcome["timed_out"] = True
+            future.cancel()
+            raise data_processor.QueryTimeout("Query exceeded its time limit")
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise
+        metrics.extend(stages)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers if self._pool_ready else 0,
+                "timeoutSeconds": self.timeout,
+                "maxInFlight": self.max_in_flight,
+                "inFlight": self.in_flight,
+                "completed": self.completed,
+                "pooled": self.pooled,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+            }
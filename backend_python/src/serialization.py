@@ -0,0 +1,154 @@
+"""Direct encoding of transaction pages and exports from DataFrame columns.
+
+Pages are converted column by column to plain Python values and encoded
+exactly once, instead of going through ``to_json`` -> ``json.loads`` and a
+second encode in the framework. Exports reuse the same conversion chunk by
+chunk so their memory use does not grow with the result size. Every
+function takes an optional ``columns`` list (see
+``data_processor.parse_fields``); only those columns are gathered and
+encoded.
+
+Small pages (the common 10-row table page) skip DataFrame.take: their rows
+are taken from per-column arrays and category labels cached for the
+current DataFrame, since pandas' fixed per-call overhead, not the data,
+is what a small page costs.
+"""
+import csv
+import io
+import json
+import weakref
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from src.indexes import TAG_SEPARATOR, split_tag_label
+except ImportError:
+    from indexes import TAG_SEPARATOR, split_tag_label
+
+
+# Pages of at most this many rows are converted from the cached column sources
+SMALL_PAGE_ROWS = 256
+
+# (weak reference to a DataFrame, column name -> rows -> JSON-ready values)
+_SOURCES = (None, {})
+
+
+def json_column(values, name):
+    """Convert column ``name``'s slice (Series or array) to a list of JSON-ready Python values (missing -> None)."""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        # Same text as strftime('%Y-%m-%dT%H:%M:%S.%fZ'), vectorized
+        text = np.datetime_as_string(np.asarray(values), unit='us')
+        return [None if t == 'NaT' else t + 'Z' for t in text.tolist()]
+
+    result = values.tolist()
+    missing = np.flatnonzero(np.asarray(pd.isna(values)))
+    for i in missing.tolist():
+        result[i] = None
+    if name == 'Tags':
+        result = [split_tag_label(v) for v in result]
+    return result
+
+
+def _column_source(series):
+    """Function from row positions to ``series``' JSON-ready values at those rows."""
+    array = series.array
+    if isinstance(array, pd.Categorical):
+        codes = array.codes
+        labels = array.categories.tolist()
+        if series.name == 'Tags':
+            labels = [split_tag_label(label) for label in labels]
+            return lambda rows: [list(labels[c]) if c >= 0 else split_tag_label(None) for c in codes[rows].tolist()]
+        return lambda rows: [labels[c] if c >= 0 else None for c in codes[rows].tolist()]
+    if isinstance(series.dtype, np.dtype):
+        # The ndarray itself: its tolist() gives Python scalars, unlike NumpyExtensionArray's
+        data = series.to_numpy()
+        return lambda rows: json_column(data[rows], series.name)
+    return lambda rows: json_column(array.take(rows), series.name)
+
+
+def _small_page_values(df, rows, columns):
+    """JSON-ready values of each of ``columns`` at ``rows``, from the sources cached for ``df``."""
+    global _SOURCES
+    ref, sources = _SOURCES
+    if ref is None or ref() is not df:
+        sources = {}
+        _SOURCES = (weakref.ref(df), sources)
+    values = []
+    for col in columns:
+        source = sources.get(col)
+        if source is None:
+            source = sources[col] = _column_source(df[col])
+        values.append(source(rows))
+    return values
+
+
+def gather(df, rows, columns=None):
+    """``rows`` of ``df``, restricted to those of ``columns`` it has (None = all)."""
+    if columns is not None:
+        df = df[[col for col in columns if col in df.columns]]
+    return df.take(rows)
+
+
+def page_records(df, rows, columns=None):
+    """Gather ``rows`` of ``df`` as a list of JSON-ready record dicts."""
+    if len(rows) == 0:
+        return []
+    if len(rows) <= SMALL_PAGE_ROWS:
+        columns = list(df.columns) if columns is None else [col for col in columns if col in df.columns]
+        values = _small_page_values(df, np.asarray(rows), columns)
+    else:
+        page_df = gather(df, rows, columns)
+        columns = list(page_df.columns)
+        values = [json_column(page_df[col], col) for col in columns]
+    return [dict(zip(columns, record)) for record in zip(*values)]
+
+
+def dumps(obj):
+    """Encode to compact UTF-8 JSON bytes, as FastAPI's JSONResponse would."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_page(df, rows, page, page_size, total, columns=None, **extra):
+    """Encode a /api/transactions response body straight to bytes."""
+    return dumps({
+        "data": page_records(df, rows, columns),
+        "page": page,
+        "pageSize": page_size,
+        "total": total,
+        **extra
+    })
+
+
+def iter_ndjson(df, rows, chunk_rows, columns=None):
+    """Yield newline-delimited JSON records for ``rows``, ``chunk_rows`` at a time."""
+    for start in range(0, len(rows), chunk_rows):
+        records = page_records(df, rows[start:start + chunk_rows], columns)
+        yield b"".join(dumps(record) + b"\n" for record in records)
+
+
+def iter_csv(df, rows, chunk_rows, columns=None):
+    """Yield a CSV header and then the rows of ``rows``, ``chunk_rows`` at a time."""
+    columns = list(df.columns) if columns is None else [col for col in columns if col in df.columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+
+    for start in range(0, len(rows), chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        page_df = gather(df, rows[start:start + chunk_rows], columns)
+        values = [json_column(page_df[col], col) for col in columns]
+        if 'Tags' in columns:
+            tags = columns.index('Tags')
+            values[tags] = [TAG_SEPARATOR.join(t) for t in values[tags]]
+        writer.writerows(zip(*values))
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,275 @@
+"""Publish the loaded dataset and its indexes once, attach them from every worker.
+
+The first worker to load a dataset version writes each column and every
+index array to files under ``<shared dir>/<version key>/``. Numeric,
+datetime and categorical-code columns (plus validity masks) go to ``.npy``
+files and string columns to an uncompressed Arrow IPC file. Workers then
+memory-map those files read-only, so N uvicorn workers share one copy in
+the page cache instead of holding N private copies.
+
+A lock file serializes publishing: workers that start while another one is
+loading wait for it and attach, rather than loading the data again. The
+CURRENT file names the latest published version, so workers notice when
+rows ingested by another worker were republished under a new key.
+
+Index objects are stored pickled (objects.pkl), and unpickling runs code,
+so the shared directory must be trusted: only the server's own user may be
+able to write to it. It is created private (0700), and attach refuses a
+directory or pickle that another user owns or can write to.
+"""
+import json
+import os
+import pickle
+import shutil
+import stat
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Bump when the on-disk layout changes
+STORE_VERSION = 3
+MANIFEST = "manifest.json"
+STRINGS_FILE = "strings.arrow"
+LOCK_FILE = ".publish.lock"
+CURRENT_FILE = "CURRENT"
+
+
+@contextmanager
+def publish_lock(shared_dir):
+    """Exclusive inter-process lock on ``shared_dir`` (blocks until acquired)."""
+    os.makedirs(shared_dir, mode=0o700, exist_ok=True)
+    with open(os.path.join(shared_dir, LOCK_FILE), 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def version_dir(shared_dir, key):
+    return os.path.join(shared_dir, f"v{STORE_VERSION}-{key}")
+
+
+def _save_array(directory, name, array):
+    np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    return f"{name}.npy"
+
+
+def _load_array(directory, filename):
+    return np.load(os.path.join(directory, filename), mmap_mode='r')
+
+
+def _check_trusted(path):
+    """Raise PermissionError unless only this user owns and can write to ``path``."""
+    if os.name != 'posix':
+        return
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} is writable by other users; not loading pickled objects from it")
+
+
+def _nullable_integer(dtype):
+    """Name of the pandas nullable integer dtype for a NumPy one ('uint8' -> 'UInt8')."""
+    return f"{'UInt' if dtype.kind == 'u' else 'Int'}{dtype.itemsize * 8}"
+
+
+def _is_string_column(series):
+    return pd.api.types.is_string_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype)
+
+
+# -- columns -----------------------------------------------------------------
+
+def _publish_columns(df, directory):
+    columns, strings = [], {}
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        name = f"col{i}"
+        dtype = series.dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            entry = {
+                "kind": "categorical",
+                "codes": _save_array(directory, name, series.cat.codes.to_numpy()),
+                "categories": series.cat.categories.tolist(),
+            }
+        elif isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'iufb' and hasattr(series.array, '_mask'):
+            entry = {
+                "kind": "masked",
+                "dtype": str(dtype),
+                "data": _save_array(directory, name, series.array._data),
+                "mask": _save_array(directory, f"{name}_mask", series.array._mask),
+            }
+        elif _is_string_column(series):
+            strings[col] = pa.array(series.to_numpy(dtype=object, na_value=None), type=pa.large_string())
+            entry = {"kind": "string"}
+        elif dtype.kind in 'iu':
+            # Stored as a nullable integer column: extension arrays are never
+            # consolidated into 2D blocks, which would copy the mapped data
+            entry = {
+                "kind": "masked",
+                "dtype": _nullable_integer(dtype),
+                "data": _save_array(directory, name, series.to_numpy()),
+                "mask": _save_array(directory, f"{name}_mask", np.zeros(len(series), dtype=bool)),
+            }
+        elif dtype.kind in 'fbM':
+            entry = {"kind": "numpy", "data": _save_array(directory, name, series.to_numpy())}
+        else:
+            raise TypeError(f"Column {col!r} has dtype {dtype} that cannot be shared")
+        columns.append(dict(entry, name=col))
+
+    if strings:
+        table = pa.table(strings)
+        with pa.OSFile(os.path.join(directory, STRINGS_FILE), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return columns
+
+
+def _string_dtype():
+    # pandas >= 3 uses NaN-missing Arrow strings by default; keep that dtype when available
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        return pd.StringDtype('pyarrow')
+
+
+def _attach_columns(columns, directory):
+    strings = None
+    if any(c["kind"] == "string" for c in columns):
+        strings = pa.ipc.open_file(pa.memory_map(os.path.join(directory, STRINGS_FILE), 'r')).read_all()
+
+    data = {}
+    for entry in columns:
+        kind = entry["kind"]
+        if kind == "categorical":
+            array = pd.Categorical.from_codes(_load_array(directory, entry["codes"]), entry["categories"])
+        elif kind == "masked":
+            values, mask = _load_array(directory, entry["data"]), _load_array(directory, entry["mask"])
+            dtype = pd.api.types.pandas_dtype(entry["dtype"])
+            array = dtype.construct_array_type()(values, mask)
+        elif kind == "string":
+            chunked = strings.column(entry["name"]).cast(pa.large_string())
+            array = pd.array(pd.arrays.ArrowStringArray(chunked), dtype=_string_dtype())
+        else:
+            array = _load_array(directory, entry["data"])
+        data[entry["name"]] = pd.Series(array, copy=False)
+    return pd.DataFrame(data, copy=False)
+
+
+# -- indexes -----------------------------------------------------------------
+
+def _publish_object(obj, directory, prefix):
+    """Split an index object into mapped arrays (.npy) and a small pickled remainder."""
+    arrays, rest = {}, {}
+    for attr, value in vars(obj).items():
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            arrays[attr] = _save_array(directory, f"{prefix}_{attr}", value)
+        else:
+            rest[attr] = value
+    return {"class": type(obj), "arrays": arrays, "rest": rest}
+
+
+def _attach_object(spec, directory):
+    obj = spec["class"].__new__(spec["class"])
+    obj.__dict__.update(spec["rest"])
+    for attr, filename in spec["arrays"].items():
+        setattr(obj, attr, _load_array(directory, filename))
+    return obj
+
+
+def publish(shared_dir, key, df, indexes, extra):
+    """
+    Write ``df``, ``indexes`` (name -> index object or dict of them) and a
+    picklable ``extra`` payload as dataset version ``key``. Call under
+    publish_lock; the version appears atomically once complete.
+    """
+    target = version_dir(shared_dir, key)
+    staging = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging, mode=0o700)
+
+    columns = _publish_columns(df, staging)
+    specs = {}
+    for name, index in indexes.items():
+        if isinstance(index, dict):
+            specs[name] = {k: _publish_object(v, staging, f"{name}_{i}") for i, (k, v) in enumerate(index.items())}
+        elif index is not None:
+            specs[name] = _publish_object(index, staging, name)
+        else:
+            specs[name] = None
+    objects_fd = os.open(os.path.join(staging, "objects.pkl"), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(objects_fd, 'wb') as f:
+        pickle.dump({"indexes": specs, "extra": extra}, f)
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump({"rows": len(df), "columns": columns}, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    pointer = os.path.join(shared_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(pointer, 'w') as f:
+        f.write(key)
+    os.replace(pointer, os.path.join(shared_dir, CURRENT_FILE))
+    # Older versions can go: attached workers keep their mappings alive
+    for entry in os.listdir(shared_dir):
+        path = os.path.join(shared_dir, entry)
+        if path != target and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def current_key(shared_dir):
+    """Key of the most recently published version, or None."""
+    try:
+        with open(os.path.join(shared_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def attach(shared_dir, key):
+    """
+    Map dataset version ``key`` read-only.
+
+    Returns:
+        (df, indexes, extra), or None if that version has not been published
+
+    Raises:
+        PermissionError: ``shared_dir``, the version or its pickle is not
+            private to this user (see the module docstring)
+    """
+    directory = version_dir(shared_dir, key)
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    objects_path = os.path.join(directory, "objects.pkl")
+    for path in (shared_dir, directory, objects_path):
+        _check_trusted(path)
+    with open(objects_path, 'rb') as f:
+        objects = pickle.load(f)
+
+    df = _attach_columns(manifest["columns"], directory)
+    indexes = {}
+    for name, spec in objects["indexes"].items():
+        if spec is None:
+            indexes[name] = None
+        elif "class" in spec:
+            indexes[name] = _attach_object(spec, directory)
+        else:
+            indexes[name] = {k: _attach_object(v, directory) for k, v in spec.items()}
+    return df, indexes, objects["extra"]
@@ -0,0 +1,535 @@
+"""SQLite-backed query engine for /api/transactions.
+
+Translates search, filters, sorting and pagination into parameterized SQL
+against the ``transactions`` table written by ``import_csv_to_sqlite.py``,
+so an API worker can answer queries without holding the dataset in memory.
+Results match the in-memory pandas engine: missing sort keys sort last in
+both directions and ties keep source (rowid) order.
+
+Run ``python sql_engine.py --check`` to compare both engines on a fixed set
+of queries.
+"""
+import base64
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src import data_processor, metrics
+    from src.indexes import FACET_COLUMNS
+    from src.serialization import dumps, iter_csv, iter_ndjson, page_records
+    from src.summary import MEASURE_COLUMNS, summarize
+except ImportError:
+    import data_processor
+    import metrics
+    from indexes import FACET_COLUMNS
+    from serialization import dumps, iter_csv, iter_ndjson, page_records
+    from summary import MEASURE_COLUMNS, summarize
+
+TABLE_NAME = 'transactions'
+FTS_TABLE = 'transactions_fts'
+TAGS_TABLE = 'transaction_tags'
+META_TABLE = 'engine_meta'
+
+# Friendly column -> SQL expression used for comparisons and sorting
+EXPRESSION_OVERRIDES = {
+    "Date": 'datetime("{col}")',
+}
+
+# Composite/single-column indexes on the columns the API filters and sorts by
+INDEX_COLUMNS = [
+    ("CustomerRegion", "Date"),
+    ("ProductCategory", "Date"),
+    ("PaymentMethod", "Date"),
+    ("Gender", "Date"),
+    ("Date",),
+    ("Age",),
+    ("CustomerName",),
+    ("Quantity",),
+    ("TotalAmount",),
+    ("FinalAmount",),
+]
+
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# SQLite VM instructions between deadline checks on a query connection
+PROGRESS_STEPS = 10000
+
+
+@contextmanager
+def deadline_errors():
+    """Report statements interrupted by the deadline progress handler as QueryTimeout."""
+    try:
+        yield
+    except (sqlite3.OperationalError, pd.errors.DatabaseError) as e:
+        if data_processor.deadline_exceeded():
+            raise data_processor.QueryTimeout("Query exceeded its time limit") from e
+        raise
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_signature(conn):
+    """Identifies the current contents of the transactions table (row count, last rowid)."""
+    return json.dumps(conn.execute(f"SELECT COUNT(*), MAX(rowid) FROM {TABLE_NAME}").fetchone())
+
+
+def is_current(conn, structure, signature):
+    """True if ``structure`` was last built for a table with ``signature``."""
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+    row = conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = ?", (structure,)).fetchone()
+    return row is not None and row[0] == signature
+
+
+def mark_current(conn, structure, signature):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(f"INSERT OR REPLACE INTO {META_TABLE} VALUES (?, ?)", (structure, signature))
+
+
+def drop_derived(conn):
+    """Drop the tags table, search index and build markers derived from a transactions table about to be replaced."""
+    conn.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai")
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {TAGS_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {META_TABLE}")
+
+
+def create_tags_table(conn):
+    """(Re)create the empty tags child table: one (tx_rowid, tag) row per tag of a transaction."""
+    conn.execute(f"DROP TABLE IF EXISTS {TAGS_TABLE}")
+    conn.execute(f"CREATE TABLE {TAGS_TABLE} (tx_rowid INTEGER NOT NULL, tag TEXT NOT NULL)")
+
+
+def index_tags_table(conn):
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TAGS_TABLE}_tag ON {TAGS_TABLE} (tag, tx_rowid)")
+
+
+class SQLiteEngine:
+    """
+    Answers transaction queries with SQL instead of the in-memory DataFrame.
+
+    Args:
+        db_path: Path to the SQLite database containing ``transactions``
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.columns = {}
+        self.ensure_schema()
+
+    # -- connections --------------------------------------------------------
+
+    def connection(self):
+        """Per-thread read-only connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            # Abort the running statement once the request's deadline passes
+            conn.set_progress_handler(data_processor.deadline_exceeded, PROGRESS_STEPS)
+            self._local.conn = conn
+        return conn
+
+    def _resolve_columns(self, conn):
+        lowered = {k.lower(): v for k, v in data_processor.COLUMN_MAPPING.items()}
+        columns = {}
+        for _, name, *_ in conn.execute(f"PRAGMA table_info({TABLE_NAME})"):
+            friendly = lowered.get(name.lower()) or lowered.get(name.replace('_', ' ').lower()) or name
+            columns.setdefault(friendly, name)
+        return columns
+
+    def expr(self, field):
+        """SQL expression for a friendly column name, or None if it does not exist."""
+        col = self.columns.get(field)
+        if col is None:
+            return None
+        template = EXPRESSION_OVERRIDES.get(field)
+        return template.format(col=col.replace('"', '""')) if template else quote(col)
+
+    # -- derived structures ------------------------------------------------
+
+    def ensure_schema(self):
+        """
+        Create query indexes, the tags child table and the FTS5 trigram table
+        if they are missing or were built for a different copy of the table.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.columns = self._resolve_columns(conn)
+            if not self.columns:
+                raise RuntimeError(f"Table '{TABLE_NAME}' not found in {self.db_path}")
+
+            signature = table_signature(conn)
+            if not is_current(conn, 'tags', signature):
+                print("Building SQLite tags table...")
+                self._build_tags(conn)
+                mark_current(conn, 'tags', signature)
+            if not is_current(conn, 'fts', signature):
+                print("Building SQLite search index...")
+                self._build_fts(conn)
+                mark_current(conn, 'fts', signature)
+            self._build_indexes(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _build_indexes(self, conn):
+        for fields in INDEX_COLUMNS:
+            exprs = [self.expr(f) for f in fields]
+            if any(e is None for e in exprs):
+                continue
+            name = "idx_tx_" + "_".join(f.lower() for f in fields)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE_NAME} ({', '.join(exprs)})")
+
+    def _build_tags(self, conn):
+        create_tags_table(conn)
+        tags_col = self.columns.get("Tags")
+        if tags_col is not None:
+            rows = conn.execute(f"SELECT rowid, {quote(tags_col)} FROM {TABLE_NAME}")
+            conn.executemany(
+                f"INSERT INTO {TAGS_TABLE} VALUES (?, ?)",
+                ((rowid, tag) for rowid, raw in rows for tag in data_processor.split_tags(raw))
+            )
+        index_tags_table(conn)
+
+    def _search_columns(self):
+        """(FTS column, SQL expression) pairs with the same text the in-memory search matches."""
+        pairs = []
+        name, phone = self.expr("CustomerName"), self.expr("PhoneNumber")
+        if name:
+            pairs.append(("name", f"lower({name})"))
+        if phone:
+            # Phone numbers imported from a column with gaps are stored as REAL
+            pairs.append(("phone", f"lower(CASE WHEN typeof({phone}) = 'real' AND {phone} = CAST({phone} AS INTEGER) "
+                                   f"THEN CAST(CAST({phone} AS INTEGER) AS TEXT) ELSE CAST({phone} AS TEXT) END)"))
+        return pairs
+
+    def _build_fts(self, conn):
+        conn.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai")
+        conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        pairs = self._search_columns()
+        if not pairs:
+            return
+        names = ", ".join(name for name, _ in pairs)
+        # Contentless: only rowids are ever read back
+        conn.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({names}, tokenize='trigram', content='')")
+        conn.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, {names}) "
+            f"SELECT rowid, {', '.join(expr for _, expr in pairs)} FROM {TABLE_NAME}"
+        )
+        # Keep the index in step with rows appended later
+        new_exprs = ", ".join(expr for _, expr in pairs)
+        conn.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {TABLE_NAME} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {names}) SELECT new.rowid, {new_exprs} "
+            f"FROM {TABLE_NAME} WHERE rowid = new.rowid; END"
+        )
+
+    # -- query translation -------------------------------------------------
+
+    def where_clause(self, q, filters):
+        """Translate q and filters to a WHERE clause (possibly empty) and its parameters."""
+        conditions, params = [], []
+
+        if q:
+            needle = q.lower()
+            pairs = self._search_columns()
+            if len(needle) >= 3 and pairs:
+                # A trigram phrase query is a substring match on the lowered text
+                conditions.append(f"rowid IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?)")
+                params.append('"' + needle.replace('"', '""') + '"')
+            else:
+                # Too short for trigrams: scan the same expressions
+                terms = []
+                for _, expr in pairs:
+                    terms.append(f"instr({expr}, ?) > 0")
+                    params.append(needle)
+                conditions.append("(" + " OR ".join(terms or ["0"]) + ")")
+
+        for key, field in FACET_COLUMNS.items():
+            values = filters.get(key)
+            expr = self.expr(field)
+            if not values or expr is None:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            conditions.append(f"{expr} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+        tags = filters.get('tags')
+        if tags:
+            tags = [tags] if isinstance(tags, str) else list(tags)
+            conditions.append(
+                f"rowid IN (SELECT tx_rowid FROM {TAGS_TABLE} WHERE tag IN ({', '.join('?' * len(tags))}))"
+            )
+            params.extend(tags)
+
+        age = self.expr("Age")
+        if filters.get('ageRange') and age:
+            conditions.append(f"{age} IS NOT NULL")
+            for value, op in zip(data_processor.range_bounds(filters, 'ageRange', 'i'), ('>=', '<=')):
+                if value is not None:
+                    conditions.append(f"{age} {op} ?")
+                    params.append(value)
+
+        date = self.expr("Date")
+        if filters.get('dateRange') and date:
+            for value, op in zip(data_processor.range_bounds(filters, 'dateRange', 'M'), ('>=', '<=')):
+                if value is not None:
+                    conditions.append(f"{date} {op} ?")
+                    params.append(pd.Timestamp(value).strftime(DATE_FORMAT))
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return where, params
+
+    def select_list(self, columns):
+        """SELECT list for the friendly ``columns`` (None = every column)."""
+        present = [quote(self.columns[field]) for field in columns or () if field in self.columns]
+        return ", ".join(present) if present else "*"
+
+    def order_clause(self, sort_field, sort_dir):
+        expr = self.expr(sort_field) if sort_field else None
+        if expr is None:
+            return None, " ORDER BY rowid"
+        direction = 'ASC' if sort_dir == 'asc' else 'DESC'
+        return expr, f" ORDER BY ({expr}) IS NULL, {expr} {direction}, rowid"
+
+    # -- cursors -----------------------------------------------------------
+
+    @staticmethod
+    def encode_cursor(sort_field, sort_dir, key, rowid):
+        payload = {"f": sort_field, "d": sort_dir, "v": key, "r": int(rowid) - 1}
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def _keyset_condition(self, cursor, sort_field, sort_dir, expr):
+        key, row = data_processor.decode_cursor(cursor, sort_field, sort_dir)
+        rowid = row + 1
+        if expr is None:
+            return "rowid > ?", [rowid]
+        if key is None:
+            return f"(({expr}) IS NULL AND rowid > ?)", [rowid]
+        op = '>' if sort_dir == 'asc' else '<'
+        return (
+            f"(({expr}) IS NULL OR {expr} {op} ? OR ({expr} = ? AND rowid > ?))",
+            [key, key, rowid]
+        )
+
+    # -- public API --------------------------------------------------------
+
+    def _read_page(self, sql, params):
+        frame = pd.read_sql_query(sql, self.connection(), params=params)
+        extras = frame[[c for c in ('_rowid', '_sort_key') if c in frame.columns]]
+        frame = frame.drop(columns=list(extras.columns))
+        return data_processor.normalize_frame(frame), extras
+
+    def query_page(self, page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None, cursor=None, columns=None):
+        """
+        Return (page DataFrame, total matches, next cursor) for a request.
+
+        Only ``columns`` (None = all) are read from the table.
+        """
+        filters = data_processor.parse_filters(filters)
+        select = self.select_list(columns)
+        where, params = self.where_clause(q, filters)
+        with metrics.stage("sql.count"):
+            total = self.connection().execute(f"SELECT COUNT(*) FROM {TABLE_NAME}{where}", params).fetchone()[0]
+        sort_expr, order = self.order_clause(sort_field, sort_dir)
+
+        if cursor is None:
+            sql = f"SELECT {select} FROM {TABLE_NAME}{where}{order} LIMIT ? OFFSET ?"
+            with metrics.stage("sql.page"):
+                frame, _ = self._read_page(sql, params + [page_size, (page - 1) * page_size])
+            return frame, total, None
+
+        key_select = f", {sort_expr} AS _sort_key" if sort_expr else ""
+        page_params = list(params)
+        if cursor:
+            condition, keyset_params = self._keyset_condition(cursor, sort_field, sort_dir, sort_expr)
+            where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+            page_params += keyset_params
+        sql = f"SELECT {select}, rowid AS _rowid{key_select} FROM {TABLE_NAME}{where}{order} LIMIT ?"
+        with metrics.stage("sql.page"):
+            frame, extras = self._read_page(sql, page_params + [page_size + 1])
+        next_cursor = None
+        if len(frame) > page_size:
+            frame = frame.iloc[:page_size]
+            last = extras.iloc[page_size - 1]
+            key = last['_sort_key'] if sort_expr else None
+            key = None if pd.isna(key) else (key.item() if hasattr(key, 'item') else key)
+            next_cursor = self.encode_cursor(sort_field, sort_dir, key, last['_rowid'])
+        return frame, total, next_cursor
+
+    def get_transactions(self, page=1, page_size=10, sort_field='Date', sort_dir='desc', q='', filters=None, cursor=None, fields=None):
+        columns = data_processor.parse_fields(fields)
+        with deadline_errors():
+            frame, total, next_cursor = self.query_page(page, page_size, sort_field, sort_dir, q, filters, cursor, columns)
+        with metrics.stage("serialize"):
+            data = page_records(frame, np.arange(len(frame)), columns)
+        result = {
+            "data": data,
+            "page": page,
+            "pageSize": page_size,
+            "total": total
+        }
+        if cursor is not None:
+            result["nextCursor"] = next_cursor
+        return result
+
+    def get_transactions_json(self, *args, **kwargs):
+        return dumps(self.get_transactions(*args, **kwargs))
+
+    def export_transactions(self, fmt='csv', sort_field='Date', sort_dir='desc', q='', filters=None, chunk_rows=5000, columns=None):
+        """Stream the full result set (``columns`` only), fetching ``chunk_rows`` rows per round trip."""
+        filters = data_processor.parse_filters(filters)
+        where, params = self.where_clause(q, filters)
+        _, order = self.order_clause(sort_field, sort_dir)
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        cursor = conn.execute(f"SELECT {self.select_list(columns)} FROM {TABLE_NAME}{where}{order}", params)
+        names = [d[0] for d in cursor.description]
+        encode = iter_ndjson if fmt == 'ndjson' else iter_csv
+        try:
+            first = True
+            while True:
+                batch = cursor.fetchmany(chunk_rows)
+                if not batch and not first:
+                    break
+                frame = data_processor.normalize_frame(pd.DataFrame.from_records(batch, columns=names))
+                chunks = encode(frame, np.arange(len(frame)), max(len(frame), 1), columns)
+                if fmt != 'ndjson' and not first:
+                    # The CSV header is only written once
+                    next(chunks)
+                yield from chunks
+                first = False
+                if len(batch) < chunk_rows:
+                    break
+        finally:
+            conn.close()
+
+    def get_summary(self, q='', filters=None):
+        """Summary aggregates (see summary.summarize), grouped by SQLite."""
+        filters = data_processor.parse_filters(filters)
+        where, params = self.where_clause(q, filters)
+        keys = {
+            "CustomerRegion": self.expr("CustomerRegion") or "NULL",
+            "ProductCategory": self.expr("ProductCategory") or "NULL",
+            "Month": f"strftime('%Y-%m-01', {self.expr('Date')})" if self.expr('Date') else "NULL",
+        }
+        sums = ", ".join(f"TOTAL({self.expr(column) or 0}) AS {key}" for key, column in MEASURE_COLUMNS.items())
+        sql = (
+            f"SELECT {', '.join(f'{expr} AS {key}' for key, expr in keys.items())}, COUNT(*) AS transactions, {sums} "
+            f"FROM {TABLE_NAME}{where} GROUP BY 1, 2, 3"
+        )
+        with deadline_errors(), metrics.stage("sql.summary"):
+            cells = pd.read_sql_query(sql, self.connection(), params=params)
+        cells["Month"] = pd.to_datetime(cells["Month"])
+        return summarize(cells, source='sql')
+
+    def get_filter_options(self, q=None, filters=None):
+        conn = self.connection()
+
+        def distinct(field):
+            expr = self.expr(field)
+            if expr is None:
+                return []
+            rows = conn.execute(f"SELECT DISTINCT {expr} FROM {TABLE_NAME} WHERE {expr} IS NOT NULL")
+            return sorted(r[0] for r in rows)
+
+        options = {
+            "regions": distinct("CustomerRegion"),
+            "productCategories": distinct("ProductCategory"),
+            "paymentMethods": distinct("PaymentMethod"),
+            "tags": [r[0] for r in conn.execute(f"SELECT DISTINCT tag FROM {TAGS_TABLE} ORDER BY tag")]
+        }
+        if q is None and filters is None:
+            return options
+
+        # Same counts as data_processor.facet_counts: each facet grouped under every filter but its own
+        with deadline_errors():
+            filters = data_processor.parse_filters(filters)
+            counts = {}
+            for key, field in FACET_COLUMNS.items():
+                expr = self.expr(field)
+                if expr is None:
+                    continue
+                where, params = self.where_clause(q, {k: v for k, v in filters.items() if k != key})
+                grouped = dict(conn.execute(f"SELECT {expr}, COUNT(*) FROM {TABLE_NAME}{where} GROUP BY 1", params))
+                count_key = data_processor.FACET_COUNT_KEYS[key]
+                values = options[count_key] if count_key in options else distinct(field)
+                counts[count_key] = {value: grouped.get(value, 0) for value in values}
+
+            where, params = self.where_clause(q, {k: v for k, v in filters.items() if k != 'tags'})
+            scope = f" WHERE tx_rowid IN (SELECT rowid FROM {TABLE_NAME}{where})" if where else ""
+            grouped = dict(conn.execute(f"SELECT tag, COUNT(DISTINCT tx_rowid) FROM {TAGS_TABLE}{scope} GROUP BY tag", params))
+            counts["tags"] = {tag: grouped.get(tag, 0) for tag in options["tags"]}
+
+            where, params = self.where_clause(q, filters)
+            total = conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}{where}", params).fetchone()[0]
+        return dict(options, counts=counts, total=total)
+
+PARITY_QUERIES = [
+    {},
+    {"page": 3, "page_size": 25},
+    {"sort_field": "CustomerName", "sort_dir": "asc", "page": 2},
+    {"sort_field": "Quantity", "sort_dir": "desc", "page": 5},
+    {"sort_field": "Age", "sort_dir": "asc", "page": 40, "page_size": 50},
+    {"sort_field": "TotalAmount", "sort_dir": "desc"},
+    {"q": "an"},
+    {"q": "sharma", "sort_field": "FinalAmount", "sort_dir": "asc"},
+    {"q": "98"},
+    {"filters": {"customerRegions": ["North", "East"], "genders": ["Female"]}},
+    {"filters": {"productCategories": ["Electronics"], "paymentMethods": ["UPI", "Cash"]}},
+    {"filters": {"tags": ["organic", "smart"]}, "sort_field": "Date", "sort_dir": "asc"},
+    {"filters": {"ageRange": {"min": 25, "max": 35}}, "sort_field": "Age", "sort_dir": "desc"},
+    {"filters": {"dateRange": {"from": "2023-03-01", "to": "2023-06-30"}}, "page": 4},
+    {"filters": {"ageRange": {"min": "25", "max": "40.5"}, "dateRange": {"from": "2023-03-01", "to": ""}}},
+    {"q": "a", "filters": {"customerRegions": ["West"], "ageRange": {"min": 30}, "tags": ["casual"]}},
+    {"fields": "table", "sort_field": "Age", "sort_dir": "asc", "page": 2},
+    {"fields": "TotalAmount,Tags,Date", "filters": {"tags": ["smart"]}},
+]
+
+
+def compare_engines(engine, queries=PARITY_QUERIES):
+    """
+    Run ``queries`` through both engines (and cursor mode) and return the
+    list of queries whose results differ.
+    """
+    mismatches = []
+    for query in queries:
+        expected = data_processor.get_transactions(**query)
+        if engine.get_transactions(**query) != expected:
+            mismatches.append(query)
+            continue
+        cursor_query = {k: v for k, v in query.items() if k != 'page'}
+        first_sql = engine.get_transactions(cursor='', **cursor_query)
+        first_mem = data_processor.get_transactions(cursor='', **cursor_query)
+        if first_sql['data'] != first_mem['data'] or (first_sql['nextCursor'] is None) != (first_mem['nextCursor'] is None):
+            mismatches.append(dict(query, cursor=''))
+            continue
+        if first_sql['nextCursor']:
+            second_sql = engine.get_transactions(cursor=first_sql['nextCursor'], **cursor_query)
+            second_mem = data_processor.get_transactions(cursor=first_mem['nextCursor'], **cursor_query)
+            if second_sql['data'] != second_mem['data']:
+                mismatches.append(dict(query, cursor='<second page>'))
+    return mismatches
+
+
+if __name__ == '__main__':
+    import sys
+
+    engine = SQLiteEngine(data_processor.DB_PATH)
+    if '--check' in sys.argv:
+        # Build the in-memory engine from the same database, without touching
+        # the parquet cache or publishing to the shared store
+        data_processor.ENGINE = 'pandas'
+        data_processor.PARQUET_PATH = None
+        data_processor.SHARED_DIR = ''
+        data_processor.load_data()
+        failures = compare_engines(engine)
+        for query in failures:
+            print(f"MISMATCH: {query}")
+        print(f"{len(PARITY_QUERIES) - len(failures)}/{len(PARITY_QUERIES)} queries identical")
+        sys.exit(1 if failures else 0)
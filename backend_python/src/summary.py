@@ -0,0 +1,245 @@
+"""Aggregates for /api/transactions/summary.
+
+Totals (transactions, units, gross amount, discount, revenue) and their
+breakdowns by region, category and month are computed from a frame of
+"cells": one row per group of transactions carrying a count and measure
+sums. A cell is either a single matching transaction (row path), a group
+returned by SQL, or a cell of the SummaryCube built at load time over
+(day, CustomerRegion, ProductCategory, PaymentMethod, Gender). Filter-only
+queries are answered from the cube, so they cost O(cells) instead of O(rows).
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    from src.indexes import FACET_COLUMNS
+except ImportError:
+    from indexes import FACET_COLUMNS
+
+# Response measure -> DataFrame column summed for it
+MEASURE_COLUMNS = {
+    "quantity": "Quantity",
+    "totalAmount": "TotalAmount",
+    "revenue": "FinalAmount",
+}
+MEASURES = ["transactions"] + list(MEASURE_COLUMNS)
+
+# Response key -> cell column grouped by
+BREAKDOWNS = {
+    "byRegion": "CustomerRegion",
+    "byCategory": "ProductCategory",
+    "byMonth": "Month",
+}
+
+# Cube dimensions besides the day: exactly the multi-select facet columns
+CUBE_DIMENSIONS = list(FACET_COLUMNS.values())
+
+
+def _measure_values(series):
+    """Float values of a measure column with missing values counted as 0."""
+    return series.to_numpy(dtype='float64', na_value=0.0)
+
+
+def _months(dates):
+    return np.asarray(dates).astype('datetime64[D]').astype('datetime64[M]')
+
+
+def measure_frame(df, rows=None):
+    """Cells for the row path: one per transaction of ``rows`` (None = all)."""
+    columns = [c for c in ["Date", "CustomerRegion", "ProductCategory"] + list(MEASURE_COLUMNS.values()) if c in df.columns]
+    part = df[columns] if rows is None else df[columns].take(rows)
+    cells = {column: part[column].array for column in ("CustomerRegion", "ProductCategory") if column in part}
+    if "Date" in part:
+        cells["Month"] = _months(part["Date"].to_numpy())
+    cells["transactions"] = np.ones(len(part), dtype=np.int64)
+    for key, column in MEASURE_COLUMNS.items():
+        cells[key] = _measure_values(part[column]) if column in part else np.zeros(len(part))
+    return pd.DataFrame(cells)
+
+
+def _label(value):
+    if value is None or pd.isna(value):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).strftime('%Y-%m')
+    return value
+
+
+def _measures(sums):
+    total_amount = round(float(sums["totalAmount"]), 2)
+    revenue = round(float(sums["revenue"]), 2)
+    return {
+        "transactions": int(sums["transactions"]),
+        "quantity": int(round(float(sums["quantity"]))),
+        "totalAmount": total_amount,
+        "discount": round(total_amount - revenue, 2),
+        "revenue": revenue,
+    }
+
+
+def summarize(cells, source):
+    """
+    Fold a cell frame into the summary response.
+
+    Args:
+        cells: DataFrame with the BREAKDOWNS columns and one column per MEASURES
+            entry holding that cell's sums
+        source: How the cells were produced ('cube', 'rows' or 'sql')
+    """
+    measures = cells[MEASURES]
+    totals = _measures(measures.sum())
+    result = {"total": totals["transactions"], "totals": totals}
+    for key, column in BREAKDOWNS.items():
+        if column not in cells.columns:
+            result[key] = []
+            continue
+        grouped = measures.groupby(cells[column], dropna=False, observed=True, sort=True).sum()
+        result[key] = [
+            {"key": _label(k), **_measures(row)}
+            for k, row in zip(grouped.index, grouped.to_dict('records'))
+        ]
+    result["source"] = source
+    return result
+
+
+class SummaryCube:
+    """
+    Transaction counts and measure sums per (day, facet values) cell.
+
+    Args:
+        days: Day of each cell as datetime64[D] (NaT for a missing Date)
+        codes: 2-D int16 array, one column per dimension, holding category
+            code + 1 (0 for a missing value)
+        sums: 2-D float64 array, one column per MEASURES entry
+        dimensions: Dimension column names, in ``codes`` column order
+        categories: Category labels of each dimension
+        day_aligned: True when every Date is at midnight, so a date range can
+            be answered exactly from day cells
+    """
+
+    def __init__(self, days, codes, sums, dimensions, categories, day_aligned):
+        self.days = days
+        self.codes = codes
+        self.sums = sums
+        self.dimensions = dimensions
+        self.categories = categories
+        self.day_aligned = day_aligned
+
+    @classmethod
+    def from_frame(cls, df):
+        dates = df["Date"].to_numpy().astype('datetime64[ns]')
+        days = dates.astype('datetime64[D]')
+        present = ~np.isnat(days)
+        day_numbers = days.view(np.int64)
+        first_day = int(day_numbers[present].min()) if present.any() else 0
+        # Day slot 0 collects rows without a Date
+        key = np.where(present, day_numbers - first_day + 1, 0).astype(np.int64)
+
+        dimensions = [c for c in CUBE_DIMENSIONS if c in df.columns]
+        categories, radixes = [], []
+        for column in dimensions:
+            series = df[column]
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype('category')
+            labels = series.cat.categories.tolist()
+            categories.append(labels)
+            radixes.append(len(labels) + 1)
+            key = key * radixes[-1] + (series.cat.codes.to_numpy().astype(np.int64) + 1)
+
+        cells, inverse = np.unique(key, return_inverse=True)
+        inverse = inverse.ravel()
+        sums = np.empty((len(cells), len(MEASURES)), dtype=np.float64)
+        sums[:, 0] = np.bincount(inverse, minlength=len(cells))
+        for i, column in enumerate(MEASURE_COLUMNS.values(), start=1):
+            weights = _measure_values(df[column]) if column in df.columns else np.zeros(len(df))
+            sums[:, i] = np.bincount(inverse, weights=weights, minlength=len(cells))
+
+        # Decode each cell key back into its dimension codes and day
+        codes = np.empty((len(cells), len(dimensions)), dtype=np.int16)
+        rest = cells
+        for d in range(len(dimensions) - 1, -1, -1):
+            rest, codes[:, d] = np.divmod(rest, radixes[d])
+        cell_days = np.where(rest > 0, rest - 1 + first_day, np.iinfo(np.int64).min).view('datetime64[D]')
+
+        day_aligned = bool((dates[present] == days[present].astype('datetime64[ns]')).all())
+        return cls(cell_days, codes, sums, dimensions, categories, day_aligned)
+
+    def append(self, df):
+        """Cube over these rows plus ``df``, whose categoricals extend this cube's categories."""
+        delta = SummaryCube.from_frame(df)
+        # Re-express this cube's codes against the (possibly larger) new categories
+        codes = np.empty_like(self.codes)
+        for d, column in enumerate(self.dimensions):
+            remap = pd.Index(delta.categories[d]).get_indexer(self.categories[d]) + 1
+            codes[:, d] = np.concatenate(([0], remap))[self.codes[:, d]]
+        keys = np.column_stack([
+            np.concatenate([self.days, delta.days]).view(np.int64),
+            np.concatenate([codes, delta.codes]).astype(np.int64),
+        ])
+        cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        all_sums = np.concatenate([self.sums, delta.sums])
+        sums = np.column_stack([
+            np.bincount(inverse, weights=all_sums[:, i], minlength=len(cells)) for i in range(len(MEASURES))
+        ])
+        return SummaryCube(
+            np.ascontiguousarray(cells[:, 0]).view('datetime64[D]'), cells[:, 1:].astype(np.int16), sums,
+            delta.dimensions, delta.categories, self.day_aligned and delta.day_aligned
+        )
+
+    @property
+    def nbytes(self):
+        return int(self.days.nbytes + self.codes.nbytes + self.sums.nbytes)
+
+    def can_answer(self, q, filters):
+        """True if the cube alone answers ``q``/``filters`` exactly."""
+        if q or filters.get('tags') or filters.get('ageRange'):
+            return False
+        if filters.get('dateRange') and not self.day_aligned:
+            return False
+        return all(
+            not filters.get(key) or column in self.dimensions
+            for key, column in FACET_COLUMNS.items()
+        )
+
+    def select(self, filters):
+        """Boolean mask of the cells matching facet and date range filters."""
+        mask = np.ones(len(self.days), dtype=bool)
+        for key, column in FACET_COLUMNS.items():
+            selected = filters.get(key)
+            if not selected:
+                continue
+            if isinstance(selected, str):
+                selected = [selected]
+            d = self.dimensions.index(column)
+            positions = {label: i + 1 for i, label in enumerate(self.categories[d])}
+            wanted = [positions[v] for v in selected if v in positions]
+            mask &= np.isin(self.codes[:, d], wanted)
+
+        dr = filters.get('dateRange') or {}
+        # Cells are whole days, so bounds round inward to the days they fully cover
+        if dr.get('from'):
+            start = pd.to_datetime(dr['from']).to_datetime64()
+            first = start.astype('datetime64[D]')
+            if first < start:
+                first += np.timedelta64(1, 'D')
+            mask &= self.days >= first
+        if dr.get('to'):
+            end = pd.to_datetime(dr['to']).to_datetime64().astype('datetime64[D]')
+            mask &= self.days <= end
+        return mask
+
+    def cells(self, filters):
+        """Cell frame (see summarize) of the cells matching ``filters``."""
+        mask = self.select(filters)
+        frame = {}
+        for column in ("CustomerRegion", "ProductCategory"):
+            if column in self.dimensions:
+                d = self.dimensions.index(column)
+                frame[column] = pd.Categorical.from_codes(
+                    self.codes[mask, d].astype(np.int64) - 1, self.categories[d]
+                )
+        frame["Month"] = self.days[mask].astype('datetime64[M]')
+        for i, measure in enumerate(MEASURES):
+            frame[measure] = self.sums[mask, i]
+        return pd.DataFrame(frame)
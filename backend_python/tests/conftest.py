@@ -0,0 +1,70 @@
+"""Fixtures shared by the backend tests: a small synthetic dataset loaded into data_processor."""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from generate_dataset import generate_dataset  # noqa: E402
+from src import data_processor as dp  # noqa: E402
+from src.import_csv_to_sqlite import bulk_import_csv_to_sqlite  # noqa: E402
+
+FIXTURE_ROWS = 3000
+
+
+@pytest.fixture(scope="session")
+def csv_path(tmp_path_factory):
+    """Synthetic transactions CSV with the dataset's header (same seed every run)."""
+    path = tmp_path_factory.mktemp("data") / "transactions.csv"
+    generate_dataset(FIXTURE_ROWS, str(path), seed=7, chunk_rows=1000)
+    return str(path)
+
+
+def load(csv_path, db_path=None, parquet_path=None):
+    """
+    (Re)load data_processor with the in-memory engine from ``csv_path``, or
+    from ``db_path`` when given, with the shared store disabled and the
+    parquet cache only at ``parquet_path``, if given.
+    """
+    dp.CSV_PATH = csv_path
+    dp.DB_PATH = db_path or os.path.join(os.path.dirname(csv_path), "missing.db")
+    dp.PARQUET_PATH = parquet_path
+    dp.SHARED_DIR = ""
+    dp.SHARED_KEY = None
+    dp.ENGINE = "pandas"
+    dp.SQL_ENGINE = None
+    dp.DF = None
+    dp.LOAD_STATUS["state"] = "idle"
+    dp.QUERY_CACHE.clear()
+    dp.load_data()
+    return dp
+
+
+@pytest.fixture
+def dataset(csv_path):
+    """data_processor freshly loaded from the fixture CSV (tests may modify it)."""
+    return load(csv_path)
+
+
+@pytest.fixture
+def persisted(csv_path, tmp_path):
+    """data_processor loaded from a database built from the fixture CSV."""
+    db_path = str(tmp_path / "transactions.db")
+    bulk_import_csv_to_sqlite(csv_path, db_path, workers=1)
+    return load(csv_path, db_path)
+
+
+def delta_csv(csv_path, tmp_path, name="Zed Quux", edit=None):
+    """CSV of ten fixture rows renamed to ``name``, with new transaction IDs; ``edit`` may change the frame first."""
+    frame = pd.read_csv(csv_path, nrows=10, dtype=str, keep_default_na=False)
+    frame["Customer Name"] = name
+    frame["Transaction ID"] = [str(900000 + i) for i in range(len(frame))]
+    if edit is not None:
+        edit(frame)
+    path = tmp_path / "delta.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
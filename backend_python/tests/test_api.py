@@ -0,0 +1,137 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def delta(csv_path):
+    frame = pd.read_csv(csv_path, nrows=5, dtype=str, keep_default_na=False)
+    frame["Transaction ID"] = [str(800000 + i) for i in range(len(frame))]
+    return frame.to_csv(index=False)
+
+
+def ingest(client, body, token=TOKEN, **headers):
+    if token is not None:
+        headers["Authorization"] = f"Bearer {token}"
+    return client.post("/api/transactions/ingest", content=body, headers=headers)
+
+
+def test_ingest_disabled_without_configured_token(client, delta, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_TOKEN", "")
+    assert ingest(client, delta).status_code == 403
+
+
+def test_ingest_requires_token(client, delta, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_TOKEN", TOKEN)
+    rows = client.get("/api/transactions").json()["total"]
+    assert ingest(client, delta, token=None).status_code == 401
+    assert ingest(client, delta, token="wrong").status_code == 401
+
+    response = ingest(client, delta)
+    assert response.status_code == 200
+    assert response.json()["ingested"] == 5
+    assert client.get("/api/transactions").json()["total"] == rows + 5
+
+
+def test_ingest_rejects_oversized_body(client, delta, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_TOKEN", TOKEN)
+    monkeypatch.setattr(main, "INGEST_MAX_BYTES", len(delta.encode()) - 1)
+    assert ingest(client, delta).status_code == 413
+
+
+def test_ingest_turns_away_concurrent_requests(client, delta, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_TOKEN", TOKEN)
+    assert main.INGEST_SLOT.acquire(blocking=False)
+    try:
+        assert ingest(client, delta).status_code == 429
+    finally:
+        main.INGEST_SLOT.release()
+
+
+def test_ingest_is_left_out_of_cors(client, delta, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_TOKEN", TOKEN)
+    origin = {"Origin": "https://elsewhere.example"}
+    preflight = {**origin, "Access-Control-Request-Method": "POST"}
+
+    assert "access-control-allow-origin" in client.get("/api/transactions", headers=origin).headers
+    assert "access-control-allow-origin" not in client.options("/api/transactions/ingest", headers=preflight).headers
+    assert "access-control-allow-origin" not in ingest(client, delta, **origin).headers
+
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/transactions", {"cursor": "not-a-cursor"}),
+    ("/api/transactions", {"fields": "Nope"}),
+    ("/api/transactions", {"pageSize": 0, "cursor": ""}),
+    ("/api/transactions", {"pageSize": -5}),
+    ("/api/transactions", {"page": -1}),
+    ("/api/transactions", {"page": 0}),
+    ("/api/transactions/export", {"format": "xlsx"}),
+    ("/api/transactions/export", {"fields": "Nope"}),
+])
+def test_invalid_requests_are_bad_requests(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+@pytest.mark.parametrize("path", [
+    "/api/transactions",
+    "/api/transactions/summary",
+    "/api/transactions/filter-options",
+    "/api/transactions/export",
+])
+@pytest.mark.parametrize("filters", [
+    '["North"]',
+    '{"customerRegions": 5}',
+    '{"customerRegions": [5]}',
+    '{"tags": {"a": 1}}',
+    '{"ageRange": 5}',
+    '{"ageRange": {"min": [20]}}',
+    '{"dateRange": {"from": 20230101}}',
+    '{"ageRange": {"min": "abc"}}',
+    '{"dateRange": {"to": "not-a-date"}}',
+])
+def test_malformed_filters_are_bad_requests(client, path, filters):
+    response = client.get(path, params={"filters": filters})
+    assert response.status_code == 400
+    assert "filters" in response.json()["error"]
+
+
+def test_malformed_batch_filters_are_bad_requests(client):
+    queries = [{"type": "summary", "filters": {"ageRange": "20-30"}}]
+    response = client.post("/api/transactions/batch", json={"queries": queries})
+    assert response.status_code == 400
+    assert "filters.ageRange" in response.json()["error"]
+
+
+def test_cursor_for_another_sort_is_a_bad_request(client):
+    cursor = client.get("/api/transactions", params={"cursor": ""}).json()["nextCursor"]
+    response = client.get("/api/transactions", params={"cursor": cursor, "sortField": "Quantity"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", [
+    "/api/transactions",
+    "/api/transactions/summary",
+    "/api/transactions/filter-options?q=a",
+])
+def test_query_value_errors_are_bad_requests(client, path, monkeypatch):
+    def invalid(fn_name, **kwargs):
+        raise ValueError("invalid query")
+    monkeypatch.setattr(main.QUERY_EXECUTOR, "run", invalid)
+    errors = main.REGISTRY.snapshot()["errors"]
+
+    response = client.get(path)
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid query"
+    assert main.REGISTRY.snapshot()["errors"] == errors
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("item, message", [
+    ([], "must be an object"),
+    ({"type": "chart"}, "Unknown query type"),
+    ({"type": "summary", "page": 1}, "Unknown summary parameters: page"),
+    ({"pageSize": 10, "sort": "Date"}, "Unknown transactions parameters: sort"),
+    ({"page": 0}, "page must be a positive integer"),
+    ({"page": "2"}, "page must be a positive integer"),
+    ({"page": True}, "page must be a positive integer"),
+    ({"pageSize": 2.5}, "pageSize must be a positive integer"),
+    ({"fields": "table,Nope"}, "Unknown field: Nope"),
+])
+def test_invalid_batch_queries(item, message, dataset):
+    with pytest.raises(ValueError, match=message):
+        main.batch_query(item)
+
+
+def test_batch_query_translates_parameters(dataset):
+    query = main.batch_query({"page": 2, "pageSize": 25, "sortField": "Age", "sortDir": "asc", "q": "an", "fields": "table"})
+    assert query == {
+        "type": "transactions", "page": 2, "page_size": 25, "sort_field": "Age", "sort_dir": "asc", "q": "an",
+        "fields": dataset.parse_fields("table"),
+    }
+    assert main.batch_query({"type": "summary", "filters": "{}"}) == {"type": "summary", "filters": {}}
+
+
+@pytest.mark.parametrize("payload", [
+    {},
+    {"queries": []},
+    {"queries": {"page": 1}},
+    {"queries": [{}] * (main.BATCH_MAX_QUERIES + 1)},
+    {"queries": [{}, {"page": -1}]},
+])
+def test_invalid_batches_are_bad_requests(client, payload):
+    response = client.post("/api/transactions/batch", json=payload)
+    assert response.status_code == 400
+    assert response.json()["error"]
+
+
+def test_batch_results_match_the_individual_routes(client):
+    filters = json.dumps({"genders": ["Female"]})
+    response = client.post("/api/transactions/batch", json={"queries": [
+        {"page": 1, "q": "an", "filters": filters, "fields": "table"},
+        {"page": 2, "q": "an", "filters": filters, "fields": "table"},
+        {"type": "filterOptions", "q": "an", "filters": filters},
+        {"type": "summary", "q": "an", "filters": filters},
+        {"cursor": "bogus"},
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    params = {"q": "an", "filters": filters}
+    assert results[0] == client.get("/api/transactions", params=dict(params, page=1, fields="table")).json()
+    assert results[1] == client.get("/api/transactions", params=dict(params, page=2, fields="table")).json()
+    assert results[2] == client.get("/api/transactions/filter-options", params=params).json()
+    assert results[3] == client.get("/api/transactions/summary", params=params).json()
+    assert results[4] == {"error": "Invalid cursor"}
+
+
+def test_batch_evaluates_each_search_once(dataset, monkeypatch):
+    calls = []
+    execute = dataset.planner.execute
+    monkeypatch.setattr(dataset.planner, "execute", lambda *args: calls.append(args) or execute(*args))
+
+    dataset.get_batch([
+        {"type": "transactions", "q": "an", "sort_field": sort}
+        for sort in ("Date", "Quantity", "CustomerName")
+    ] + [{"type": "summary", "q": "an"}, {"type": "transactions", "q": "lee"}])
+    assert len(calls) == 2
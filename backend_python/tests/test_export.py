@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+
+FILTERS = '{"customerRegions": ["North"], "ageRange": {"min": 30}}'
+
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(main.app)
+
+
+def export(client, **params):
+    response = client.get("/api/transactions/export", params=params)
+    assert response.status_code == 200
+    return response
+
+
+def expected(dataset, fields, **query):
+    """Every record the export should stream, in order, from one big page."""
+    return dataset.get_transactions(page_size=len(dataset.DF), fields=fields, **query)["data"]
+
+
+def test_ndjson_export_streams_every_projected_record(client, dataset):
+    response = export(client, format="ndjson", fields="TotalAmount,Tags,Date", filters=FILTERS, sortField="Age", sortDir="asc")
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="transactions.ndjson"'
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records == expected(dataset, "TotalAmount,Tags,Date", filters=FILTERS, sort_field="Age", sort_dir="asc")
+    assert 0 < len(records) < len(dataset.DF)
+    assert all(list(record) == ["TotalAmount", "Tags", "Date"] for record in records)
+
+
+def test_csv_export_streams_every_row_in_sort_order(client, dataset):
+    response = export(client, q="an", fields="TransactionID,CustomerName,Tags")
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="transactions.csv"'
+    reader = csv.reader(io.StringIO(response.text))
+    assert next(reader) == ["TransactionID", "CustomerName", "Tags"]
+    rows = list(reader)
+    records = expected(dataset, "TransactionID,CustomerName,Tags", q="an")
+    assert [int(row[0]) for row in rows] == [record["TransactionID"] for record in records]
+    assert [row[2] for row in rows] == [",".join(record["Tags"]) for record in records]
+
+
+@pytest.mark.parametrize("fields", ["export", "table", "Date,export"])
+def test_field_presets_set_the_exported_columns(client, dataset, fields):
+    header = next(csv.reader(io.StringIO(export(client, fields=fields).text)))
+    assert header == dataset.parse_fields(fields)
+
+
+def test_export_preset_leaves_out_personal_data(client, dataset):
+    header = next(csv.reader(io.StringIO(export(client, fields="export").text)))
+    assert header == dataset.FIELD_PRESETS["export"]
+    assert not {"CustomerName", "PhoneNumber", "Tags"} & set(header)
+
+
+def test_transactions_return_fields_in_requested_order(client, dataset):
+    data = client.get("/api/transactions", params={"fields": "Tags,TransactionID,table"}).json()["data"]
+    assert list(data[0]) == dataset.parse_fields("Tags,TransactionID,table")
+    assert list(data[0])[:2] == ["Tags", "TransactionID"]
+
+
+@pytest.mark.parametrize("path", ["/api/transactions", "/api/transactions/export"])
+def test_unknown_field_is_a_bad_request(client, path):
+    response = client.get(path, params={"fields": "table,Nope"})
+    assert response.status_code == 400
+    assert response.json()["error"] == "Unknown field: Nope"
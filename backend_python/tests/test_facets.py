@@ -0,0 +1,40 @@
+import pytest
+
+QUERIES = [
+    ("", {}),
+    ("an", {}),
+    ("", {"genders": ["Female"]}),
+    ("ar", {"customerRegions": ["North", "South"], "tags": ["fashion"], "ageRange": {"min": 25, "max": 50}}),
+    ("", {"paymentMethods": ["UPI"], "dateRange": {"from": "2022-01-01", "to": "2022-12-31"}}),
+]
+
+
+def matches(dp, q, filters):
+    rows = dp.select_rows(q, filters)
+    return len(dp.DF) if rows is None else len(rows)
+
+
+@pytest.mark.parametrize("q, filters", QUERIES)
+def test_counts_are_totals_of_selecting_each_value_instead(dataset, q, filters):
+    result = dataset.facet_counts(q, filters)
+    assert result["total"] == matches(dataset, q, filters)
+
+    for key, count_key in dataset.FACET_COUNT_KEYS.items():
+        counts = result["counts"][count_key]
+        assert counts and set(counts) >= set(dataset.FILTER_OPTIONS.get(count_key, []))
+        for value, count in counts.items():
+            assert count == matches(dataset, q, dict(filters, **{key: [value]})), (key, value)
+
+
+def test_counts_ignore_the_facets_own_selection(dataset):
+    narrowed = dataset.facet_counts("", {"genders": ["Female"]})["counts"]
+    everything = dataset.facet_counts("", {})["counts"]
+    assert narrowed["genders"] == everything["genders"]
+    assert narrowed["regions"] != everything["regions"]
+
+
+def test_filter_options_include_counts_only_for_a_query(dataset):
+    assert "counts" not in dataset.get_filter_options()
+    options = dataset.get_filter_options(q="an")
+    assert options["regions"] == dataset.FILTER_OPTIONS["regions"]
+    assert options["total"] == matches(dataset, "an", {})
@@ -0,0 +1,60 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+
+DATA_REQUESTS = [
+    ("get", "/api/transactions", {}),
+    ("get", "/api/transactions/summary", {}),
+    ("get", "/api/transactions/filter-options", {}),
+    ("get", "/api/transactions/export", {}),
+    ("post", "/api/transactions/batch", {"json": {"queries": [{}]}}),
+]
+
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def warming(dataset, monkeypatch):
+    monkeypatch.setitem(dataset.LOAD_STATUS, "state", "loading")
+    monkeypatch.setitem(dataset.LOAD_STATUS, "phase", "indexes")
+
+
+def test_ready_after_load(client):
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert "Retry-After" not in response.headers
+
+
+def test_readyz_asks_to_retry_while_warming(client, warming):
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    assert response.json()["ready"] is False
+    assert response.json()["phase"] == "indexes"
+
+
+@pytest.mark.parametrize("method, path, kwargs", DATA_REQUESTS)
+def test_data_endpoints_answer_warming_while_loading(client, warming, method, path, kwargs):
+    response = getattr(client, method)(path, **kwargs)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+    body = response.json()
+    assert (body["status"], body["data"], body["total"]) == ("warming", [], 0)
+    assert body["load"]["state"] == "loading"
+
+
+def test_failed_load_is_reported_without_retry(client, dataset, monkeypatch):
+    monkeypatch.setitem(dataset.LOAD_STATUS, "state", "failed")
+    monkeypatch.setitem(dataset.LOAD_STATUS, "error", "CSV not found")
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert "Retry-After" not in response.headers
+
+    body = client.get("/api/transactions").json()
+    assert (body["status"], body["error"]) == ("failed", "CSV not found")
@@ -0,0 +1,104 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.import_csv_to_sqlite import append_csv_to_sqlite, bulk_import_csv_to_sqlite
+from src.sql_engine import SQLiteEngine
+
+
+def write_csv(csv_path, tmp_path, name, edit, rows=200):
+    """The first ``rows`` rows of the fixture CSV, as text, after ``edit(frame)``."""
+    frame = pd.read_csv(csv_path, nrows=rows, dtype=str, keep_default_na=False)
+    edit(frame)
+    path = tmp_path / name
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def column(db_path, name):
+    with sqlite3.connect(db_path) as conn:
+        return [row[0] for row in conn.execute(f'SELECT "{name}" FROM transactions ORDER BY rowid')]
+
+
+def column_type(db_path, name):
+    with sqlite3.connect(db_path) as conn:
+        return {row[1]: row[2] for row in conn.execute("PRAGMA table_info(transactions)")}[name]
+
+
+def test_phone_numbers_are_kept_as_text(csv_path, tmp_path):
+    def edit(frame):
+        frame.loc[0, "Phone Number"] = "+91 98765 43210"
+        frame.loc[1, "Phone Number"] = "0098765432"
+        frame.loc[2, "Phone Number"] = "9876543210 x12"
+    path = write_csv(csv_path, tmp_path, "phones.csv", edit)
+    db_path = str(tmp_path / "phones.db")
+    bulk_import_csv_to_sqlite(path, db_path, workers=1)
+
+    assert column_type(db_path, "Phone Number") == "TEXT"
+    assert column(db_path, "Phone Number")[:3] == ["+91 98765 43210", "0098765432", "9876543210 x12"]
+    engine = SQLiteEngine(db_path)
+    assert engine.get_transactions(q="+91 98765")["total"] == 1
+    assert engine.get_transactions(q="x12")["total"] == 1
+
+
+def test_non_integer_ids_fall_back_to_text(csv_path, tmp_path):
+    def edit(frame):
+        frame.loc[0, "Transaction ID"] = "TX-0001"
+        frame.loc[1, "Transaction ID"] = "007"
+    path = write_csv(csv_path, tmp_path, "ids.csv", edit)
+    db_path = str(tmp_path / "ids.db")
+    bulk_import_csv_to_sqlite(path, db_path, workers=1)
+
+    assert column_type(db_path, "Transaction ID") == "TEXT"
+    assert column(db_path, "Transaction ID")[:2] == ["TX-0001", "007"]
+
+
+def test_integer_ids_stay_integer(csv_path, tmp_path):
+    path = write_csv(csv_path, tmp_path, "plain.csv", lambda frame: None)
+    db_path = str(tmp_path / "plain.db")
+    bulk_import_csv_to_sqlite(path, db_path, workers=1)
+
+    assert column_type(db_path, "Transaction ID") == "INTEGER"
+    assert column(db_path, "Transaction ID")[:3] == [1, 2, 3]
+
+
+def test_append_rejects_ids_an_integer_column_would_alter(csv_path, tmp_path):
+    db_path = str(tmp_path / "append.db")
+    bulk_import_csv_to_sqlite(write_csv(csv_path, tmp_path, "base.csv", lambda frame: None), db_path, workers=1)
+    before = column(db_path, "Transaction ID")
+
+    def edit(frame):
+        frame.loc[5, "Transaction ID"] = "TX-9"
+    delta = write_csv(csv_path, tmp_path, "delta.csv", edit, rows=10)
+    with pytest.raises(ValueError, match="TX-9"):
+        append_csv_to_sqlite(delta, db_path)
+    assert column(db_path, "Transaction ID") == before
+
+
+@pytest.mark.parametrize("importer", ["bulk", "legacy"])
+def test_reimport_of_same_size_csv_rebuilds_search(csv_path, tmp_path, importer):
+    from src.import_csv_to_sqlite import import_csv_to_sqlite
+
+    def reimport(path):
+        if importer == "bulk":
+            bulk_import_csv_to_sqlite(path, db_path, workers=1)
+        else:
+            import_csv_to_sqlite(path, db_path)
+        return SQLiteEngine(db_path)
+
+    db_path = str(tmp_path / "reimport.db")
+    first = write_csv(csv_path, tmp_path, "first.csv", lambda frame: None)
+    assert reimport(first).get_transactions(q="zyxw")["total"] == 0
+
+    def rename(frame):
+        frame["Customer Name"] = "Zyxw Person"
+        frame["Tags"] = "zyxwtag"
+    second = write_csv(csv_path, tmp_path, "second.csv", rename)
+    engine = reimport(second)
+    assert engine.get_transactions(q="zyxw")["total"] == 200
+    assert engine.get_transactions(filters={"tags": ["zyxwtag"]})["total"] == 200
+
+    # The search trigger is back, so appended rows are indexed too
+    append_csv_to_sqlite(write_csv(csv_path, tmp_path, "delta.csv", rename, rows=5), db_path)
+    assert SQLiteEngine(db_path).get_transactions(q="zyxw")["total"] == 205
@@ -0,0 +1,112 @@
+import pandas as pd
+import pytest
+
+from src.indexes import BitmapIndex, NgramIndex, SortIndex, TagIndex, bitmap_to_ids
+from src.summary import SummaryCube, summarize
+
+from conftest import delta_csv
+
+
+def split(values, at, categorical=False):
+    """(head, tail, whole) Series; categoricals share the whole column's categories, as ingest builds them."""
+    whole = pd.Series(values, dtype="category" if categorical else None)
+    if categorical:
+        head = whole[:at].cat.remove_unused_categories()
+        return head, whole[at:].reset_index(drop=True), whole
+    return whole[:at].reset_index(drop=True), whole[at:].reset_index(drop=True), whole
+
+
+def rows_of(index, value):
+    return bitmap_to_ids(index.lookup([value]), index.n_rows).tolist()
+
+
+def test_bitmap_index_append_matches_rebuild():
+    head, tail, whole = split(["N", "S", None, "N", "E", "W", None, "S", "E"], 4, categorical=True)
+    appended = BitmapIndex.from_series(head).append(tail)
+    rebuilt = BitmapIndex.from_series(whole)
+
+    assert appended.n_rows == rebuilt.n_rows == 9
+    for value in rebuilt.values:
+        assert rows_of(appended, value) == rows_of(rebuilt, value)
+    assert appended.counts() == rebuilt.counts()
+
+
+def test_tag_index_append_matches_rebuild():
+    head, tail, whole = split(["a,b", "b", None, "c", "a,c,d", "", "d"], 3, categorical=True)
+    appended = TagIndex.from_series(head).append(tail)
+    rebuilt = TagIndex.from_series(whole)
+
+    assert appended.values == rebuilt.values == ["a", "b", "c", "d"]
+    for tag in rebuilt.values:
+        assert rows_of(appended, tag) == rows_of(rebuilt, tag)
+
+
+def test_ngram_index_append_matches_rebuild():
+    head, tail, whole = split(["Ann Lee", "Bob Stone", None, "ann lee", "Lee Ann", "Stonehenge", "Bo"], 3)
+    appended = NgramIndex.from_series(head).append(tail)
+    rebuilt = NgramIndex.from_series(whole)
+
+    assert appended.n_rows == rebuilt.n_rows
+    for q in ["ann", "lee", "ONE", "bo", "b", "stonehenge", "zzz", ""]:
+        assert appended.search(q).tolist() == rebuilt.search(q).tolist(), q
+
+
+@pytest.mark.parametrize("values", [
+    [5, 3, None, 3, 8, 1, None, 5, 9, 3],
+    [2.5, None, 1.0, 2.5, 0.5, 7.0],
+    list(pd.to_datetime(["2023-03-01", "2023-01-01", None, "2024-01-01", "2023-01-01"])),
+])
+def test_sort_index_append_matches_rebuild(values):
+    head, tail, whole = split(values, len(values) // 2)
+    appended = SortIndex.from_series(head).append(tail)
+    rebuilt = SortIndex.from_series(whole)
+
+    assert appended.ranks.tolist() == rebuilt.ranks.tolist()
+    assert appended.ascending.tolist() == rebuilt.ascending.tolist()
+    assert appended.descending.tolist() == rebuilt.descending.tolist()
+    assert appended.rank_offsets.tolist() == rebuilt.rank_offsets.tolist()
+    low, high = sorted(v for v in values if not pd.isna(v))[1:3]
+    assert appended.between(low, high).tolist() == rebuilt.between(low, high).tolist()
+
+
+def test_summary_cube_append_matches_rebuild():
+    frame = pd.DataFrame({
+        "Date": pd.to_datetime(["2023-01-01", "2023-01-01", "2023-02-03", None, "2023-02-03", "2024-05-06"]),
+        "CustomerRegion": ["North", "South", "North", "East", None, "West"],
+        "ProductCategory": ["Books", "Books", "Toys", "Toys", "Books", "Games"],
+        "Quantity": pd.array([1, 2, 3, None, 5, 6], dtype="Int64"),
+        "TotalAmount": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        "FinalAmount": [9.0, 18.0, 27.0, 36.0, 45.0, 54.0],
+    })
+    frame[["CustomerRegion", "ProductCategory"]] = frame[["CustomerRegion", "ProductCategory"]].astype("category")
+    head = frame[:3].copy()
+    for column in ("CustomerRegion", "ProductCategory"):
+        head[column] = head[column].cat.remove_unused_categories()
+
+    appended = SummaryCube.from_frame(head).append(frame[3:].reset_index(drop=True))
+    rebuilt = SummaryCube.from_frame(frame)
+    for filters in [{}, {"customerRegions": ["North", "West"]}, {"productCategories": ["Books"]}]:
+        assert summarize(appended.cells(filters), "cube") == summarize(rebuilt.cells(filters), "cube")
+
+
+def test_ingest_leaves_indexes_equal_to_a_rebuild(persisted, csv_path, tmp_path):
+    dp = persisted
+
+    def edit(frame):
+        frame.loc[0, "Customer Region"] = "Antarctica"
+        frame.loc[1, "Tags"] = "brand-new,organic"
+    dp.ingest_csv(delta_csv(csv_path, tmp_path, edit=edit))
+    df = dp.DF
+
+    for column, index in dp.FACET_INDEXES.items():
+        rebuilt = BitmapIndex.from_series(df[column])
+        assert index.counts() == rebuilt.counts()
+    rebuilt = TagIndex.from_series(df["Tags"])
+    assert dp.TAG_INDEX.counts() == rebuilt.counts() and "brand-new" in rebuilt.values
+    for column, index in dp.SEARCH_INDEXES.items():
+        rebuilt = NgramIndex.from_series(df[column])
+        for q in ["zed", "quux", "an", "e"]:
+            assert index.search(q).tolist() == rebuilt.search(q).tolist()
+    for column, index in dp.SORT_INDEXES.items():
+        assert index.ascending.tolist() == SortIndex.from_series(df[column]).ascending.tolist(), column
+    assert summarize(dp.SUMMARY_CUBE.cells({}), "cube") == summarize(SummaryCube.from_frame(df).cells({}), "cube")
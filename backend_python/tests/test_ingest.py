@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+from conftest import delta_csv
+
+
+def db_rows(dp):
+    with sqlite3.connect(dp.DB_PATH) as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+
+def test_ingest_extends_memory_and_database(persisted, csv_path, tmp_path):
+    dp = persisted
+    rows, version = len(dp.DF), dp.DATASET_VERSION
+    result = dp.ingest_csv(delta_csv(csv_path, tmp_path))
+
+    assert result["ingested"] == 10 and result["persisted"]
+    assert len(dp.DF) == db_rows(dp) == rows + 10
+    assert dp.DATASET_VERSION == version + 1
+    assert dp.get_transactions(q="zed quux")["total"] == 10
+
+
+def test_failed_database_write_leaves_memory_unchanged(persisted, csv_path, tmp_path):
+    dp = persisted
+    rows, version = len(dp.DF), dp.DATASET_VERSION
+
+    def edit(frame):
+        frame.loc[3, "Transaction ID"] = "TX-3"
+    with pytest.raises(ValueError):
+        dp.ingest_csv(delta_csv(csv_path, tmp_path, edit=edit))
+
+    assert len(dp.DF) == db_rows(dp) == rows
+    assert dp.DATASET_VERSION == version
+    assert dp.get_transactions(q="zed quux")["total"] == 0
+
+
+def test_failed_memory_append_writes_nothing(persisted, csv_path, tmp_path, monkeypatch):
+    dp = persisted
+    rows = len(dp.DF)
+    path = delta_csv(csv_path, tmp_path)
+
+    def broken(delta):
+        raise TypeError("cannot extend")
+    monkeypatch.setattr(dp, "extend_frame", broken)
+    with pytest.raises(TypeError):
+        dp.ingest_csv(path)
+    assert len(dp.DF) == db_rows(dp) == rows
+
+    # A retry adds the rows once
+    monkeypatch.undo()
+    dp.ingest_csv(path)
+    assert len(dp.DF) == db_rows(dp) == rows + 10
@@ -0,0 +1,73 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import FIXTURE_ROWS
+from src import main, metrics
+
+
+@pytest.fixture
+def client(dataset):
+    return TestClient(main.app)
+
+
+def sample(text, name):
+    """The value of the Prometheus sample line ``name`` (metric plus labels)."""
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name} missing"
+    return float(match.group(1))
+
+
+def test_server_timing_lists_stages_rows_and_total():
+    stages = [{"name": "cache", "ms": 0.01, "desc": "miss"}, {"name": "search", "ms": 2.5, "rows": (100, 7), "desc": "index"}]
+    assert metrics.server_timing(stages, 3.25) == (
+        'cache;dur=0.01;desc="miss", search;dur=2.50;desc="100->7 rows index", total;dur=3.25'
+    )
+
+
+def test_prometheus_histograms_are_cumulative():
+    registry = metrics.Registry()
+    registry.observe_request("summary", 0.003, [{"name": "summary.cube", "ms": 0.5}])
+    registry.observe_request("summary", 0.2, [])
+    registry.count_error("summary")
+    text = metrics.render_prometheus(registry.snapshot(), {"truestate_dataset_ready": [({}, 1)]})
+
+    request = 'truestate_request_duration_seconds_bucket{endpoint="summary",le="%s"}'
+    assert sample(text, request % "0.0025") == 0
+    assert sample(text, request % "0.005") == 1
+    assert sample(text, request % "0.25") == 2
+    assert sample(text, request % "+Inf") == 2
+    assert sample(text, 'truestate_request_duration_seconds_count{endpoint="summary"}') == 2
+    assert sample(text, 'truestate_request_duration_seconds_sum{endpoint="summary"}') == pytest.approx(0.203)
+    assert sample(text, 'truestate_stage_duration_seconds_bucket{stage="summary.cube",le="0.001"}') == 1
+    assert sample(text, 'truestate_request_errors_total{endpoint="summary"}') == 1
+    assert "# TYPE truestate_dataset_ready gauge\ntruestate_dataset_ready 1\n" in text
+
+
+def test_requests_report_server_timing_and_feed_metrics(client):
+    before = client.get("/metrics").text
+    count = 'truestate_request_duration_seconds_count{endpoint="transactions"}'
+    seen = sample(before, count) if count in before else 0
+
+    response = client.get("/api/transactions", params={"q": "an", "filters": '{"genders": ["Female"]}'})
+    timing = response.headers["Server-Timing"]
+    names = [part.split(";")[0] for part in timing.split(", ")]
+    assert {"filter.genders", "search", "serialize"} <= set(names)
+    assert names[-1] == "total"
+    assert re.search(r'filter\.genders;dur=[\d.]+;desc="\d+->\d+ rows', timing)
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert sample(text, count) == seen + 1
+    assert sample(text, 'truestate_stage_duration_seconds_count{stage="filter.genders"}') >= 1
+    assert sample(text, "truestate_dataset_rows") == FIXTURE_ROWS
+    assert sample(text, "truestate_dataset_ready") == 1
+    assert sample(text, 'truestate_load_phase_seconds{phase="indexes"}') >= 0
+
+
+def test_metrics_json_format(client):
+    body = client.get("/metrics", params={"format": "json"}).json()
+    assert {"buckets", "requests", "stages", "errors", "cache", "executor", "indexes", "load"} <= set(body)
+    assert body["buckets"] == list(metrics.BUCKETS)
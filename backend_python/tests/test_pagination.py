@@ -0,0 +1,95 @@
+import base64
+import json
+
+import pytest
+
+from conftest import delta_csv
+
+SORTS = [("Date", "desc"), ("CustomerName", "asc"), ("Quantity", "desc"), ("Age", "asc"), ("CustomerID", "asc")]
+QUERIES = [
+    {},
+    {"filters": '{"genders": ["Female"], "customerRegions": ["North", "East"]}'},
+    {"q": "an"},
+]
+
+
+def ids(result):
+    return [record["TransactionID"] for record in result["data"]]
+
+
+def walk(dp, sort_field, sort_dir, page_size, cursor="", **query):
+    """Every TransactionID after ``cursor``, one cursor page at a time."""
+    seen = []
+    while cursor is not None:
+        result = dp.get_transactions(page_size=page_size, sort_field=sort_field, sort_dir=sort_dir, cursor=cursor, **query)
+        assert len(result["data"]) <= page_size
+        seen += ids(result)
+        cursor = result["nextCursor"]
+    return seen
+
+
+def by_offset(dp, sort_field, sort_dir, page_size, **query):
+    seen, page = [], 1
+    while True:
+        result = dp.get_transactions(page=page, page_size=page_size, sort_field=sort_field, sort_dir=sort_dir, **query)
+        seen += ids(result)
+        if page * page_size >= result["total"]:
+            return seen
+        page += 1
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("sort_field, sort_dir", SORTS)
+def test_cursor_walk_matches_offset_pages(dataset, sort_field, sort_dir, query):
+    expected = by_offset(dataset, sort_field, sort_dir, 250, **query)
+    assert expected
+    assert walk(dataset, sort_field, sort_dir, 97, **query) == expected
+
+
+def test_cursor_survives_cache_eviction(dataset):
+    first = dataset.get_transactions(page_size=50, cursor="")
+    dataset.QUERY_CACHE.clear()
+    rest = walk(dataset, "Date", "desc", 50, cursor=first["nextCursor"])
+    assert ids(first) + rest == by_offset(dataset, "Date", "desc", 500)
+
+
+def test_cursor_resumes_after_ingest(persisted, csv_path, tmp_path):
+    dp = persisted
+    first = dp.get_transactions(page_size=100, sort_field="CustomerName", sort_dir="asc", cursor="")
+    seen = ids(first)
+    before = set(by_offset(dp, "CustomerName", "asc", 500))
+
+    dp.ingest_csv(delta_csv(csv_path, tmp_path, name="AAA Aardvark"))
+    rest = walk(dp, "CustomerName", "asc", 100, cursor=first["nextCursor"])
+
+    # The new rows sort before the cursor; nothing already seen comes back
+    assert not set(rest) & set(seen)
+    assert set(seen) | set(rest) == before
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", "eyJyIjogIngifQ"])
+def test_invalid_cursor(dataset, cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        dataset.get_transactions(cursor=cursor)
+
+
+def test_cursor_is_tied_to_its_sort(dataset):
+    cursor = dataset.get_transactions(sort_field="Date", sort_dir="desc", cursor="")["nextCursor"]
+    with pytest.raises(ValueError, match="does not match"):
+        dataset.get_transactions(sort_field="Date", sort_dir="asc", cursor=cursor)
+
+
+@pytest.mark.parametrize("sort_field, value", [("Age", "abc"), ("Age", True), ("Date", "abc"), ("Date", 5), ("CustomerName", 5)])
+def test_cursor_value_must_match_the_column(dataset, sort_field, value):
+    payload = {"f": sort_field, "d": "asc", "r": 0, "v": value}
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        dataset.get_transactions(sort_field=sort_field, sort_dir="asc", cursor=cursor)
+
+
+@pytest.mark.parametrize("page, page_size", [(0, 10), (-1, 10), (1, 0), (1, -3), (True, 10), (1, 2.5)])
+def test_invalid_paging_is_rejected(dataset, page, page_size):
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        dataset.get_transactions(page=page, page_size=page_size, cursor="")
+    with pytest.raises(ValueError, match="must be a positive integer"):
+        dataset.get_transactions_json(page=page, page_size=page_size)
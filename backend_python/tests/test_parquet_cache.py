@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from conftest import load
+from src import parquet_cache
+
+
+@pytest.fixture
+def source(csv_path, tmp_path):
+    """A private copy of the fixture CSV, so tests can change it."""
+    path = tmp_path / "transactions.csv"
+    shutil.copy(csv_path, path)
+    return str(path)
+
+
+def rename_first_customer(path, name):
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    frame.loc[0, "Customer Name"] = name
+    frame.to_csv(path, index=False)
+
+
+def test_cache_is_built_then_reused(source, tmp_path):
+    cache = str(tmp_path / "cache.parquet")
+    dp = load(source, parquet_path=cache)
+    assert dp.LOAD_STATUS["source"] == "csv"
+    assert parquet_cache.is_current(cache, source)
+    expected = dp.get_transactions(page_size=50, sort_field="CustomerName", sort_dir="asc")
+
+    dp = load(source, parquet_path=cache)
+    assert dp.LOAD_STATUS["source"] == "parquet"
+    assert dp.get_transactions(page_size=50, sort_field="CustomerName", sort_dir="asc") == expected
+
+
+def test_changed_source_rebuilds_the_cache(source, tmp_path):
+    cache = str(tmp_path / "cache.parquet")
+    load(source, parquet_path=cache)
+    built = os.stat(cache).st_mtime_ns
+
+    rename_first_customer(source, "AAA Aardvark")
+    assert not parquet_cache.is_current(cache, source)
+    dp = load(source, parquet_path=cache)
+    assert dp.LOAD_STATUS["source"] == "csv"
+    assert dp.DF["CustomerName"].iloc[0] == "AAA Aardvark"
+    assert os.stat(cache).st_mtime_ns != built
+
+    # The rebuilt cache carries the change
+    dp = load(source, parquet_path=cache)
+    assert dp.LOAD_STATUS["source"] == "parquet"
+    assert dp.DF["CustomerName"].iloc[0] == "AAA Aardvark"
+
+
+def test_touched_but_unchanged_source_keeps_the_cache(source, tmp_path):
+    cache = str(tmp_path / "cache.parquet")
+    load(source, parquet_path=cache)
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    assert parquet_cache.is_current(cache, source)
+    assert load(source, parquet_path=cache).LOAD_STATUS["source"] == "parquet"
+
+
+def test_schema_version_change_rebuilds_the_cache(source, tmp_path, monkeypatch):
+    cache = str(tmp_path / "cache.parquet")
+    load(source, parquet_path=cache)
+    monkeypatch.setattr(parquet_cache, "CACHE_SCHEMA_VERSION", parquet_cache.CACHE_SCHEMA_VERSION + 1)
+
+    assert not parquet_cache.is_current(cache, source)
+    assert load(source, parquet_path=cache).LOAD_STATUS["source"] == "csv"
+    assert parquet_cache.read_metadata(cache)["schema_version"] == parquet_cache.CACHE_SCHEMA_VERSION
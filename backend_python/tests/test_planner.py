@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import planner
+from src.indexes import bitmap_from_mask, contains_text, split_tag_label
+from src.planner import Predicate
+
+N_ROWS = 2000
+
+
+def mask_predicate(name, mask, full_cost, row_cost, lookup=False):
+    """Predicate over a boolean row mask, with the given cost model."""
+    ids = np.flatnonzero(mask)
+    return Predicate(
+        name, mask.mean(), full_cost, row_cost,
+        full=lambda: bitmap_from_mask(mask),
+        restrict=lambda rows: mask[rows],
+        lookup=(lambda: ids) if lookup else None,
+        lookup_cost=len(ids) * planner.SORT_ROW_COST if lookup else None,
+    )
+
+
+def test_plan_runs_the_cheapest_discarding_predicates_first():
+    rng = np.random.default_rng(0)
+    facet = mask_predicate("facet", rng.random(N_ROWS) < 0.2, full_cost=100, row_cost=5)
+    broad = mask_predicate("broad", rng.random(N_ROWS) < 0.9, full_cost=100, row_cost=5)
+    search = mask_predicate("search", rng.random(N_ROWS) < 0.05, full_cost=1e7, row_cost=1000)
+    useless = mask_predicate("useless", np.ones(N_ROWS, dtype=bool), full_cost=1, row_cost=1)
+
+    order = [p.name for p in planner.plan([useless, search, broad, facet], N_ROWS)]
+    assert order[:2] == ["facet", "broad"]
+    assert order.index("search") > order.index("facet")
+    assert order[-1] == "useless"
+
+
+def test_plan_breaks_ties_by_cost():
+    mask = np.arange(N_ROWS) % 2 == 0
+    cheap = mask_predicate("cheap", mask, full_cost=10, row_cost=1)
+    dear = mask_predicate("dear", mask, full_cost=1e6, row_cost=1e6)
+    assert [p.name for p in planner.plan([dear, cheap], N_ROWS)][0] == "cheap"
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_execute_matches_brute_force_for_any_strategy(seed):
+    rng = np.random.default_rng(seed)
+    masks, predicates = [], []
+    for i in range(rng.integers(1, 5)):
+        mask = rng.random(N_ROWS) < rng.choice([0.001, 0.05, 0.5, 0.95])
+        masks.append(mask)
+        predicates.append(mask_predicate(
+            f"p{i}", mask, full_cost=float(rng.choice([1, 1e3, 1e6])), row_cost=float(rng.choice([0.1, 5, 500])),
+            lookup=bool(rng.integers(2)),
+        ))
+    expected = np.flatnonzero(np.logical_and.reduce(masks))
+    assert planner.execute(predicates, N_ROWS).tolist() == expected.tolist()
+
+
+def test_execute_without_predicates_selects_everything():
+    assert planner.execute([], N_ROWS) is None
+
+
+@pytest.mark.parametrize("q, filters", [
+    ("an", {}),
+    ("", {"genders": ["Female"], "paymentMethods": ["UPI", "Cash"]}),
+    ("", {"tags": ["fashion", "gaming"]}),
+    ("", {"ageRange": {"min": 30, "max": 45}}),
+    ("", {"ageRange": {"min": 60}, "dateRange": {"from": "2022-06-01", "to": "2023-02-01"}}),
+    ("ar", {"customerRegions": ["North"], "ageRange": {"max": 40}, "tags": ["fashion"]}),
+    ("9001", {"productCategories": ["Books"]}),
+])
+def test_select_rows_matches_pandas(dataset, q, filters):
+    df = dataset.DF
+    mask = np.ones(len(df), dtype=bool)
+    for key, column in {"genders": "Gender", "paymentMethods": "PaymentMethod",
+                        "customerRegions": "CustomerRegion", "productCategories": "ProductCategory"}.items():
+        if key in filters:
+            mask &= df[column].isin(filters[key]).to_numpy()
+    if "tags" in filters:
+        mask &= np.array([bool(set(split_tag_label(t)) & set(filters["tags"])) for t in df["Tags"]])
+    if "ageRange" in filters:
+        age = df["Age"].astype("float64").to_numpy(na_value=np.nan)
+        low, high = filters["ageRange"].get("min", -np.inf), filters["ageRange"].get("max", np.inf)
+        mask &= (age >= low) & (age <= high)
+    if "dateRange" in filters:
+        dates = df["Date"]
+        mask &= ((dates >= pd.Timestamp(filters["dateRange"]["from"])) & (dates <= pd.Timestamp(filters["dateRange"]["to"]))).to_numpy()
+    if q:
+        mask &= np.logical_or.reduce([contains_text(df[column], q) for column in dataset.SEARCH_INDEXES])
+
+    expected = np.flatnonzero(mask)
+    assert 0 < len(expected) < len(df)
+    assert dataset.select_rows(q, filters).tolist() == expected.tolist()
+
+
+def test_range_bounds_are_cast_to_the_column_type(dataset):
+    typed = dataset.select_rows("", {"ageRange": {"min": 30, "max": 45}, "dateRange": {"from": "2022-06-01"}})
+    textual = dataset.select_rows("", {"ageRange": {"min": "30", "max": "45.0"}, "dateRange": {"from": "2022-06-01", "to": ""}})
+    assert len(typed) > 0
+    assert textual.tolist() == typed.tolist()
+
+
+@pytest.mark.parametrize("filters", [{"ageRange": {"min": "abc"}}, {"dateRange": {"from": "someday"}}])
+def test_uncastable_range_bounds_are_rejected(dataset, filters):
+    with pytest.raises(ValueError, match=f"filters.{next(iter(filters))}"):
+        dataset.select_rows("", filters)
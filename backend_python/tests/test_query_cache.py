@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from src.query_cache import QueryCache, query_key
+
+
+def rows(n):
+    return np.arange(n, dtype=np.int64)  # 8 bytes per row
+
+
+def test_equivalent_queries_share_a_key():
+    key = query_key("Ann", {"genders": ["Male", "Female"], "tags": "a", "customerRegions": []}, "Date", "desc")
+    assert key == query_key("ann", {"tags": ["a"], "genders": ["Female", "Male"]}, "Date", "DESC")
+    assert key != query_key("ann", {"tags": ["a"], "genders": ["Female", "Male"]}, "Date", "asc")
+    assert key != query_key("ann", {"tags": ["a"], "genders": ["Female", "Male"]}, "Date", "desc", version=1)
+
+
+def test_evicts_least_recently_used_within_byte_budget():
+    cache = QueryCache(max_bytes=8 * 300)
+    for key in "abc":
+        cache.put(key, rows(100))
+    cache.get("a")
+    cache.put("d", rows(100))
+
+    assert cache.get("b") is None
+    assert [cache.get(key) is not None for key in "acd"] == [True, True, True]
+    assert cache.stats() == {
+        "hits": 4, "misses": 1, "evictions": 1, "entries": 3, "bytes": 8 * 300, "maxBytes": 8 * 300,
+    }
+
+
+def test_large_put_evicts_as_many_entries_as_needed():
+    cache = QueryCache(max_bytes=8 * 300)
+    for key in "abc":
+        cache.put(key, rows(100))
+    cache.put("big", rows(250))
+    assert cache.stats()["entries"] == 1 and cache.stats()["evictions"] == 3
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = QueryCache(max_bytes=8 * 300)
+    cache.put("a", rows(100))
+    cache.put("a", rows(50))
+    assert cache.stats()["bytes"] == 8 * 50
+
+
+def test_oversized_and_disabled():
+    cache = QueryCache(max_bytes=8 * 10)
+    cache.put("a", rows(11))
+    assert cache.get("a") is None
+
+    disabled = QueryCache(max_bytes=0)
+    assert not disabled.enabled
+    disabled.put("a", rows(1))
+    assert disabled.get("a") is None
+
+
+def test_shared_rows_are_free_and_cached_rows_read_only():
+    cache = QueryCache(max_bytes=8 * 10)
+    permutation = rows(1000)
+    cache.put("perm", permutation, shared=True)
+    assert cache.get("perm") is permutation and permutation.flags.writeable
+    assert cache.stats()["bytes"] == 0
+
+    owned = rows(5)
+    cache.put("owned", owned)
+    with pytest.raises(ValueError):
+        cache.get("owned")[0] = 1
+
+
+def test_paging_reuses_the_cached_ordering(dataset):
+    filters = '{"genders": ["Female"]}'
+    dataset.get_transactions(page=1, q="an", filters=filters)
+    before = dataset.QUERY_CACHE.stats()
+    second = dataset.get_transactions(page=2, q="AN", filters=filters)
+    after = dataset.QUERY_CACHE.stats()
+
+    assert after["hits"] == before["hits"] + 1 and after["misses"] == before["misses"]
+    dataset.QUERY_CACHE.clear()
+    assert dataset.get_transactions(page=2, q="an", filters=filters) == second
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load
+from src import main
+from src.query_executor import Overloaded, QueryExecutor
+
+
+@pytest.fixture
+def blocking(dataset, monkeypatch):
+    """A query that holds its executor slot until the returned event is set."""
+    release = threading.Event()
+
+    def get_summary(**kwargs):
+        release.wait(5)
+        return {"ok": True}
+    monkeypatch.setattr(dataset, "get_summary", get_summary)
+    yield release
+    release.set()
+
+
+def test_run_rejects_queries_beyond_the_in_flight_cap(dataset, blocking):
+    executor = QueryExecutor(workers=0, max_in_flight=1)
+    holder = threading.Thread(target=executor.run, args=("get_summary",))
+    holder.start()
+    while executor.stats()["inFlight"] == 0:
+        time.sleep(0.01)
+
+    with pytest.raises(Overloaded):
+        executor.run("get_summary")
+    blocking.set()
+    holder.join()
+
+    stats = executor.stats()
+    assert (stats["rejected"], stats["completed"], stats["inFlight"]) == (1, 1, 0)
+    # The slot is free again
+    assert executor.run("get_summary") == {"ok": True}
+
+
+def test_run_stops_queries_at_their_deadline(dataset, monkeypatch):
+    def get_summary(**kwargs):
+        time.sleep(0.05)
+        dataset.check_deadline()
+        return {"ok": True}
+    monkeypatch.setattr(dataset, "get_summary", get_summary)
+    executor = QueryExecutor(workers=0, timeout=0.01)
+
+    with pytest.raises(dataset.QueryTimeout):
+        executor.run("get_summary")
+    stats = executor.stats()
+    assert (stats["timeouts"], stats["completed"], stats["inFlight"]) == (1, 0, 0)
+
+
+def test_overloaded_and_timed_out_queries_map_to_429_and_503(dataset, monkeypatch):
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "QUERY_EXECUTOR", QueryExecutor(workers=0, max_in_flight=0))
+    response = client.get("/api/transactions/summary")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    def get_summary(**kwargs):
+        time.sleep(0.05)
+        dataset.check_deadline()
+    monkeypatch.setattr(dataset, "get_summary", get_summary)
+    monkeypatch.setattr(main, "QUERY_EXECUTOR", QueryExecutor(workers=0, timeout=0.01))
+    response = client.get("/api/transactions/summary")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+class BrokenPool:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_falls_back_to_in_process(dataset):
+    executor = QueryExecutor(workers=1)
+    executor._pool, executor._pool_ready = BrokenPool(), True
+    expected = dataset.get_transactions(q="an")
+
+    assert executor.run("get_transactions", q="an") == expected
+    stats = executor.stats()
+    assert (stats["pooled"], stats["completed"], stats["inFlight"]) == (0, 1, 0)
+    assert executor._pool is None
+
+
+def test_expensive_queries_run_on_the_pool(csv_path, tmp_path):
+    dp = load(csv_path)
+    dp.SHARED_DIR = str(tmp_path / "shared")
+    try:
+        dp.DF = None
+        dp.load_data()
+        executor = QueryExecutor(workers=1, timeout=30)
+        executor.start()
+        try:
+            assert executor.stats()["workers"] == 1
+            pooled = executor.run("get_transactions", q="an", page_size=20)
+            inline = executor.run("get_transactions", page_size=20)
+        finally:
+            executor.shutdown()
+    finally:
+        load(csv_path)
+
+    assert pooled == dp.get_transactions(q="an", page_size=20)
+    assert inline == dp.get_transactions(page_size=20)
+    assert executor.stats()["pooled"] == 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import serialization
+
+
+def frame():
+    """Every column kind the dataset uses, each with a missing value."""
+    return pd.DataFrame({
+        "TransactionID": np.arange(4, dtype=np.int64),
+        "Date": pd.to_datetime(["2023-01-02 03:04:05.123456", None, "2024-02-29 00:00:00.000000", "2021-12-31 23:59:59.000001"]).astype("datetime64[us]"),
+        "CustomerName": pd.array(["Ann", None, "Bo", "Cy"], dtype="str"),
+        "PhoneNumber": [9.1e9, np.nan, 9.2e9, 9.3e9],
+        "Age": pd.array([31, None, 45, 52], dtype="Int64"),
+        "FinalAmount": pd.array([1.5, 2.25, None, 4.0], dtype="Float64"),
+        "Gender": pd.Categorical(["Male", "Female", None, "Male"]),
+        "Tags": pd.Categorical(["a,b", None, "", "b"]),
+    })
+
+
+def large_path(df, rows, columns=None, monkeypatch=None):
+    monkeypatch.setattr(serialization, "SMALL_PAGE_ROWS", 0)
+    try:
+        return serialization.page_records(df, rows, columns)
+    finally:
+        monkeypatch.undo()
+
+
+@pytest.mark.parametrize("columns", [None, ["Tags", "Age", "Nope", "Date"]])
+def test_small_pages_match_the_general_path(columns, monkeypatch):
+    df = frame()
+    rows = np.array([3, 1, 0, 2])
+    small = serialization.page_records(df, rows, columns)
+
+    assert small == large_path(df, rows, columns, monkeypatch)
+    assert serialization.dumps(small) == serialization.dumps(large_path(df, rows, columns, monkeypatch))
+    assert small[1]["Tags"] == [] and all(
+        value is None for key, value in small[1].items() if key not in ("TransactionID", "FinalAmount", "Gender", "Tags")
+    )
+
+
+def test_small_page_values():
+    record = serialization.page_records(frame(), [0])[0]
+    assert record == {
+        "TransactionID": 0, "Date": "2023-01-02T03:04:05.123456Z", "CustomerName": "Ann",
+        "PhoneNumber": 9.1e9, "Age": 31, "FinalAmount": 1.5, "Gender": "Male", "Tags": ["a", "b"],
+    }
+    assert type(record["TransactionID"]) is int and type(record["Age"]) is int
+
+
+def test_column_sources_follow_the_frame():
+    df = frame()
+    serialization.page_records(df, [0])
+    replaced = df.assign(CustomerName=pd.array(["Dee", "Eve", "Flo", "Gus"], dtype="str"))
+    assert serialization.page_records(replaced, [0])[0]["CustomerName"] == "Dee"
+    assert serialization.page_records(df, [0])[0]["CustomerName"] == "Ann"
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import shared_store
+
+
+def frame():
+    return pd.DataFrame({
+        "u8": np.arange(5, dtype=np.uint8),
+        "u32": np.arange(5, dtype=np.uint32),
+        "i16": np.arange(5, dtype=np.int16),
+        "i64": np.arange(5, dtype=np.int64),
+        "f": np.linspace(0, 1, 5),
+    })
+
+
+def publish(shared_dir, df):
+    with shared_store.publish_lock(shared_dir):
+        shared_store.publish(shared_dir, "k", df, {}, {"extra": 1})
+
+
+def test_integer_columns_attach_as_matching_nullable_dtypes(tmp_path):
+    shared_dir = str(tmp_path / "shared")
+    df = frame()
+    publish(shared_dir, df)
+    attached, indexes, extra = shared_store.attach(shared_dir, "k")
+
+    assert [str(t) for t in attached.dtypes] == ["UInt8", "UInt32", "Int16", "Int64", "float64"]
+    assert attached.astype(df.dtypes.to_dict()).equals(df)
+    assert extra == {"extra": 1}
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+def test_refuses_pickles_others_can_write(tmp_path):
+    shared_dir = str(tmp_path / "shared")
+    publish(shared_dir, frame())
+    assert os.stat(shared_dir).st_mode & 0o077 == 0
+
+    os.chmod(shared_dir, 0o777)
+    with pytest.raises(PermissionError):
+        shared_store.attach(shared_dir, "k")
+    os.chmod(shared_dir, 0o700)
+
+    objects = os.path.join(shared_store.version_dir(shared_dir, "k"), "objects.pkl")
+    os.chmod(objects, 0o666)
+    with pytest.raises(PermissionError):
+        shared_store.attach(shared_dir, "k")
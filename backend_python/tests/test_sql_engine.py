@@ -0,0 +1,20 @@
+from conftest import load
+from src.import_csv_to_sqlite import bulk_import_csv_to_sqlite
+from src.sql_engine import PARITY_QUERIES, SQLiteEngine, compare_engines
+
+
+def test_engines_return_identical_results(csv_path, tmp_path):
+    db_path = str(tmp_path / "transactions.db")
+    assert bulk_import_csv_to_sqlite(csv_path, db_path, workers=1) > 0
+    # The in-memory engine loads from the same database
+    dp = load(csv_path, db_path)
+    assert dp.LOAD_STATUS["source"] == "sqlite"
+
+    assert compare_engines(SQLiteEngine(db_path)) == []
+
+
+def test_parity_queries_return_rows(csv_path, tmp_path):
+    # Guards against the parity check passing only because both engines match nothing
+    dp = load(csv_path)
+    empty = [query for query in PARITY_QUERIES if not dp.get_transactions(**query)["data"]]
+    assert empty == []
@@ -0,0 +1,60 @@
+import pytest
+
+from src.summary import measure_frame, summarize
+
+FILTERS = [
+    {},
+    {"customerRegions": ["North"]},
+    {"customerRegions": ["North", "West"], "genders": ["Female"]},
+    {"productCategories": ["Electronics", "Books"], "paymentMethods": ["UPI", "Cash"]},
+    {"dateRange": {"from": "2022-03-15", "to": "2022-11-30"}},
+    {"dateRange": {"from": "2023-01-01"}, "genders": ["Male"]},
+    {"customerRegions": ["Nowhere"]},
+]
+
+
+def row_path(dp, filters, q=""):
+    rows = dp.select_rows(q, filters)
+    return summarize(measure_frame(dp.DF, rows), source="rows")
+
+
+def assert_close(actual, expected):
+    """Equal structures, with amounts (rounded to cents after summing in another order) within a cent."""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            assert_close(a, e)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, abs=0.011)
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_cube_matches_row_path(dataset, filters):
+    summary = dataset.get_summary(filters=filters)
+    assert summary["source"] == "cube"
+    assert_close(dict(summary, source="rows"), row_path(dataset, filters))
+
+
+def test_filters_present_in_data(dataset):
+    options = dataset.get_filter_options()
+    assert {"North", "West"} <= set(options["regions"])
+    assert "fashion" in options["tags"]
+    assert {"Electronics", "Books"} <= set(options["productCategories"])
+    assert dataset.get_summary(filters=FILTERS[3])["total"] > 0
+
+
+@pytest.mark.parametrize("q, filters", [
+    ("an", {}),
+    ("", {"tags": ["fashion"]}),
+    ("", {"ageRange": {"min": 30, "max": 40}, "customerRegions": ["South"]}),
+])
+def test_queries_the_cube_cannot_answer_use_rows(dataset, q, filters):
+    summary = dataset.get_summary(q=q, filters=filters)
+    assert summary["source"] == "rows"
+    assert summary == row_path(dataset, filters, q)
@@ -1,10 +1,15 @@
-""Database module for Truestate application."""
+"""Database module for Truestate application."""
+import base64
 import json
 import logging
+import os
+import queue
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(
@@ -16,20 +21,41 @@ logging.basicConfig(
     ]
 )
 
+# Connection tuning applied to every pooled connection
+POOL_SIZE = int(os.environ.get('TRUESTATE_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = 30.0
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+STATEMENT_CACHE_SIZE = 256
+
 class DatabaseManager:
     """
     A class to manage database connections and operations.
+    
+    Connections are opened read-only and kept in a bounded pool, so requests
+    reuse them (and their prepared statement caches) instead of reconnecting.
+    Nothing here writes to the file; database_setup.py switches it to WAL.
     """
     
-    def __init__(self, db_path: str = 'truestate.db'):
+    def __init__(self, db_path: str = 'truestate.db', pool_size: int = POOL_SIZE):
         """
         Initialize the database manager with the path to the SQLite database.
         
         Args:
             db_path: Path to the SQLite database file
+            pool_size: Maximum number of open connections
         """
         self.db_path = db_path
+        self.pool_size = max(1, pool_size)
         self._ensure_database_exists()
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self._pool_lock = threading.Lock()
+        self._open_connections = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._unique_values_cache: Dict[str, List[Any]] = {}
+        self._unique_values_signature = None
     
     def _ensure_database_exists(self):
         """Ensure the database file exists and has the required tables."""
@@ -39,24 +65,114 @@ class DatabaseManager:
                 "Please run database_setup.py first."
             )
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open a tuned, read-only connection."""
+        uri = f"{Path(self.db_path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+    
+    def _checkout(self) -> sqlite3.Connection:
+        with self._pool_lock:
+            self._checkouts += 1
+            try:
+                return self._pool.get_nowait()
+            except queue.Empty:
+                pass
+            if self._open_connections < self.pool_size:
+                self._open_connections += 1
+                opening = True
+            else:
+                self._waits += 1
+                opening = False
+        
+        if opening:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._pool_lock:
+                    self._open_connections -= 1
+                raise
+        
+        # Pool exhausted: wait for another request to return a connection
+        started = time.perf_counter()
+        try:
+            return self._pool.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out after {POOL_TIMEOUT}s waiting for a database connection"
+            )
+        finally:
+            with self._pool_lock:
+                self._wait_seconds += time.perf_counter() - started
+    
+    def _discard(self, conn: sqlite3.Connection):
+        conn.close()
+        with self._pool_lock:
+            self._open_connections -= 1
+    
     @contextmanager
     def get_connection(self):
-        ""
-        Context manager for database connections.
+        """
+        Context manager for pooled database connections.
         
         Yields:
-            sqlite3.Connection: A connection to the SQLite database
+            sqlite3.Connection: A read-only connection to the SQLite database,
+            returned to the pool on exit
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # This enables column access by name
+        conn = self._checkout()
         try:
             yield conn
         except sqlite3.Error as e:
             logging.error(f"Database error: {e}")
-            conn.rollback()
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                # Unusable connection, do not hand it out again
+                self._discard(conn)
+                raise e
+            self._pool.put(conn)
             raise
-        finally:
-            conn.close()
+        except BaseException:
+            self._pool.put(conn)
+            raise
+        else:
+            self._pool.put(conn)
+    
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Connection pool metrics.
+        
+        Returns:
+            Dictionary with checkouts, waits (checkouts that found the pool
+            exhausted), total wait seconds, open and idle connections
+        """
+        with self._pool_lock:
+            return {
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "waitSeconds": round(self._wait_seconds, 6),
+                "openConnections": self._open_connections,
+                "idleConnections": self._pool.qsize(),
+                "poolSize": self.pool_size,
+            }
+    
+    def close(self):
+        """Close every idle pooled connection."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
     
     def get_columns(self) -> List[str]:
         """Get the list of columns in the properties table."""
@@ -71,7 +187,8 @@ class DatabaseManager:
         offset: int = 0, 
         filters: Optional[Dict[str, Any]] = None,
         sort_by: Optional[str] = None,
-        sort_order: str = 'ASC'
+        sort_order: str = 'ASC',
+        after: Optional[Tuple[Any, int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve properties from the database with optional filtering and pagination.
@@ -82,16 +199,23 @@ class DatabaseManager:
             filters: Dictionary of filters to apply (column_name: value)
             sort_by: Column to sort by
             sort_order: Sort order ('ASC' or 'DESC')
+            after: Keyset position (sort_by value, rowid) of the last row
+                already seen. When given, rows are returned from just past
+                that position via a ``WHERE (sort_by, rowid) > (?, ?)``
+                predicate instead of an OFFSET, so deep pages cost the same
+                as the first one. An empty tuple starts a keyset scan from
+                the first row. Keyset rows include their ``_rowid``
             
         Returns:
             List of property records as dictionaries
         """
-        query = "SELECT * FROM properties"
+        keyset = after is not None
+        query = "SELECT *, rowid AS _rowid FROM properties" if keyset else "SELECT * FROM properties"
         params = []
+        conditions = []
         
         # Apply filters
         if filters:
-            conditions = []
             for key, value in filters.items():
                 if value is not None:
                     if isinstance(value, (list, tuple)):
@@ -101,22 +225,105 @@ class DatabaseManager:
                     else:
                         conditions.append(f"{key} LIKE ?")
                         params.append(f"%{value}%")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
         
-        # Apply sorting
-        if sort_by:
-            query += f" ORDER BY {sort_by} {sort_order.upper()}"
+        order = sort_order.upper()
+        if after:
+            condition, keyset_params = self._keyset_condition(sort_by, order, after)
+            conditions.append(condition)
+            params.extend(keyset_params)
+            
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
         
-        # Apply pagination
-        query += " LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        # Apply sorting; keyset pages need rowid as a unique tie-breaker
+        if keyset:
+            query += f" ORDER BY {sort_by} {order}, rowid {order}" if sort_by else " ORDER BY rowid"
+            query += " LIMIT ?"
+            params.append(limit)
+        else:
+            if sort_by:
+                query += f" ORDER BY {sort_by} {order}"
+            # Apply pagination
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             return [dict(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _keyset_condition(sort_by: Optional[str], order: str, after: Tuple[Any, int]) -> Tuple[str, List[Any]]:
+        """
+        Build the WHERE clause selecting rows strictly after ``after``.
+
+        SQLite sorts NULLs first ascending and last descending, and row-value
+        comparisons with NULL are never true, so NULL keys get explicit terms.
+        """
+        key, rowid = after
+        if not sort_by:
+            return "rowid > ?", [rowid]
+        op = '>' if order == 'ASC' else '<'
+        if key is None:
+            if order == 'ASC':
+                return f"(({sort_by} IS NULL AND rowid > ?) OR {sort_by} IS NOT NULL)", [rowid]
+            return f"({sort_by} IS NULL AND rowid < ?)", [rowid]
+        condition = f"({sort_by}, rowid) {op} (?, ?)"
+        if order != 'ASC':
+            condition = f"({condition} OR {sort_by} IS NULL)"
+        return condition, [key, rowid]
+
+    def get_properties_page(
+        self,
+        limit: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = 'ASC',
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Keyset-paginated variant of get_properties.
+        
+        Args:
+            limit: Maximum number of records to return
+            filters: Dictionary of filters to apply (column_name: value)
+            sort_by: Column to sort by
+            sort_order: Sort order ('ASC' or 'DESC')
+            cursor: Opaque token from a previous page's ``next_cursor``;
+                None for the first page
+            
+        Returns:
+            Dictionary with ``rows`` and ``next_cursor`` (None on the last page)
+        """
+        after = self.decode_cursor(cursor, sort_by, sort_order) if cursor else ()
+        rows = self.get_properties(limit + 1, 0, filters, sort_by, sort_order, after=after)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = self.encode_cursor(last.get(sort_by) if sort_by else None, last['_rowid'], sort_by, sort_order)
+        for row in rows:
+            row.pop('_rowid', None)
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    @staticmethod
+    def encode_cursor(key: Any, rowid: int, sort_by: Optional[str], sort_order: str) -> str:
+        payload = json.dumps({"k": key, "r": rowid, "s": sort_by, "o": sort_order.upper()})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, sort_by: Optional[str], sort_order: str) -> Tuple[Any, int]:
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            key, row = payload["k"], payload["r"]
+            cursor_sort = (payload.get("s"), payload.get("o"))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            # Valid JSON that is not an object, or lacks the key and row, is no cursor either
+            raise ValueError(f"Invalid cursor: {e!r}")
+        if cursor_sort != (sort_by, sort_order.upper()):
+            raise ValueError("Cursor does not match the requested sort")
+        return key, row
     
     def get_property_count(self, filters: Optional[Dict[str, Any]] = None) -> int:
         """
@@ -151,22 +358,49 @@ class DatabaseManager:
             cursor.execute(query, params)
             return cursor.fetchone()['count']
     
+    def _file_signature(self) -> Tuple:
+        """Size and mtime of the database and its WAL file; changes whenever data is written."""
+        signature = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
     def get_unique_values(self, column: str) -> List[Any]:
         """
         Get all unique values for a specific column.
         
+        Results are cached until the database file changes.
+        
         Args:
             column: Name of the column
             
         Returns:
             List of unique values
         """
+        signature = self._file_signature()
+        with self._pool_lock:
+            if signature != self._unique_values_signature:
+                self._unique_values_cache = {}
+                self._unique_values_signature = signature
+            cached = self._unique_values_cache.get(column)
+        if cached is not None:
+            return list(cached)
+        
         query = f"SELECT DISTINCT {column} FROM properties WHERE {column} IS NOT NULL ORDER BY {column}"
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query)
-            return [row[0] for row in cursor.fetchall()]
+            values = [row[0] for row in cursor.fetchall()]
+        
+        with self._pool_lock:
+            if self._unique_values_signature == signature:
+                self._unique_values_cache[column] = values
+        return list(values)
 
 # Create a singleton instance
 db = DatabaseManager()
@@ -183,3 +417,6 @@ def get_property_count(filters=None):
 
 def get_unique_values(column):
     return db.get_unique_values(column)
+
+def get_pool_stats():
+    return db.pool_stats()
@@ -1,9 +1,14 @@
+import os
 import sqlite3
-import pandas as pd
+import sys
 from pathlib import Path
 import logging
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend_python'))
+from src.import_csv_to_sqlite import TABLE_NAME, bulk_import_csv_to_sqlite
+from src.sql_engine import quote
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -14,69 +19,76 @@ logging.basicConfig(
     ]
 )
 
-def setup_database():
+# Indexes on the properties columns the API filters and sorts by, if they exist
+INDEX_COLUMNS = [
+    ('customer_region', 'date'), ('product_category', 'date'), ('payment_method', 'date'),
+    ('gender', 'date'), ('date',), ('age',), ('customer_name',), ('quantity',),
+    ('total_amount',), ('final_amount',)
+]
+
+def property_column(name):
+    """CSV column name -> properties column name ('Customer Region' -> 'customer_region')."""
+    return name.strip().replace(' ', '_').lower()
+
+def setup_database(csv_path='truestate_assignment_dataset.csv', db_path='truestate.db', workers=None):
     """
     Set up the SQLite database and import data from CSV.
+
+    The CSV goes through the bulk importer (src/import_csv_to_sqlite.py):
+    parallel parsing, one transaction and a typed ``transactions`` table
+    with its tags table. The ``properties`` table DatabaseManager reads is
+    then copied from it inside SQLite, under snake_case column names and
+    in the same row order.
+
+    Args:
+        csv_path: CSV file to import
+        db_path: SQLite database to (re)create the properties table in
+        workers: Parser processes for the bulk import (default: CPU count)
     """
     start_time = datetime.now()
     logging.info("Starting database setup...")
     
-    # File paths
-    csv_path = 'truestate_assignment_dataset.csv'
-    db_path = 'truestate.db'
-    
     try:
         # Check if CSV file exists
         if not Path(csv_path).exists():
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
         
-        # Read the CSV file in chunks
-        logging.info(f"Reading CSV file: {csv_path}")
-        chunk_size = 10000  # Process 10,000 rows at a time
+        total_rows = bulk_import_csv_to_sqlite(csv_path, db_path, workers)
         
-        # Connect to SQLite database
-        logging.info("Connecting to SQLite database...")
-        conn = sqlite3.connect(db_path)
-        
-        # Read and process CSV in chunks
-        first_chunk = True
-        total_rows = 0
-        
-        for chunk in pd.read_csv(csv_path, chunksize=chunk_size, low_memory=False):
-            total_rows += len(chunk)
-            logging.info(f"Processing chunk with {len(chunk)} rows (total: {total_rows} rows)")
+        logging.info("Copying the imported rows into the properties table...")
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            conn.execute("BEGIN")
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({TABLE_NAME})")]
+            select = ", ".join(f"{quote(col)} AS {quote(property_column(col))}" for col in columns)
+            conn.execute("DROP TABLE IF EXISTS properties")
+            # Rowids follow the transactions table's order, which keyset pages rely on
+            conn.execute(f"CREATE TABLE properties AS SELECT {select} FROM {TABLE_NAME} ORDER BY rowid")
             
-            # Clean column names (remove spaces, special characters, etc.)
-            chunk.columns = [col.strip().replace(' ', '_').lower() for col in chunk.columns]
+            load_seconds = (datetime.now() - start_time).total_seconds()
+            logging.info(f"Loaded {total_rows} rows in {load_seconds:.2f} seconds ({total_rows / max(load_seconds, 1e-9):,.0f} rows/s)")
             
-            # Write the chunk to the database
-            chunk.to_sql('properties', conn, if_exists='append' if not first_chunk else 'replace', index=False)
-            first_chunk = False
-        
-        # Create indexes for better query performance
-        logging.info("Creating indexes...")
-        cursor = conn.cursor()
-        
-        # Get column names to create appropriate indexes
-        cursor.execute("PRAGMA table_info(properties)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        # Create indexes on common query fields if they exist
-        index_columns = ['id', 'property_id', 'price', 'location', 'city', 'state', 'zip_code']
-        for col in index_columns:
-            if col in columns:
-                index_name = f'idx_{col}'
-                logging.info(f"Creating index on {col}...")
-                cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON properties({col})")
-        
-        # Commit changes and close the connection
-        conn.commit()
-        conn.close()
+            logging.info("Creating indexes...")
+            names = {property_column(col) for col in columns}
+            for cols in INDEX_COLUMNS:
+                if all(col in names for col in cols):
+                    index_name = 'idx_' + '_'.join(cols)
+                    logging.info(f"Creating index on {', '.join(cols)}...")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON properties({', '.join(cols)})")
+            conn.execute("COMMIT")
+            # WAL persists in the file, so readers never block on a later writer
+            conn.execute("PRAGMA journal_mode=WAL")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
         
         # Log completion
         duration = (datetime.now() - start_time).total_seconds()
         logging.info(f"Database setup completed successfully in {duration:.2f} seconds")
-        logging.info(f"Total rows imported: {total_rows}")
+        logging.info(f"Total rows imported: {total_rows} ({total_rows / max(duration, 1e-9):,.0f} rows/s)")
         
     except Exception as e:
         logging.error(f"Error during database setup: {str(e)}", exc_info=True)
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import axios from 'axios'
 import SearchBar from './components/SearchBar'
 import FilterPanel from './components/FilterPanel'
@@ -18,33 +18,70 @@ export default function App() {
   const [total, setTotal] = useState(0)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  // Next page loaded along with the current one: { key, page, data, total }
+  const prefetched = useRef(null)
 
   useEffect(() => { fetchData() }, [q, filters, sortField, sortDir, page])
 
+  const queryKey = JSON.stringify({ q, filters, sortField, sortDir, pageSize })
+
+  function pageQuery(p) {
+    // Only the columns TransactionsTable renders
+    return { q, page: p, pageSize, sortField, sortDir, filters, fields: 'table' }
+  }
+
+  function remember(key, p, result) {
+    prefetched.current = result && !result.error
+      ? { key, page: p, data: result.data || [], total: result.total || 0 }
+      : null
+  }
+
+  async function fetchBatch(queries) {
+    const res = await axios.post(`${API}/api/transactions/batch`, { queries }, {
+      timeout: 15000, // Backend answers 503 "warming" instantly while it loads
+      headers: {
+        'Content-Type': 'application/json'
+      }
+    })
+    return res.data.results
+  }
+
+  async function prefetch(key, p) {
+    try {
+      const [next] = await fetchBatch([pageQuery(p)])
+      remember(key, p, next)
+    } catch (err) {
+      prefetched.current = null
+    }
+  }
+
   async function fetchData() {
-    setLoading(true)
-    setError(null)
-    const params = {
-      q,
-      page,
-      pageSize,
-      sortField,
-      sortDir,
-      filters: JSON.stringify(filters)
+    const key = queryKey
+    const hit = prefetched.current
+    if (hit && hit.key === key && hit.page === page) {
+      setError(null)
+      setData(hit.data)
+      setTotal(hit.total)
+      if (page * pageSize < hit.total) prefetch(key, page + 1)
+      return
     }
-    const url = `${API}/api/transactions`
 
+    setLoading(true)
+    setError(null)
     try {
-      const res = await axios.get(url, {
-        params,
-        timeout: 60000, // Increased timeout for large CSV loading
-        headers: {
-          'Content-Type': 'application/json'
-        }
-      })
-      setData(res.data.data || [])
-      setTotal(res.data.total || 0)
+      // The current and the next page in one request; the backend filters once for both
+      const [current, next] = await fetchBatch([pageQuery(page), pageQuery(page + 1)])
+      if (current.error) throw new Error(current.error)
+      setData(current.data || [])
+      setTotal(current.total || 0)
+      remember(key, page + 1, next)
     } catch (err) {
+      if (err.response?.status === 503 && err.response.data?.status === 'warming') {
+        // Dataset still loading on the backend: retry once it should be ready
+        const retryAfter = Number(err.response.headers['retry-after']) || 2
+        setTimeout(fetchData, retryAfter * 1000)
+        return
+      }
       console.error('API fetch error:', err)
       let message = 'Failed to fetch data'
 
@@ -92,7 +129,7 @@ export default function App() {
         </div>
       </div>
       <div className="main">
-        <aside><FilterPanel onChange={onFiltersChange} /></aside>
+        <aside><FilterPanel q={q} filters={filters} onChange={onFiltersChange} /></aside>
         <section>
           <div className="stats">Total: {total}</div>
           {loading && <div className="loading">Loading...</div>}
@@ -3,7 +3,7 @@ import axios from 'axios'
 
 const API = import.meta.env.VITE_API_BASE || 'http://localhost:8000'
 
-export default function FilterPanel({ onChange }) {
+export default function FilterPanel({ q = '', filters = {}, onChange }) {
   const [region, setRegion] = useState([])
   const [gender, setGender] = useState([])
   const [ageMin, setAgeMin] = useState('')
@@ -44,6 +44,12 @@ export default function FilterPanel({ onChange }) {
           setTimeout(fetchOptions, 5000); // Retry after 5 seconds
         }
       } catch (err) {
+        if (err.response?.status === 503 && err.response.data?.status === 'warming') {
+          // Backend is still loading the dataset; this does not count as a failed attempt
+          const retryAfter = Number(err.response.headers['retry-after']) || 2
+          setTimeout(fetchOptions, retryAfter * 1000)
+          return
+        }
         console.warn('Could not load filter options:', err.message)
         // Fallback to default values if API fails
         setAvailableOptions({
@@ -65,6 +71,25 @@ export default function FilterPanel({ onChange }) {
     fetchOptions()
   }, [])
 
+  // Rows each value would match under the applied search and the other filters
+  const [counts, setCounts] = useState({})
+
+  useEffect(() => {
+    let cancelled = false
+    axios.get(`${API}/api/transactions/filter-options`, {
+      params: { q, filters: JSON.stringify(filters) },
+      timeout: 10000
+    })
+      .then(res => { if (!cancelled) setCounts(res.data?.counts || {}) })
+      .catch(() => { if (!cancelled) setCounts({}) })
+    return () => { cancelled = true }
+  }, [q, filters])
+
+  function withCount(facet, value) {
+    const n = counts[facet]?.[value]
+    return n === undefined ? value : `${value} (${n})`
+  }
+
   function toggle(arr, v) {
     return arr.includes(v) ? arr.filter(x => x !== v) : [...arr, v]
   }
@@ -121,7 +146,7 @@ export default function FilterPanel({ onChange }) {
                 onClick={() => setRegion(toggle(region, r))}
                 className={region.includes(r) ? 'active' : ''}
               >
-                {r}
+                {withCount('regions', r)}
               </button>
             ))
           ) : (
@@ -139,8 +164,8 @@ export default function FilterPanel({ onChange }) {
       <div className="filter-group">
         <label>Gender:</label>
         <div className="filter-buttons">
-          <button onClick={() => setGender(toggle(gender, 'Male'))} className={gender.includes('Male') ? 'active' : ''}>Male</button>
-          <button onClick={() => setGender(toggle(gender, 'Female'))} className={gender.includes('Female') ? 'active' : ''}>Female</button>
+          <button onClick={() => setGender(toggle(gender, 'Male'))} className={gender.includes('Male') ? 'active' : ''}>{withCount('genders', 'Male')}</button>
+          <button onClick={() => setGender(toggle(gender, 'Female'))} className={gender.includes('Female') ? 'active' : ''}>{withCount('genders', 'Female')}</button>
         </div>
       </div>
 
@@ -174,7 +199,7 @@ export default function FilterPanel({ onChange }) {
                 onClick={() => setProductCategories(toggle(productCategories, cat))}
                 className={productCategories.includes(cat) ? 'active' : ''}
               >
-                {cat}
+                {withCount('productCategories', cat)}
               </button>
             ))
           ) : (
@@ -193,7 +218,7 @@ export default function FilterPanel({ onChange }) {
                 onClick={() => setTags(toggle(tags, tag))}
                 className={tags.includes(tag) ? 'active' : ''}
               >
-                {tag}
+                {withCount('tags', tag)}
               </button>
             ))
           ) : (
@@ -212,7 +237,7 @@ export default function FilterPanel({ onChange }) {
                 onClick={() => setPaymentMethods(toggle(paymentMethods, method))}
                 className={paymentMethods.includes(method) ? 'active' : ''}
               >
-                {method}
+                {withCount('paymentMethods', method)}
               </button>
             ))
           ) : (